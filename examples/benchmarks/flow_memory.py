@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+按消息构建工作流的内存基准测试
+
+模拟 `agnflow.chatbot.websocket.subscriber`：每条消息都新建 ChatNode 和 Flow，
+并与长期存活的 agent_nodes 组合执行。连接关系保存在各自的图注册表中，
+丢弃的工作流及其连接会被回收，内存占用应保持平稳。
+
+--pattern supervisor 时每条消息新建 Supervisor[chat_node, *agent_nodes]，
+chat_node 与共享的 agent_nodes 互相连接（共享节点持有指向 chat_node 的出边），
+存活的 chat_node 数与 agent_0 的 chat_node 出边数也应保持平稳。
+
+用法：
+    python examples/benchmarks/flow_memory.py --messages 100000
+    python examples/benchmarks/flow_memory.py --messages 100000 --pattern supervisor
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import weakref
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../src"))
+
+from agnflow.core import Node, Flow, Supervisor
+
+
+def main(messages: int = 100_000, report_every: int = 10_000, pattern: str = "flow"):
+    # 长期存活的代理节点（对应 Server(agent_nodes=...)）
+    agent_nodes = [Node(name=f"agent_{i}", exec=lambda state: "exit") for i in range(8)]
+    agent_nodes[0] >> agent_nodes[1]
+    # 每条消息新建的 chat_node（弱引用，只用于统计存活数）
+    chat_nodes = weakref.WeakSet()
+
+    def handle_message(state: dict):
+        chat_node = Node(name="chat_node", exec=lambda state: "agent_0")
+        chat_nodes.add(chat_node)
+        if pattern == "supervisor":
+            # chat_node 与共享的 agent_nodes 互相连接
+            flow = Supervisor(name="chat_flow")[chat_node, *agent_nodes]
+        else:
+            flow = Flow(name="chat_flow")
+            flow[chat_node, *agent_nodes]
+        flow.run(state, entry_action="chat_node")
+
+    def chat_edges() -> int:
+        """agent_0 指向 chat_node 的出边数"""
+        edges = agent_nodes[0].connections.get(agent_nodes[0])
+        return len(edges.candidates("chat_node")) if edges is not None else 0
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    baseline = current = 0
+    print(f"{'messages':>10} {'memory(KiB)':>12} {'graph nodes':>12} {'chat nodes':>11} {'chat edges':>11} {'msg/s':>10}")
+    for i in range(1, messages + 1):
+        handle_message({"user_message": f"message {i}"})
+        if i % report_every == 0:
+            # 第一次回收可能只释放延迟删除的弱引用字典条目，再回收一次得到稳定的统计
+            gc.collect()
+            gc.collect()
+            current, _ = tracemalloc.get_traced_memory()
+            baseline = baseline or current
+            elapsed = time.perf_counter() - start
+            print(
+                f"{i:>10} {current / 1024:>12.1f} {len(agent_nodes[0].graph):>12} "
+                f"{len(chat_nodes):>11} {chat_edges():>11} {i / elapsed:>10.0f}"
+            )
+    tracemalloc.stop()
+    print(f"内存增长: {(current - baseline) / 1024:.1f} KiB（首个报告点之后）")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--report-every", type=int, default=10_000)
+    parser.add_argument("--pattern", choices=["flow", "supervisor"], default="flow")
+    args = parser.parse_args()
+    main(args.messages, args.report_every, args.pattern)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+运行期增删节点基准测试
+
+图中有一条长度为 size 的链路指向工作流，在工作流中反复 `+=`/`-=` 节点，
+对比单个操作与 `update` 批量操作的耗时。增删通过反向邻接索引完成，耗时只与节点的度数有关，不随图的规模增长。
+
+用法：
+    python examples/benchmarks/graph_mutation.py --sizes 100 1000 10000 --ops 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../src"))
+
+from agnflow.core import Node, Flow
+from agnflow.utils.log import set_quiet
+
+
+def build_flow(size: int) -> Flow:
+    flow = Flow(name="root")
+    flow[Node(name="worker", exec=lambda: None)]
+    nodes = [Node(name=f"n{i}", exec=lambda: None) for i in range(size)]
+    for src, tgt in zip(nodes, nodes[1:]):
+        src >> tgt
+    nodes[-1] >> flow >> Node(name="downstream", exec=lambda: None)
+    return flow
+
+
+def bench_single(size: int, ops: int) -> float:
+    """返回每次 += 与 -= 的平均耗时（微秒）"""
+    flow = build_flow(size)
+    agents = [Node(name=f"agent_{i}", exec=lambda: None) for i in range(ops)]
+    start = time.perf_counter()
+    for agent in agents:
+        flow += agent
+        flow -= agent
+    return (time.perf_counter() - start) / (2 * ops) * 1e6
+
+
+def bench_batch(size: int, ops: int, batch: int = 100) -> float:
+    """返回 update 批量增删时每个节点的平均耗时（微秒）"""
+    flow = build_flow(size)
+    agents = [Node(name=f"agent_{i}", exec=lambda: None) for i in range(ops)]
+    start = time.perf_counter()
+    previous: list = []
+    for i in range(0, ops, batch):
+        current = agents[i : i + batch]
+        flow.update(add=current, remove=previous)
+        previous = current
+    flow.update(remove=previous)
+    return (time.perf_counter() - start) / (2 * ops) * 1e6
+
+
+def main(sizes: list[int], ops: int = 2000):
+    set_quiet()
+    for size in sizes:
+        single = bench_single(size, ops)
+        batch = bench_batch(size, ops)
+        print(f"size={size:>6}: +=/-= {single:>8.1f} us/op   update {batch:>8.1f} us/node")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.sizes, args.ops)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+嵌套工作流基准测试
+
+depth 层嵌套的工作流，最内层两个节点互相路由，对比：
+- recursive 每层子工作流作为独立节点递归执行（inline=False）
+- inline    编译时把子工作流展开到根工作流的路由表中，在一个执行循环中运行
+
+用法：
+    python examples/benchmarks/nested_flow.py --depth 8 --steps 1000 --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../src"))
+
+from agnflow.core import Node, Flow
+from agnflow.utils.log import set_quiet
+
+
+def build_flow(depth: int, inline: bool) -> Flow:
+    ping = Node(name="ping", exec=lambda count=0: ("pong", {"count": count + 1}))
+    pong = Node(name="pong", exec=lambda count=0: ("ping", {"count": count + 1}))
+    inner = Flow(name="level_0", inline=inline)
+    inner[ping >> pong >> ping]
+    for level in range(1, depth):
+        outer = Flow(name=f"level_{level}", inline=inline)
+        outer[inner]
+        inner = outer
+    root = Flow(name="root")
+    root[inner]
+    return root
+
+
+def bench(depth: int, steps: int, repeat: int, inline: bool) -> float:
+    """返回每秒执行的节点数（取最好的一轮）"""
+    flow = build_flow(depth, inline)
+    best = 0.0
+    for _ in range(repeat):
+        state = {"count": 0}
+        start = time.perf_counter()
+        flow.run(state, max_steps=steps)
+        elapsed = time.perf_counter() - start
+        best = max(best, state["count"] / elapsed)
+    return best
+
+
+def main(depth: int = 8, steps: int = 1000, repeat: int = 20):
+    set_quiet()
+    recursive = bench(depth, steps, repeat, inline=False)
+    inline = bench(depth, steps, repeat, inline=True)
+    print(f"recursive: {recursive:>10.0f} steps/s")
+    print(f"inline:    {inline:>10.0f} steps/s  (x{inline / recursive:.2f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.depth, args.steps, args.repeat)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+乒乓工作流步数基准测试
+
+两个极小的 lambda 节点互相路由 1000 步，对比：
+- cached   执行器赋值时缓存参数绑定计划（ExecBinding）
+- uncached 每一步都重新 inspect.signature 构建调用参数（旧实现）
+- log callback 传入 log_zh 回调，每一步都格式化日志消息（旧的默认行为）
+
+用法：
+    python examples/benchmarks/ping_pong.py --steps 1000 --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../src"))
+
+from agnflow.core import Node, Flow
+from agnflow.core.node import ExecBinding
+from agnflow.utils.log import set_quiet
+
+
+class UncachedNode(Node):
+    """每次执行都重新计算绑定计划的节点（模拟旧实现）"""
+
+    def get_binding(self, executor):
+        return ExecBinding(executor)
+
+
+def build_flow(node_cls: type[Node], **flow_kwargs) -> Flow:
+    ping = node_cls(name="ping", exec=lambda count=0: ("pong", {"count": count + 1}))
+    pong = node_cls(name="pong", exec=lambda count=0: ("ping", {"count": count + 1}))
+    flow = Flow(name="ping_pong", **flow_kwargs)
+    flow[ping >> pong >> ping]
+    return flow
+
+
+def bench(node_cls: type[Node], steps: int, repeat: int, **flow_kwargs) -> float:
+    """返回每秒执行步数（取最好的一轮）"""
+    flow = build_flow(node_cls, **flow_kwargs)
+    best = 0.0
+    for _ in range(repeat):
+        state = {"count": 0}
+        start = time.perf_counter()
+        flow.run(state, max_steps=steps)
+        elapsed = time.perf_counter() - start
+        assert state["count"] == steps, state
+        best = max(best, steps / elapsed)
+    return best
+
+
+def main(steps: int = 1000, repeat: int = 20):
+    # 达到最大步数时的警告不计入输出
+    set_quiet()
+    uncached = bench(UncachedNode, steps, repeat)
+    cached = bench(Node, steps, repeat)
+    set_quiet(False)
+    log_callback = bench(Node, steps, repeat, log_zh=lambda *x: ...)
+    print(f"uncached:     {uncached:>10.0f} steps/s")
+    print(f"cached:       {cached:>10.0f} steps/s  (x{cached / uncached:.2f})")
+    print(f"log callback: {log_callback:>10.0f} steps/s  (x{log_callback / uncached:.2f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.steps, args.repeat)
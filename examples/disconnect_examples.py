@@ -12,15 +12,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'agnflow/src'))
 from agnflow.core.connection import Connection
 from agnflow.core.flow import Flow
 
-def cleanup_global_state():
-    """清理全局状态"""
-    Connection.connections.clear()
-    Connection.conntainer.clear()
-    Connection.hidden_connections.clear()
-
 def example_basic_disconnect():
     """示例1: 基本断开连接"""
-    cleanup_global_state()
     print("=== 示例1: 基本断开连接 ===")
     
     # 创建节点
@@ -41,7 +34,6 @@ def example_basic_disconnect():
 
 def example_multiple_disconnect():
     """示例2: 断开多个连接"""
-    cleanup_global_state()
     print("=== 示例2: 断开多个连接 ===")
     
     # 创建节点
@@ -63,7 +55,6 @@ def example_multiple_disconnect():
 
 def example_container_disconnect():
     """示例3: 断开容器连接"""
-    cleanup_global_state()
     print("=== 示例3: 断开容器连接 ===")
     
     # 创建节点和容器
@@ -89,7 +80,6 @@ def example_container_disconnect():
 
 def example_chain_disconnect():
     """示例4: 断开链式连接"""
-    cleanup_global_state()
     print("=== 示例4: 断开链式连接 ===")
     
     # 创建节点
@@ -111,7 +101,6 @@ def example_chain_disconnect():
 
 def example_chain_disconnect_symmetric():
     """示例4.5: 对称的链式断开连接"""
-    cleanup_global_state()
     print("=== 示例4.5: 对称的链式断开连接 ===")
     
     # 创建节点
@@ -134,7 +123,6 @@ def example_chain_disconnect_symmetric():
 
 def example_list_disconnect_symmetric():
     """示例4.6: 对称的列表断开连接"""
-    cleanup_global_state()
     print("=== 示例4.6: 对称的列表断开连接 ===")
     
     # 创建节点
@@ -158,7 +146,6 @@ def example_list_disconnect_symmetric():
 
 def example_selective_disconnect():
     """示例5: 选择性断开连接"""
-    cleanup_global_state()
     print("=== 示例5: 选择性断开连接 ===")
     
     # 创建节点
@@ -183,7 +170,6 @@ def example_selective_disconnect():
 
 def example_flow_complex_disconnect():
     """示例6: Flow 容器复杂断开"""
-    cleanup_global_state()
     print("=== 示例6: Flow 容器复杂断开 ===")
     
     # 创建节点和容器
@@ -214,7 +200,6 @@ def example_flow_complex_disconnect():
 
 def example_visualization():
     """示例7: 可视化断开连接效果"""
-    cleanup_global_state()
     print("=== 示例7: 可视化断开连接效果 ===")
     
     # 创建节点
@@ -1,7 +1,7 @@
 """FastAPI后台任务节点实现。
 
 本模块提供了支持后台任务处理的文章生成节点，包括大纲生成、内容编写和样式应用功能。
-通过SSE队列实现实时进度更新，支持长时间运行的任务。
+节点通过执行事件汇报进度，由 Flow.astream 的消费者转发到SSE队列，支持长时间运行的任务。
 """
 
 import asyncio
@@ -13,7 +13,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from pathlib import Path
 
-from agnflow.core import Node, Flow
+from agnflow.core import Node, MapNode, Flow
 from agnflow.agent.llm import call_llm
 BASE_PATH = Path(__file__).parent
 
@@ -39,25 +39,22 @@ sections:
         result = call_llm(prompt, output_format="yaml")
         state["sections"] = result["sections"]
 
-        # 通过SSE队列发送进度更新
+        # 发出进度事件（由 astream 的消费者转发到SSE队列）
         progress_msg = {"step": "outline", "progress": 33, "data": {"sections": result["sections"]}}
-        state["sse_queue"].put_nowait(progress_msg)
+        self.emit("progress", progress_msg)
 
         return "content_node"
 
-class WriteContent(Node):
-    """内容编写节点 - 批量为每个章节生成内容"""
+class WriteContent(MapNode):
+    """内容编写节点 - 并发为每个章节生成内容"""
 
-    def exec(self, state):
-        # 存储章节和sse_queue供exec使用
-        self.sections = state.get("sections", [])
-        self.sse_queue = state["sse_queue"]
-
-        res_list = []
-        for section in  self.sections:
+    def __init__(self):
+        super().__init__(items_key="sections", output_key="contents", item_key="section", max_concurrency=3, action="style_node")
+        self.completed = 0
 
-            # 为单个章节生成简短段落
-            prompt = f"""
+    def exec(self, section):
+        # 为单个章节生成简短段落
+        prompt = f"""
 为这个部分写一个简短的段落（最多100个字）：
 
 {section}
@@ -68,39 +65,34 @@ class WriteContent(Node):
 - 保持非常简洁（不超过100个字）
 - 包括一个简短的例子或类比
 """
-            content = call_llm(prompt)
-
-            # 为此章节发送进度更新
-            current_section_index = self.sections.index(section) if section in self.sections else 0
-            total_sections = len(self.sections)
-
-            # 进度从33%（大纲后）到66%（样式前）
-            # 每个章节贡献(66-33)/total_sections = 33/total_sections百分比
-            section_progress = 33 + ((current_section_index + 1) * 33 // total_sections)
-
-            progress_msg = {
-                "step": "content", 
-                "progress": section_progress, 
-                "data": {
-                    "section": section,
-                    "completed_sections": current_section_index + 1,
-                    "total_sections": total_sections
-                }
+        return f"## {section}\n\n{call_llm(prompt)}\n"
+
+    def on_item(self, index, section, content):
+        # 每完成一个章节发送进度更新（按完成顺序）
+        self.completed += 1
+        total_sections = len(self.state["sections"])
+
+        # 进度从33%（大纲后）到66%（样式前）
+        # 每个章节贡献(66-33)/total_sections = 33/total_sections百分比
+        section_progress = 33 + (self.completed * 33 // total_sections)
+
+        progress_msg = {
+            "step": "content",
+            "progress": section_progress,
+            "data": {
+                "section": section,
+                "completed_sections": self.completed,
+                "total_sections": total_sections
             }
-            self.sse_queue.put_nowait(progress_msg)
-
-            res_list.append( f"## {section}\n\n{content}\n")
-
-        # 后处理阶段：合并所有章节内容生成草稿
-        draft = "\n".join(res_list)
-        state["draft"] = draft
-        return "style_node"
+        }
+        self.emit("progress", progress_msg)
 
 class ApplyStyle(Node):
     """样式应用节点 - 为文章应用特定风格"""
     def exec(self, state):
-        # 准备阶段：获取草稿
-        draft = state["draft"]
+        # 准备阶段：合并所有章节内容生成草稿
+        draft = "\n".join(state["contents"])
+        state["draft"] = draft
 
         # 执行阶段：为文章应用特定风格
         prompt = f"""
@@ -115,12 +107,12 @@ class ApplyStyle(Node):
 - 包括一个强有力的开头和结论
 """
 
-        # 后处理阶段：保存最终文章并通过SSE队列发送完成更新
+        # 后处理阶段：保存最终文章并发出完成事件
         state["final_article"] = call_llm(prompt)
 
-        # 通过SSE队列发送完成更新
+        # 发出完成事件
         progress_msg = {"step": "complete", "progress": 100, "data": {"final_article": state["final_article"]}}
-        state["sse_queue"].put_nowait(progress_msg)
+        self.emit("progress", progress_msg)
 
 
 app = FastAPI()
@@ -130,21 +122,24 @@ app.mount("/assets", StaticFiles(directory=BASE_PATH / "assets"), name="assets")
 active_jobs = {}
 
 
-def run_article_workflow(job_id: str, topic: str):
+async def run_article_workflow(job_id: str, topic: str):
     """Run the article workflow in background"""
     try:
         # Get the pre-created queue from active_jobs
         sse_queue = active_jobs[job_id]
-        state = {"topic": topic, "sse_queue": sse_queue, "sections": [], "draft": "", "final_article": ""}
+        state = {"topic": topic, "sections": [], "draft": "", "final_article": ""}
 
-        # Run the workflow
-        outline_node = GenerateOutline()
+        # Run the workflow（阻塞的 LLM 调用在线程池中执行，不阻塞事件循环）
+        outline_node = GenerateOutline(exec_policy="thread")
         content_node = WriteContent()
-        style_node = ApplyStyle()
+        style_node = ApplyStyle(exec_policy="thread")
         article_flow = Flow()
 
         article_flow[outline_node >> content_node >> style_node]
-        article_flow.run(state)
+        # 消费执行事件，把节点发出的进度事件转发到SSE队列
+        async for event in article_flow.astream(state):
+            if event.type == "progress":
+                sse_queue.put_nowait(event.data)
 
     except Exception as e:
         # Send error message
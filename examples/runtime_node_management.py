@@ -5,22 +5,17 @@
 展示如何在运行时动态添加和删除节点
 """
 
+import asyncio
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
 
 from agnflow.core.connection import Connection
 from agnflow.core.flow import Flow
-
-def cleanup_global_state():
-    """清理全局状态"""
-    Connection.connections.clear()
-    Connection.conntainer.clear()
-    Connection.hidden_connections.clear()
+from agnflow.core.node import Node
 
 def example_runtime_add_nodes():
     """示例1: 运行期添加节点"""
-    cleanup_global_state()
     print("=== 示例1: 运行期添加节点 ===")
     
     # 创建初始节点
@@ -57,7 +52,6 @@ def example_runtime_add_nodes():
 
 def example_runtime_remove_nodes():
     """示例2: 运行期删除节点"""
-    cleanup_global_state()
     print("=== 示例2: 运行期删除节点 ===")
     
     # 创建节点和容器
@@ -84,7 +78,6 @@ def example_runtime_remove_nodes():
 
 def example_symmetric_syntax():
     """示例3: 对称的连接/断开语法"""
-    cleanup_global_state()
     print("=== 示例3: 对称的连接/断开语法 ===")
     
     # 创建节点
@@ -112,7 +105,6 @@ def example_symmetric_syntax():
 
 def example_container_operations():
     """示例4: 容器操作"""
-    cleanup_global_state()
     print("=== 示例4: 容器操作 ===")
     
     # 创建节点和容器
@@ -134,7 +126,6 @@ def example_container_operations():
 
 def example_dynamic_workflow_modification():
     """示例5: 动态工作流修改"""
-    cleanup_global_state()
     print("=== 示例5: 动态工作流修改 ===")
     
     # 创建初始工作流
@@ -164,12 +155,44 @@ def example_dynamic_workflow_modification():
     print(f"连接状态: {a.connections}")
     print()
 
+def example_hot_reconfiguration():
+    """示例6: 执行期间修改工作流（每次运行使用开始时的路由表快照）"""
+    print("=== 示例6: 执行期间修改工作流 ===")
+
+    trace = []
+
+    async def plan():
+        trace.append("plan")
+        await asyncio.sleep(0.05)
+        return "act"
+
+    async def act():
+        trace.append("act")
+
+    plan_node = Node(name="plan", aexec=plan)
+    act_node = Node(name="act", aexec=act)
+    flow = Flow(name="hot")
+    flow[plan_node >> act_node]
+
+    async def main():
+        running = asyncio.create_task(flow.arun({}))
+        await asyncio.sleep(0.01)
+        # 第一次运行还在 plan 节点中，删除 act 不影响它
+        flow.update(remove=[act_node])
+        await flow.arun({})
+        await running
+
+    asyncio.run(main())
+    print(f"执行记录: {trace}")  # ['plan', 'plan', 'act']：新运行在 plan 后结束，进行中的运行仍执行 act
+    print()
+
 if __name__ == "__main__":
     example_runtime_add_nodes()
     example_runtime_remove_nodes()
     example_symmetric_syntax()
     example_container_operations()
     example_dynamic_workflow_modification()
+    example_hot_reconfiguration()
     
     print("🎉 运行期动态节点管理示例演示完成！")
     print("\n核心特性:")
@@ -177,4 +200,5 @@ if __name__ == "__main__":
     print("- 运行期删除节点: flow -= node")
     print("- 对称语法: a >> b >> c 对应 a - b - c")
     print("- 支持批量操作: flow += [node1, node2]")
-    print("- 容器操作: flow[a, b] 和 a - flow[a, b]") 
\ No newline at end of file
+    print("- 容器操作: flow[a, b] 和 a - flow[a, b]")
+    print("- 执行期间修改: 进行中的运行使用开始时的路由表快照，新运行使用新结构") 
\ No newline at end of file
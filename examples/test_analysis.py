@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+测试静态分析：悬空 action、没有出口的环路（Tarjan 强连通分量）与同名节点
+"""
+
+import os
+import sys
+from typing import Literal
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import Flow, Node
+from agnflow.core.analysis import strongly_connected
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def kinds(flow: Flow) -> list[tuple[str, str, str]]:
+    return sorted((issue.level, issue.kind, issue.node) for issue in flow.validate().issues)
+
+
+def test_dangling_action():
+    """Literal 注解声明的 action 没有对应的下一个节点时报告 error，exit 不算悬空"""
+
+    def route() -> Literal["b", "missing", "exit"]:
+        return "b"
+
+    def done() -> Literal["exit"]:
+        return "exit"
+
+    flow = Flow(name="flow")
+    flow[Node(name="a", exec=route) >> Node(name="b", exec=done)]
+    report = flow.validate()
+    assert kinds(flow) == [("error", "dangling_action", "a")]
+    assert not report.ok and "missing" in report.errors[0].message
+    with pytest.raises(ValueError, match="missing"):
+        flow.validate(strict=True)
+
+
+def test_cycle_without_exit():
+    """环路中所有声明的 action 都回到环路内部时报告 error，有离开环路的 action 时不报告"""
+
+    def to_b() -> Literal["b"]:
+        return "b"
+
+    def to_a() -> Literal["a"]:
+        return "a"
+
+    def to_a_or_exit() -> Literal["a", "exit"]:
+        return "exit"
+
+    closed = Flow(name="closed")
+    a = Node(name="a", exec=to_b)
+    closed[a >> Node(name="b", exec=to_a) >> a]
+    issues = [issue for issue in closed.validate().issues if issue.kind == "cycle_without_exit"]
+    assert len(issues) == 1 and issues[0].level == "error"
+    assert "[a, b]" in issues[0].message
+
+    open_ = Flow(name="open")
+    a = Node(name="a", exec=to_b)
+    open_[a >> Node(name="b", exec=to_a_or_exit) >> a]
+    assert kinds(open_) == []
+
+    # 没有注解的节点无法确定 action，不报告
+    unknown = Flow(name="unknown")
+    a = Node(name="a", exec=lambda: "b")
+    unknown[a >> Node(name="b", exec=to_a) >> a]
+    assert kinds(unknown) == []
+
+
+def test_strongly_connected_components():
+    """Tarjan 算法：环路成员归为一个分量，环外节点各自成为分量，深链不会递归溢出"""
+    edges = {1: {2}, 2: {3}, 3: {1, 4}, 4: {5}, 5: set()}
+    components = sorted(sorted(component) for component in strongly_connected([1, 2, 3, 4, 5], edges))
+    assert components == [[1, 2, 3], [4], [5]]
+    chain = {i: {i + 1} for i in range(5000)}
+    chain[4999] = {0}
+    assert [len(component) for component in strongly_connected(range(5000), chain)] == [5000]
+
+
+def test_name_collision():
+    """同一个工作流中两个不同的节点同名时报告 warning"""
+
+    def to_worker() -> Literal["worker"]:
+        return "worker"
+
+    def done() -> Literal["exit"]:
+        return "exit"
+
+    flow = Flow(name="flow")
+    flow[Node(name="start", exec=to_worker) >> Node(name="worker", exec=done), Node(name="worker", exec=done)]
+    collisions = [issue for issue in flow.validate().issues if issue.kind == "name_collision"]
+    assert len(collisions) == 1
+    assert collisions[0].level == "warning" and collisions[0].node == "worker"
+    assert flow.validate().ok
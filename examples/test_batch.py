@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+测试批量执行：run_batch / arun_batch
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import DeadlineExceeded, Flow, Node
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def test_run_batch_sync_graph():
+    """纯同步图的每个 state 得到自己的结果；批次只能迭代一次"""
+    inc = Node(name="inc", exec=lambda x: ("double", {"x": x + 1}))
+    flow = Flow(name="flow")
+    flow[inc >> Node(name="double", exec=lambda x: {"y": x * 2})]
+    states = [{"x": i} for i in range(10)]
+    batch = flow.run_batch(states)
+    items = list(batch)
+    assert sorted(item.index for item in items) == list(range(10))
+    assert all(item.ok and item.state is states[item.index] for item in items)
+    assert [state["y"] for state in states] == [(i + 1) * 2 for i in range(10)]
+    assert batch.stats.completed == 10 and batch.stats.failed == 0
+    with pytest.raises(RuntimeError):
+        list(batch)
+
+
+def test_run_batch_sync_graph_uses_concurrency_threads():
+    """纯同步图在 concurrency 个工作线程中执行，阻塞的同步节点可以并发；concurrency=1 时按输入顺序逐个执行"""
+
+    def block(x):
+        time.sleep(0.05)
+        return {"y": x}
+
+    flow = Flow(name="flow")
+    flow[Node(name="block", exec=block)]
+    assert flow._is_sync_graph()
+    start = time.perf_counter()
+    batch = flow.run_batch(({"x": i} for i in range(20)), concurrency=10)
+    items = list(batch)
+    assert time.perf_counter() - start < 0.5
+    assert sorted(item.state["y"] for item in items) == list(range(20))
+    assert batch.stats.completed == 20
+
+    items = list(flow.run_batch([{"x": i} for i in range(3)], concurrency=1))
+    assert [item.index for item in items] == [0, 1, 2]
+
+
+def test_run_batch_break_stops_sync_workers():
+    """同步迭代提前退出后，工作线程不再开始新的运行"""
+
+    def block(x):
+        time.sleep(0.02)
+        return {"y": x}
+
+    flow = Flow(name="flow")
+    flow[Node(name="block", exec=block)]
+    batch = flow.run_batch([{"x": i} for i in range(100)], concurrency=4)
+    for _ in batch:
+        break
+    time.sleep(0.1)
+    assert batch.stats.completed < 20
+
+
+def test_batch_isolates_failures():
+    """单个 state 超时时异常保存在 error 中，不中断批次"""
+
+    async def work(x):
+        await asyncio.sleep(1 if x == 2 else 0)
+        return {"y": x}
+
+    flow = Flow(name="flow")
+    flow[Node(name="work", aexec=work)]
+
+    async def main():
+        return [item async for item in flow.arun_batch([{"x": i} for i in range(5)], timeout=0.1)]
+
+    items = asyncio.run(main())
+    failed = [item for item in items if not item.ok]
+    assert [item.index for item in failed] == [2]
+    assert isinstance(failed[0].error, DeadlineExceeded)
+    assert sorted(item.state["y"] for item in items if item.ok) == [0, 1, 3, 4]
+
+
+def test_arun_batch_runs_concurrently():
+    """arun_batch 最多 concurrency 个运行并发执行"""
+
+    async def slow(x):
+        await asyncio.sleep(0.05)
+        return {"y": x}
+
+    flow = Flow(name="flow")
+    flow[Node(name="slow", aexec=slow)]
+
+    async def main():
+        batch = flow.arun_batch(({"x": i} for i in range(20)), concurrency=10)
+        start = time.perf_counter()
+        items = [item async for item in batch]
+        return items, time.perf_counter() - start
+
+    items, elapsed = asyncio.run(main())
+    assert len(items) == 20 and all(item.ok and item.state["y"] == item.state["x"] for item in items)
+    assert elapsed < 0.5
+
+
+def test_arun_batch_break_cancels_remaining():
+    """提前退出迭代会取消仍在执行的运行"""
+
+    async def slow(x):
+        await asyncio.sleep(0.02)
+        return {"y": x}
+
+    flow = Flow(name="flow")
+    flow[Node(name="slow", aexec=slow)]
+
+    async def main():
+        batch = flow.arun_batch([{"x": i} for i in range(100)], concurrency=4)
+        async for _ in batch:
+            break
+        await asyncio.sleep(0.1)
+        return batch.stats.completed
+
+    assert asyncio.run(main()) < 20
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+测试节点结果缓存：命中时跳过执行并重放 state 变更
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import DiskCache, Flow, MemoryCache, Node
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def test_memory_cache_hit_skips_exec_and_replays_writes():
+    """相同输入第二次执行时命中缓存，不再调用 exec，写入和删除的键照常生效"""
+    calls = []
+
+    def build(question, state):
+        calls.append(question)
+        state.pop("tmp", None)
+        return "exit", {"prompt": f"[{question}]"}
+
+    flow = Flow(name="flow")
+    flow[Node(name="build", exec=build, cache=MemoryCache())]
+    for _ in range(2):
+        state = {"question": "q1", "tmp": 1}
+        flow.run(state)
+        assert state == {"question": "q1", "prompt": "[q1]"}
+    assert calls == ["q1"]
+
+    flow.run({"question": "q2"})
+    assert calls == ["q1", "q2"]
+
+
+def test_cache_replays_in_place_changes():
+    """命中缓存时重放节点对可变值的原地修改"""
+    calls = []
+
+    def greet(messages):
+        calls.append(1)
+        messages.append("hi")
+
+    node = Node(name="greet", exec=greet, cache=MemoryCache())
+    for _ in range(2):
+        state = {"messages": []}
+        node.run(state)
+        assert state["messages"] == ["hi"]
+    assert calls == [1]
+
+
+def test_fallback_result_is_not_cached():
+    """由 exec_fallback 处理的结果不会被缓存"""
+    calls = []
+
+    def boom(x):
+        calls.append(x)
+        raise RuntimeError("boom")
+
+    node = Node(name="boom", exec=boom, cache=MemoryCache())
+    node.exec_fallback = lambda state, exc: "exit"
+    node.run({"x": 1})
+    node.run({"x": 1})
+    assert calls == [1, 1]
+
+
+def test_disk_cache_shared_across_instances(tmp_path):
+    """DiskCache 在不同的节点实例之间共享结果（异步执行）"""
+    calls = []
+
+    async def double(x, state):
+        calls.append(x)
+        state["y"] = x * 2
+        return "exit"
+
+    for _ in range(2):
+        node = Node(name="double", aexec=double, cache=DiskCache(str(tmp_path)))
+        state = {"x": 3}
+        asyncio.run(node.arun(state))
+        assert state["y"] == 6
+    assert calls == [3]
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+测试检查点：崩溃后从最后一个检查点恢复执行
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import FileCheckpointer, Flow, MemoryCheckpointer, Node, SQLiteCheckpointer
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+class Crash(BaseException):
+    """模拟进程崩溃（不会被节点的重试和 exec_fallback 处理）"""
+
+
+def build_flow(checkpointer, calls: list, crash: dict) -> Flow:
+    def step(name: str, next_action: str):
+        def exec(state):
+            calls.append(name)
+            if name == crash.get("on"):
+                raise Crash()
+            state.setdefault("log", []).append(name)
+            return next_action
+
+        return Node(name=name, exec=exec)
+
+    flow = Flow(name="flow", checkpointer=checkpointer)
+    flow[step("a", "b") >> step("b", "c") >> step("c", "d") >> step("d", "exit")]
+    return flow
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_resume_from_last_checkpoint(backend, tmp_path):
+    """崩溃后 resume_from 从崩溃的节点继续执行，已完成的节点不再执行，state 按检查点恢复"""
+    checkpointer = MemoryCheckpointer() if backend == "memory" else SQLiteCheckpointer(str(tmp_path / "cp.db"))
+    calls, crash = [], {"on": "c"}
+    flow = build_flow(checkpointer, calls, crash)
+    with pytest.raises(Crash):
+        flow.run({"question": "q"}, run_id="r1")
+    assert calls == ["a", "b", "c"]
+
+    crash.clear()
+    state = {}
+    flow.run(state, resume_from="r1")
+    assert calls == ["a", "b", "c", "c", "d"]
+    assert state["log"] == ["a", "b", "c", "d"]
+    assert state["question"] == "q"
+
+
+def test_resume_completed_run_is_noop():
+    """已经执行完毕的运行再次恢复时不会执行任何节点"""
+    checkpointer = MemoryCheckpointer()
+    calls = []
+    flow = build_flow(checkpointer, calls, {})
+    flow.run({}, run_id="done")
+    calls.clear()
+    flow.run({}, resume_from="done")
+    assert calls == []
+    assert asyncio.run(checkpointer.load("done"))
+
+
+def test_sqlite_checkpointer_reuses_connection(tmp_path):
+    """SQLite 检查点在所有步骤和运行之间共享一个连接，close 后再使用时重新打开"""
+    checkpointer = SQLiteCheckpointer(str(tmp_path / "cp.db"))
+    flow = build_flow(checkpointer, [], {})
+    flow.run({}, run_id="r1")
+    conn = checkpointer._conn
+    assert conn is not None
+    flow.run({}, run_id="r2")
+    assert checkpointer._conn is conn
+    assert len(asyncio.run(checkpointer.load("r1"))) == 5
+    asyncio.run(checkpointer.close())
+    assert checkpointer._conn is None
+    asyncio.run(checkpointer.delete("r1"))
+    assert asyncio.run(checkpointer.load("r1")) == []
+    assert len(asyncio.run(checkpointer.load("r2"))) == 5
+    asyncio.run(checkpointer.close())
+
+
+def test_file_checkpointer_delete(tmp_path):
+    """文件检查点按运行删除日志文件，删除不存在的运行不报错"""
+    checkpointer = FileCheckpointer(tmp_path)
+    build_flow(checkpointer, [], {}).run({}, run_id="r1")
+    assert (tmp_path / "r1.ckpt").exists()
+    asyncio.run(checkpointer.delete("r1"))
+    asyncio.run(checkpointer.delete("r1"))
+    assert not (tmp_path / "r1.ckpt").exists()
+    assert asyncio.run(checkpointer.load("r1")) == []
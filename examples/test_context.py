@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+测试执行上下文：同一个节点实例被并发执行时，每次运行的 state 与重试序号互不干扰
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import Flow, Node
+from agnflow.core.context import current_context
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def test_concurrent_runs_share_node_without_interference():
+    """两个并发的 arun 执行同一个共享节点，各自看到自己的 state 和重试序号"""
+    seen = {}
+
+    async def work(self, state):
+        name = state["name"]
+        # slow 的第一次尝试与 fast 交错执行后失败，第二次尝试成功
+        await asyncio.sleep(0.01 if name == "slow" else 0)
+        seen.setdefault(name, []).append((self.state["name"], self.cur_retry, current_context().run_id))
+        await asyncio.sleep(0.02 if name == "slow" else 0.01)
+        assert self.state is state
+        if self.cur_retry == 0 and name == "slow":
+            raise RuntimeError("retry")
+        return "exit"
+
+    shared = Node(name="shared", aexec=work, max_retries=2)
+    flow = Flow(name="flow")
+    flow[shared]
+
+    async def main():
+        return await asyncio.gather(
+            flow.arun({"name": "slow"}, run_id="r-slow"), flow.arun({"name": "fast"}, run_id="r-fast")
+        )
+
+    asyncio.run(main())
+    assert seen["slow"] == [("slow", 0, "r-slow"), ("slow", 1, "r-slow")]
+    assert seen["fast"] == [("fast", 0, "r-fast")]
+    # 运行结束后节点实例上不残留运行期数据
+    assert shared.state == {} and shared.cur_retry == 0
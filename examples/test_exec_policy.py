@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+测试执行策略：thread 策略不阻塞事件循环，process 策略在子进程中执行
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import Flow, Node
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def square(x):
+    """模块级函数，可以 pickle 传递到子进程"""
+    return {"y": x * x, "pid": os.getpid()}
+
+
+def test_thread_policy_does_not_block_loop():
+    """thread 策略的阻塞 exec 在线程池中执行，事件循环上的其他任务照常运行"""
+
+    def block():
+        time.sleep(0.2)
+        return {"done": True}
+
+    flow = Flow(name="flow")
+    flow[Node(name="block", exec=block, exec_policy="thread")]
+    state = {}
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        await flow.arun(state)
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 10
+    assert state == {"done": True}
+
+
+def test_process_policy_runs_module_function():
+    """process 策略在子进程中执行模块级函数，结果写回 state"""
+    flow = Flow(name="flow")
+    flow[Node(name="square", exec=square, exec_policy="process")]
+    state = {"x": 7}
+    asyncio.run(flow.arun(state))
+    assert state["y"] == 49
+    assert state["pid"] != os.getpid()
+
+
+def test_process_policy_rejects_lambda():
+    """process 策略的执行器无法 pickle 时抛出说明原因的 ValueError"""
+    node = Node(name="square", exec=lambda x: {"y": x * x}, exec_policy="process")
+    with pytest.raises(ValueError, match="pickle"):
+        asyncio.run(node.arun({"x": 3}))
+
+
+def test_default_exec_binding_is_shared_per_function():
+    """默认的绑定方法 exec/aexec 的参数绑定计划按底层函数缓存，各实例共享，执行器仍是各自的绑定方法"""
+    a, b = Node(name="a"), Node(name="b")
+    assert a._exec_binding.params is b._exec_binding.params
+    assert a._aexec_binding.params is b._aexec_binding.params
+    assert a._exec_binding.executor.__self__ is a and b._exec_binding.executor.__self__ is b
+    custom = Node(name="custom", exec=lambda x, state: x)
+    assert custom._exec_binding.keys == ("x", "state") and custom._exec_binding.wants_state
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+测试日志：按级别输出每一步的日志，静默模式下不输出也不构造消息
+"""
+
+import logging
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import Flow, Node
+from agnflow.utils.log import logger, set_quiet
+
+set_quiet()
+
+
+class Recorder(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records = []
+
+    def emit(self, record):
+        # 格式化消息，触发 state 的 __repr__
+        record.getMessage()
+        self.records.append(record)
+
+
+class Probe:
+    """记录 __repr__ 被调用的次数，用于判断是否构造了日志消息"""
+
+    calls = 0
+
+    def __repr__(self):
+        Probe.calls += 1
+        return "Probe()"
+
+
+def build() -> Flow:
+    flow = Flow(name="flow")
+    flow[Node(name="a", exec=lambda: "b") >> Node(name="b", exec=lambda: "exit")]
+    return flow
+
+
+def run_logged(quiet: bool, flow: Flow) -> list:
+    handler = Recorder()
+    level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    set_quiet(quiet)
+    try:
+        flow.run({"probe": Probe()})
+    finally:
+        set_quiet()
+        logger.setLevel(level)
+        logger.removeHandler(handler)
+    return handler.records
+
+
+def test_per_step_logging_when_not_quiet():
+    """非静默模式下每一步输出带事件名的结构化日志"""
+    records = run_logged(False, build())
+    events = [record.agnflow_event for record in records]
+    assert len(events) >= 2
+    assert all(record.levelno < logging.ERROR for record in records)
+
+
+def test_quiet_suppresses_per_step_logging():
+    """静默模式下不输出 ERROR 以下的日志，也不格式化 state"""
+    Probe.calls = 0
+    assert run_logged(True, build()) == []
+    assert Probe.calls == 0
+
+    messages = []
+    flow = build()
+    flow.log = messages.append
+    run_logged(True, flow)
+    assert messages == []
+    run_logged(False, flow)
+    assert messages
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+测试实例命名：按变量名自动命名，关闭自动命名后使用不重复的类名
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import Flow, Node, set_auto_name
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def test_auto_name_uses_variable_name():
+    """未指定 name 时以赋值的变量名命名，显式 name 优先"""
+    fetch = Node()
+    pipeline = Flow()
+    named = Node(name="custom")
+    assert (fetch.name, pipeline.name, named.name) == ("fetch", "pipeline", "custom")
+
+
+def test_fallback_names_are_unique_without_auto_name():
+    """关闭自动命名后同一个类的实例依次命名为 类名、类名_2 ...，连接时不会互相覆盖"""
+    set_auto_name(False)
+    try:
+        nodes = [Node() for _ in range(3)]
+        flow = Flow()
+    finally:
+        set_auto_name(True)
+    names = [node.name for node in nodes]
+    assert len(set(names)) == 3
+    assert all(name == "Node" or name.startswith("Node_") for name in names)
+    assert flow.name == "Flow" or flow.name.startswith("Flow_")
+
+    a, b, c = nodes
+    a >> b
+    a >> c
+    targets = a.connections[a]
+    assert targets[b.name] is b and targets[c.name] is c
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+测试并行执行：ParallelFlow 分支的写时复制与 reducer 合并、MapNode 批处理
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import Flow, MapNode, Node
+from agnflow.core.flow import ParallelFlow
+from agnflow.core.state import BranchState
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def append_message(name: str) -> Node:
+    def exec(self, state):
+        state["messages"].append(name)
+        return "exit"
+
+    return Node(name=name, exec=exec)
+
+
+def test_branch_in_place_change_does_not_leak():
+    """分支原地修改列表不会影响外层和其他分支，只通过 reducer 合并"""
+    messages = ["hi"]
+    seen = {}
+
+    def check(self, state):
+        seen["messages"] = list(state["messages"])
+        return "exit"
+
+    pf = ParallelFlow(name="pf", reducers={"messages": "extend"})
+    pf[append_message("p1"), append_message("p2"), Node(name="check", exec=check)]
+    state = {"messages": messages}
+    pf.run(state)
+    assert messages == ["hi"]
+    assert seen["messages"] == ["hi"]
+    assert state["messages"] == ["hi", "p1", "p2"]
+
+
+def test_append_reducer_for_scalars_extend_for_lists():
+    """append 把每个分支的值作为一个元素追加，extend 展开列表值"""
+    pf = ParallelFlow(name="pf", reducers={"score": "append", "items": "extend"})
+    pf[
+        Node(name="a", exec=lambda: {"score": 1, "items": ["x"]}),
+        Node(name="b", exec=lambda: {"score": 2, "items": ["y", "z"]}),
+    ]
+    state = {"score": [], "items": ["w"]}
+    pf.run(state)
+    assert state["score"] == [1, 2]
+    assert state["items"] == ["w", "x", "y", "z"]
+
+
+def test_read_only_keys_are_not_merged():
+    """只读取、未修改的可变值不参与合并"""
+    calls = []
+
+    def reducer(old, values):
+        calls.append(values)
+        return old
+
+    pf = ParallelFlow(name="pf", reducers={"config": reducer})
+    pf[Node(name="a", exec=lambda config: "exit"), Node(name="b", exec=lambda config: "exit")]
+    pf.run({"config": {"model": "m"}})
+    assert calls == []
+
+
+def test_branch_state_copies_on_first_read():
+    """BranchState 第一次读取容器时深拷贝，分支自己写入的值不再复制"""
+    parent = {"data": {"items": [1]}}
+    branch = BranchState(parent)
+    data = branch["data"]
+    data["items"].append(2)
+    assert parent["data"] == {"items": [1]}
+    assert branch["data"] is data
+    value = []
+    branch["new"] = value
+    assert branch["new"] is value
+
+
+def test_map_node_keeps_order_and_limits_concurrency():
+    """MapNode 并发处理每一项，结果保持输入顺序，同时执行的项数不超过 max_concurrency"""
+    lock = threading.Lock()
+    active, peak, done = [0], [0], []
+
+    def work(item, index):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02 * (3 - index % 3))
+        with lock:
+            active[0] -= 1
+        return f"{index}:{item}"
+
+    mapper = MapNode(
+        name="mapper",
+        exec=work,
+        items_key="sections",
+        output_key="out",
+        max_concurrency=2,
+        on_item=lambda index, item, result: done.append(index),
+        action="count",
+    )
+    count = Node(name="count", exec=lambda out: ("exit", {"n": len(out)}))
+    flow = Flow(name="flow")
+    flow[mapper >> count]
+    state = {"sections": list("abcde")}
+    flow.run(state)
+    assert state["out"] == [f"{i}:{c}" for i, c in enumerate("abcde")]
+    assert state["n"] == 5
+    assert peak[0] == 2
+    assert sorted(done) == [0, 1, 2, 3, 4]
+
+
+def test_map_node_async_exec():
+    """arun 下自定义的 aexec 每一项作为一个协程任务执行"""
+
+    async def double(item):
+        await asyncio.sleep(0.01)
+        return item * 2
+
+    state = {"items": [1, 2, 3, 4]}
+    asyncio.run(MapNode(name="double", aexec=double, max_concurrency=3).arun(state))
+    assert state["results"] == [2, 4, 6, 8]
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+测试节点执行策略：断路器、舱壁隔离、重试
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import Bulkhead, CircuitBreaker, DeadlineExceeded, Flow, Node, RetryPolicy
+from agnflow.core.policy import retry_after
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def open_breaker(**kwargs) -> CircuitBreaker:
+    """返回一个已经过恢复期、下一次调用即为半开试探的断路器"""
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05, **kwargs)
+    breaker.record_failure(RuntimeError("down"))
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    return breaker
+
+
+def test_circuit_ignored_exception_closes_half_open():
+    """半开试探抛出 ignore 中的异常时视为成功，断路器关闭"""
+    breaker = open_breaker(ignore=(ValueError,))
+
+    def bad_input():
+        raise ValueError("invalid argument")
+
+    node = Node(name="tool", exec=bad_input, circuit=breaker)
+    node.exec_fallback = lambda state, exc: "exit"
+    Flow(name="f")[node].run({})
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_circuit_cancelled_trial_releases_slot():
+    """半开试探被取消时归还试探名额，下一次调用可以继续试探"""
+    breaker = open_breaker()
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    node = Node(name="tool", aexec=hang, circuit=breaker)
+
+    async def main():
+        task = asyncio.ensure_future(node.execute_workflow({}, is_async=True))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(main())
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_circuit_deadline_trial_releases_slot():
+    """半开试探超过运行期限时归还试探名额，下游恢复后断路器可以关闭"""
+    breaker = open_breaker()
+    healthy = False
+
+    async def call():
+        if not healthy:
+            await asyncio.sleep(10)
+        return "exit"
+
+    flow = Flow(name="f")
+    flow[Node(name="tool", aexec=call, circuit=breaker)]
+    try:
+        asyncio.run(flow.arun({}, timeout=0.05))
+        raise AssertionError("应该超过运行期限")
+    except DeadlineExceeded:
+        pass
+    healthy = True
+    asyncio.run(flow.arun({}))
+    assert breaker.state == "closed"
+
+
+def test_circuit_stuck_half_open_recovers():
+    """试探调用一直没有结果时，recovery_timeout 后放行新的试探"""
+    breaker = open_breaker()
+    assert breaker.allow()  # 试探名额被占用，且不记录结果
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_circuit_opens_and_routes_fallback():
+    """连续失败后打开，节点直接返回 fallback_action 并按名称路由"""
+    calls = []
+
+    def search():
+        calls.append(1)
+        raise RuntimeError("down")
+
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60, fallback_action="cached")
+    node = Node(name="search", exec=search, circuit=breaker)
+    node.exec_fallback = lambda state, exc: "exit"
+    cached = Node(name="cached", exec=lambda: {"answer": "cached"})
+    flow = Flow(name="f")
+    flow[node >> cached]
+    for _ in range(2):
+        flow.run({})
+    state = {}
+    flow.run(state)
+    assert len(calls) == 2 and state == {"answer": "cached"}
+
+
+def test_bulkhead_limits_concurrency():
+    """舱壁隔离限制同时执行的数量，等待超时返回 fallback_action"""
+    running = []
+    peak = []
+
+    async def work():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.05)
+        running.pop()
+
+    node = Node(name="llm", aexec=work, bulkhead=Bulkhead(max_concurrent=2, max_wait=0, fallback_action="busy"))
+
+    async def main():
+        return await asyncio.gather(*(node.execute_workflow({}, is_async=True) for _ in range(4)))
+
+    results = asyncio.run(main())
+    assert max(peak) == 2
+    assert results.count("busy") == 2
+
+
+def test_retry_policy_retries_until_success():
+    """重试策略：失败后按退避重试，成功后停止"""
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("flaky")
+        return {"ok": True}
+
+    flow = Flow(name="f")
+    flow[Node(name="flaky", exec=flaky, retry=RetryPolicy(max_attempts=3, delay=0.001, jitter=0))]
+    state = {}
+    flow.run(state)
+    assert len(attempts) == 3 and state == {"ok": True}
+
+
+class APIError(Exception):
+    """模拟 LLM 服务商 SDK 的 HTTP 错误（status_code + response.headers）"""
+
+    def __init__(self, status_code: int, headers: dict = None, retry_after: float = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+        if retry_after is not None:
+            self.retry_after = retry_after
+
+
+def test_retry_policy_backoff_and_jitter_bounds():
+    """等待时间按倍数增长并受 max_delay 限制，抖动只会缩短等待，full jitter 时在 [0, delay] 之间"""
+    policy = RetryPolicy(max_attempts=10, delay=0.1, multiplier=2, max_delay=1, jitter=0)
+    assert [policy.backoff(i) for i in range(6)] == [0.1, 0.2, 0.4, 0.8, 1, 1]
+    random.seed(0)
+    for jitter in (0.5, 1.0):
+        policy = RetryPolicy(delay=0.4, multiplier=1, jitter=jitter)
+        delays = [policy.backoff(0) for _ in range(200)]
+        assert all(0.4 * (1 - jitter) <= delay <= 0.4 for delay in delays)
+        assert max(delays) - min(delays) > 0.4 * jitter / 2
+    # 等待会超出总耗时预算或运行期限时不再重试
+    policy = RetryPolicy(max_attempts=5, delay=1, jitter=0, max_elapsed=2)
+    assert policy.next_delay(0, TimeoutError(), elapsed=0.5) == 1
+    assert policy.next_delay(0, TimeoutError(), elapsed=1.5) is None
+    assert policy.next_delay(0, TimeoutError(), remaining=0.5) is None
+    assert policy.next_delay(4, TimeoutError()) is None
+
+
+def test_retry_policy_honours_retry_after():
+    """遵循异常携带的 retry-after 提示（属性或响应头），只会延长等待；关闭后忽略"""
+    assert retry_after(APIError(429, retry_after=2)) == 2
+    assert retry_after(APIError(429, {"retry-after": "3"})) == 3
+    assert retry_after(APIError(429, {"retry-after-ms": "150"})) == 0.15
+    assert retry_after(APIError(429, {"retry-after": "soon"})) is None
+    policy = RetryPolicy(delay=0.01, jitter=0)
+    assert policy.next_delay(0, APIError(429, {"retry-after": "2"})) == 2
+    assert policy.next_delay(0, APIError(503, retry_after=0)) == 0.01
+    assert RetryPolicy(delay=0.01, jitter=0, respect_retry_after=False).next_delay(0, APIError(429, retry_after=2)) == 0.01
+
+    waits = []
+
+    def throttled():
+        waits.append(time.monotonic())
+        if len(waits) == 1:
+            raise APIError(429, {"retry-after-ms": "80"})
+        return "exit"
+
+    Node(name="llm", exec=throttled, retry=RetryPolicy(delay=0.001, jitter=0)).run({})
+    assert len(waits) == 2 and waits[1] - waits[0] >= 0.08
+
+
+def test_retry_policy_fails_fast_on_non_retryable_errors():
+    """校验类异常和 4xx 状态码不重试，直接交给 exec_fallback；429/5xx 与网络错误会重试"""
+    policy = RetryPolicy()
+    assert not policy.is_retryable(ValueError()) and not policy.is_retryable(KeyError())
+    assert not policy.is_retryable(APIError(400)) and not policy.is_retryable(APIError(401))
+    assert policy.is_retryable(APIError(429)) and policy.is_retryable(APIError(503))
+    assert policy.is_retryable(TimeoutError()) and policy.is_retryable(ConnectionError())
+    assert not RetryPolicy(retry_unknown=False).is_retryable(RuntimeError())
+    assert RetryPolicy(retry_if=lambda exc: isinstance(exc, ValueError)).is_retryable(ValueError())
+
+    calls, errors = [], []
+
+    def invalid():
+        calls.append(1)
+        raise ValueError("bad arguments")
+
+    node = Node(name="tool", exec=invalid, retry=RetryPolicy(max_attempts=5, delay=0.01))
+    node.exec_fallback = lambda state, exc: errors.append(exc) or "exit"
+    node.run({})
+    assert calls == [1]
+    assert isinstance(errors[0], ValueError)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+测试路由表：编译、内联子工作流与静态检查
+"""
+
+import asyncio
+import gc
+import os
+import sys
+import weakref
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import Flow, Node, Supervisor, Swarm
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def test_validate_inlined_sub_flow_is_reachable():
+    """内联的子工作流按其第一个节点分析，不会被报告为不可达"""
+    start = Node(name="start", exec=lambda: "inner")
+    a = Node(name="a", exec=lambda: "b")
+    b = Node(name="b", exec=lambda: "exit")
+    inner = Flow(name="inner")
+    inner[a >> b]
+    root = Flow(name="root")
+    root[start >> inner]
+    issues = root.validate().issues
+    assert not [issue for issue in issues if issue.kind == "unreachable"], issues
+
+
+def test_same_name_targets_coexist():
+    """连接以节点身份登记：连接到另一个同名节点时两者共存，默认路由到最近连接的节点"""
+    a, b1, b2 = Node(name="a"), Node(name="b"), Node(name="b")
+    a >> b1
+    a >> b2
+    targets = a.connections[a]
+    assert targets["b"] is b2
+    assert targets.candidates("b") == [b2, b1]
+    a.disconnect_from(b2)
+    assert targets["b"] is b1
+
+
+def test_rebuild_around_shared_nodes():
+    """每条消息新建同名的监督者节点并复用共享节点，每次运行都路由到自己的监督者"""
+    seen = []
+
+    def agent_exec(self, state):
+        seen.append(self.name)
+        return "chat_node"
+
+    agents = [Node(name=f"agent_{i}", exec=agent_exec) for i in range(2)]
+    for message in range(3):
+
+        def chat(state, message=message):
+            seen.append(message)
+            if state.get("done"):
+                return "exit"
+            state["done"] = True
+            return "agent_1"
+
+        sup = Supervisor(name="sup")[Node(name="chat_node", exec=chat), *agents]
+        sup.run({"done": False}, max_steps=10)
+    assert seen == [0, "agent_1", 0, 1, "agent_1", 1, 2, "agent_1", 2]
+
+
+def test_per_message_nodes_are_collected():
+    """共享节点指向每条消息新建的节点的连接是弱引用，丢弃的工作流和节点可以被回收"""
+    agents = [Node(name=f"agent_{i}", exec=lambda: "exit") for i in range(2)]
+    refs = []
+    for _ in range(20):
+        chat = Node(name="chat_node", exec=lambda: "agent_0")
+        Supervisor(name="sup")[chat, *agents].run({}, max_steps=5)
+        refs.append(weakref.ref(chat))
+    del chat
+    gc.collect()
+    gc.collect()
+    assert [ref for ref in refs if ref() is not None] == []
+    assert agents[0].connections[agents[0]].candidates("chat_node") == []
+
+
+def test_operator_edges_keep_target_alive():
+    """`>>` 建立的连接强引用目标节点，只由连接持有的节点不会被回收"""
+
+    def build() -> Flow:
+        a = Node(name="a", exec=lambda: "b")
+        b = Node(name="b", exec=lambda state: state.update(done=True))
+        a >> b
+        flow = Flow(name="flow")
+        flow[a]
+        return flow
+
+    flow = build()
+    gc.collect()
+    state = {}
+    flow.run(state)
+    assert state["done"]
+
+
+def build_nested(order: list, inline: bool) -> Flow:
+    def step(name: str, next_action: str) -> Node:
+        return Node(name=name, exec=lambda: order.append(name) or next_action)
+
+    inner = Flow(name="inner", inline=inline)
+    inner[step("x", "y") >> step("y", "b")]
+    root = Flow(name="root")
+    root[step("a", "inner") >> inner >> step("b", "exit")]
+    return root
+
+
+def test_inlined_sub_flow_runs_like_recursive():
+    """内联的子工作流与递归执行的执行顺序一致，内联后路由表中不再有子工作流"""
+    inlined, recursive = [], []
+    root = build_nested(inlined, inline=True)
+    root.run({}, max_steps=10)
+    build_nested(recursive, inline=False).run({}, max_steps=10)
+    assert inlined == recursive == ["a", "x", "y", "b"]
+    assert not any(isinstance(node, Flow) for node in root.routing().nodes)
+
+
+def test_entry_action_selects_start_node():
+    """entry_action 指定起始节点，不存在时抛出 ValueError"""
+    seen = []
+    a = Node(name="a", exec=lambda: seen.append("a") or "b")
+    b = Node(name="b", exec=lambda: seen.append("b") or "exit")
+    c = Node(name="c", exec=lambda: seen.append("c") or "exit")
+    flow = Flow(name="flow")
+    flow[a >> b, c]
+    flow.run({}, entry_action="c")
+    assert seen == ["c"]
+    with pytest.raises(ValueError, match="missing"):
+        flow.run({}, entry_action="missing")
+    flow -= c
+    with pytest.raises(ValueError):
+        flow.run({}, entry_action="c")
+
+
+def test_remove_node_drops_all_edges():
+    """-= 通过反向索引删除所有指向该节点的连接（显式与隐式）"""
+    agents = [Node(name=f"agent_{i}", exec=lambda: "exit") for i in range(3)]
+    swarm = Swarm(name="swarm")
+    swarm[agents]
+    upstream = Node(name="upstream", exec=lambda: "swarm")
+    upstream >> swarm
+    graph = swarm.graph
+    removed = agents[1]
+    swarm -= removed
+    assert graph.sources(removed) == []
+    assert graph.sources(removed, hidden=True) == []
+    for src, targets in (*graph.connections.items(), *graph.hidden_connections.items()):
+        assert removed not in targets.values(), src
+    assert removed not in swarm.routing().nodes
+
+
+def test_update_adds_and_removes_in_one_batch():
+    """update 先删后增，路由表只重新编译一次；要删除的节点不在容器内时不做任何修改"""
+    a, b, c = Node(name="a"), Node(name="b"), Node(name="c")
+    swarm = Swarm(name="swarm")
+    swarm[a, b]
+    before = swarm.routing()
+    swarm.update(add=[c], remove=[a])
+    routing = swarm.routing()
+    assert routing is not before and swarm.routing() is routing
+    assert [node.name for node in routing.container] == ["b", "c"]
+    assert swarm.graph.sources(a, hidden=True) == []
+    with pytest.raises(ValueError):
+        swarm.update(add=[a], remove=[Node(name="stranger")])
+    assert [node.name for node in swarm.routing().container] == ["b", "c"]
+
+
+def test_running_flow_keeps_routing_snapshot():
+    """执行中修改工作流：进行中的运行按开始时的结构执行完，新运行使用新结构"""
+    trace = []
+
+    async def slow():
+        trace.append("a")
+        await asyncio.sleep(0.05)
+        return "b"
+
+    async def fast():
+        trace.append("b")
+
+    a, b = Node(name="a", aexec=slow), Node(name="b", aexec=fast)
+    flow = Flow(name="flow")
+    flow[a >> b]
+
+    async def main():
+        running = asyncio.ensure_future(flow.arun({}))
+        await asyncio.sleep(0.01)
+        flow.update(remove=[b])
+        await flow.arun({})
+        await running
+
+    asyncio.run(main())
+    assert trace.count("a") == 2
+    assert trace.count("b") == 1
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+测试同步调用入口的执行器：事件循环复用、运行中事件循环里的同步执行与错误处理
+"""
+
+import asyncio
+import gc
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import Bulkhead, Flow, Node
+from agnflow.core.flow import ParallelFlow
+from agnflow.core.runner import get_runner
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def build_flow(exec) -> ParallelFlow:
+    """ParallelFlow 不是纯同步图，run 会经过事件循环"""
+    flow = ParallelFlow(name="pf")
+    flow[Node(name="n", exec=exec)]
+    return flow
+
+
+def test_run_error_has_no_event_loop_context():
+    """run 抛出的异常不会附带“no running event loop”的异常上下文"""
+
+    def boom():
+        raise KeyError("boom")
+
+    with pytest.raises(KeyError) as info:
+        build_flow(boom).run({})
+    assert info.value.__context__ is None
+
+
+def test_run_inside_running_loop():
+    """在运行中的事件循环里同步执行非纯同步图时，交给后台事件循环执行并返回结果"""
+
+    def record(state):
+        state["thread"] = threading.current_thread().name
+        return "exit"
+
+    flow = build_flow(record)
+    state = {}
+
+    async def main():
+        return flow.run(state), threading.current_thread().name
+
+    result, caller = asyncio.run(main())
+    assert result == "exit"
+    assert state["thread"] != caller
+
+
+def test_sync_graph_check_is_cached():
+    """是否为纯同步图的判断缓存在路由表快照上，图结构变更后重新判断"""
+    a, b = Node(name="a"), Node(name="b", bulkhead=Bulkhead(1))
+    flow = Flow(name="flow")
+    flow[a]
+    assert flow._is_sync_graph()
+    assert flow.routing().sync is True
+    flow += b
+    assert flow.routing().sync is None
+    assert not flow._is_sync_graph()
+    assert flow.routing().sync is False
+
+
+def test_thread_event_loops_are_released():
+    """短生命周期线程的事件循环在线程结束后释放"""
+    flow = build_flow(lambda: "exit")
+    runners = get_runner()._runners
+    before = len(runners)
+    threads = [threading.Thread(target=flow.run, args=({},)) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+        thread.join()
+    del threads, thread
+    gc.collect()
+    assert len(runners) <= before
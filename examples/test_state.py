@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+测试 state 增量记录：TrackedState 记录变更、运行结束时写回调用方的 state
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import Flow, MemoryCheckpointer, Node
+from agnflow.core.state import TrackedState
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def test_tracked_state_records_deltas():
+    """写入、删除与读取后可能原地修改的键记入增量，commit 后清空记录"""
+    state = TrackedState({"question": "q", "messages": [], "tmp": 1, "config": {"k": 1}})
+    state["answer"] = "a"
+    state["messages"].append("hi")
+    del state["tmp"]
+    assert state.changed_keys() == {"answer", "messages"}
+    delta = state.commit()
+    assert delta.updates == {"answer": "a", "messages": ["hi"]}
+    assert delta.deleted == ("tmp",)
+    assert not state.commit()
+
+    # 通过 items()/values() 取得的值不会被记录
+    for _, value in state.items():
+        if isinstance(value, dict):
+            value["k"] = 2
+    assert not state.delta()
+    # setdefault 已有的不可变值不算变更
+    state.setdefault("answer", "b")
+    state.pop("question")
+    delta = state.commit()
+    assert delta.updates == {} and delta.deleted == ("question",)
+
+
+def test_tracked_run_writes_back_when_run_ends():
+    """配置了检查点时节点在 state 的副本上执行，调用方的 dict 在运行结束时才写回"""
+    caller = {"question": "q", "tmp": 1}
+    seen = {}
+
+    def answer(state):
+        state["answer"] = "a"
+        state.pop("tmp")
+        return "check"
+
+    def check(state):
+        seen["caller"] = dict(caller)
+        seen["state"] = dict(state)
+
+    flow = Flow(name="flow", checkpointer=MemoryCheckpointer())
+    flow[Node(name="answer", exec=answer) >> Node(name="check", exec=check)]
+    flow.run(caller)
+    assert seen["caller"] == {"question": "q", "tmp": 1}
+    assert seen["state"] == {"question": "q", "answer": "a"}
+    assert caller == {"question": "q", "answer": "a"}
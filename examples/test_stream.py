@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+测试事件流：astream 事件顺序、错误处理与提前退出时的清理
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import DeadlineExceeded, Flow, Node
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def test_astream_event_order():
+    """事件按 run_start → (node_start → 自定义事件 → node_end → action → state_delta)* → run_end 产出"""
+
+    async def first(self, state):
+        self.emit("token", "he")
+        self.emit("token", "llo")
+        state["text"] = "hello"
+        return "second"
+
+    async def second(state):
+        state["done"] = True
+
+    flow = Flow(name="flow")
+    flow[Node(name="first", aexec=first) >> Node(name="second", aexec=second)]
+    state = {}
+
+    async def main():
+        return [event async for event in flow.astream(state)]
+
+    events = asyncio.run(main())
+    assert [(event.type, event.node) for event in events] == [
+        ("run_start", "flow"),
+        ("node_start", "first"),
+        ("token", "first"),
+        ("token", "first"),
+        ("node_end", "first"),
+        ("action", "first"),
+        ("state_delta", "flow"),
+        ("node_start", "second"),
+        ("node_end", "second"),
+        ("action", "second"),
+        ("state_delta", "flow"),
+        ("run_end", "flow"),
+    ]
+    assert "".join(event.data for event in events if event.type == "token") == "hello"
+    deltas = [event.data for event in events if event.type == "state_delta"]
+    assert deltas == [{"updates": {"text": "hello"}, "deleted": []}, {"updates": {"done": True}, "deleted": []}]
+    assert len({event.run_id for event in events}) == 1
+    assert state == {"text": "hello", "done": True}
+
+
+def test_astream_reports_node_errors_and_reraises_run_errors():
+    """节点出错时产出 error 事件并按 error 路由；终止运行的异常在迭代结束时重新抛出"""
+
+    async def boom():
+        raise RuntimeError("boom")
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    flow = Flow(name="flow")
+    flow[Node(name="boom", aexec=boom) >> Node(name="error", aexec=slow)]
+    events = []
+
+    async def main():
+        async for event in flow.astream({}, timeout=0.05):
+            events.append(event)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+    errors = [event for event in events if event.type == "error"]
+    assert len(errors) == 1 and errors[0].node == "boom" and "boom" in errors[0].data["error"]
+    # 出错的一步没有修改 state，不产出 state_delta
+    assert [event.type for event in events][-3:] == ["node_end", "action", "node_start"]
+    assert "run_end" not in [event.type for event in events]
+
+
+def test_astream_break_cancels_run_and_writes_back():
+    """消费者提前退出迭代时取消仍在执行的节点，调用方的 dict 写回已完成的部分"""
+    cancelled = []
+
+    async def first(state):
+        state["first"] = True
+        return "slow"
+
+    async def slow(state):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        state["slow"] = True
+
+    flow = Flow(name="flow")
+    flow[Node(name="first", aexec=first) >> Node(name="slow", aexec=slow)]
+    state = {}
+
+    async def main():
+        async for event in flow.astream(state):
+            if event.type == "node_start" and event.node == "slow":
+                break
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert cancelled == [1]
+    assert state == {"first": True}
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+测试时限与取消：节点 timeout、运行整体期限（DeadlineExceeded）、arun 被取消
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../src"))
+
+from agnflow.core import DeadlineExceeded, Flow, Node
+from agnflow.utils.log import set_quiet
+
+set_quiet()
+
+
+def record_fallback(node: Node, errors: list) -> Node:
+    node.exec_fallback = lambda state, exc: errors.append(exc) or "exit"
+
+    async def afallback(state, exc):
+        errors.append(exc)
+        return "exit"
+
+    node.aexec_fallback = afallback
+    return node
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_node_timeout_retries_then_falls_back(is_async):
+    """节点 timeout 限制每次尝试，超时抛出 TimeoutError，按重试次数重试后交给 exec_fallback"""
+    calls, errors = [], []
+
+    def block():
+        calls.append(1)
+        time.sleep(0.3)
+
+    async def wait():
+        calls.append(1)
+        await asyncio.sleep(0.3)
+
+    node = record_fallback(Node(name="slow", exec=block, aexec=wait, timeout=0.03, max_retries=2), errors)
+    start = time.perf_counter()
+    if is_async:
+        asyncio.run(node.arun({}))
+    else:
+        node.run({})
+    assert time.perf_counter() - start < 0.25
+    assert len(calls) == 2
+    assert len(errors) == 1
+    assert type(errors[0]) is TimeoutError
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_run_deadline_raises_without_retry(is_async):
+    """运行整体期限早于节点 timeout 时抛出 DeadlineExceeded，不重试也不交给 exec_fallback"""
+    calls, errors = [], []
+
+    def block():
+        calls.append(1)
+        time.sleep(0.3)
+
+    async def wait():
+        calls.append(1)
+        await asyncio.sleep(0.3)
+
+    node = record_fallback(Node(name="slow", exec=block, aexec=wait, timeout=1, max_retries=3), errors)
+    flow = Flow(name="flow")
+    flow[node]
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        if is_async:
+            asyncio.run(flow.arun({}, timeout=0.05))
+        else:
+            flow.run({}, timeout=0.05)
+    assert time.perf_counter() - start < 0.25
+    assert calls == [1]
+    assert errors == []
+
+
+@pytest.mark.parametrize("is_async", [False, True])
+def test_deadline_checked_before_next_node(is_async):
+    """期限用完后不再开始下一个节点"""
+    seen = []
+
+    def first():
+        seen.append("first")
+        time.sleep(0.06)
+        return "second"
+
+    async def afirst():
+        return first()
+
+    async def asecond():
+        seen.append("second")
+
+    flow = Flow(name="flow")
+    flow[
+        Node(name="first", exec=first, aexec=afirst)
+        >> Node(name="second", exec=lambda: seen.append("second"), aexec=asecond)
+    ]
+    with pytest.raises(DeadlineExceeded):
+        if is_async:
+            asyncio.run(flow.arun({}, timeout=0.03))
+        else:
+            flow.run({}, timeout=0.03)
+    assert seen == ["first"]
+
+
+def test_cancelled_arun_stops_node():
+    """arun 被取消时执行中的 aexec 收到取消，不重试也不交给 aexec_fallback"""
+    calls, errors, cancelled = [], [], []
+
+    async def wait():
+        calls.append(1)
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    node = record_fallback(Node(name="slow", aexec=wait, max_retries=3), errors)
+    flow = Flow(name="flow")
+    flow[node]
+
+    async def main():
+        task = asyncio.ensure_future(flow.arun({}))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert calls == [1] and cancelled == [1]
+    assert errors == []
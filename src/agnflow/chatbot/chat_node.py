@@ -148,8 +148,9 @@ class ChatNode(WebNode):
                         print(f"工具 {name} 未找到")
                     tool_xml = ""  # 清空XML缓存
 
-                # 📮 发送中间消息（流式推送给前端）
+                # 📮 发送中间消息（流式推送给前端），并作为 token 事件转发给 astream 的消费者
                 await self.send_text(type="chunk", content=chunk_content)
+                self.emit("token", chunk_content)
 
             # 📮 发送工具上下文消息（如有工具调用结果）
             if tool_context:
@@ -28,7 +28,7 @@ from fastapi import WebSocket, WebSocketDisconnect
 
 from agnflow.chatbot.chatbot_db import chat_db
 from agnflow.agent.llm import tool_map
-from agnflow.core import Flow
+from agnflow.core import Flow, DeadlineExceeded
 from agnflow.chatbot.chat_node import ChatNode
 from agnflow.chatbot.type import ChatState
 
@@ -36,6 +36,8 @@ from agnflow.chatbot.type import ChatState
 # Redis连接配置 - 支持环境变量
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+# 单条消息处理的整体期限（秒）
+CHAT_TIMEOUT = float(os.getenv("CHAT_TIMEOUT", "600"))
 
 
 async def publisher(state: ChatState):
@@ -53,12 +55,46 @@ async def publisher(state: ChatState):
         await redis_client.publish(channel=channel, message=json.dumps({"type": "disconnect"}))
 
 
+async def handle_messages(state: ChatState, messages: asyncio.Queue):
+    """按顺序处理收到的消息，每条消息执行一次聊天工作流"""
+    while True:
+        message_data: dict = await messages.get()
+        entry_action: str = message_data.get("entry_action", "chat_node")
+
+        state["user_message"] = message_data.get("content", "")
+        state["options"] = message_data.get("options", {})
+        agent_nodes: list = state.get("agent_nodes", [])
+
+        # 处理代理配置
+        agent_config = message_data.get("agent_config", {})
+        if agent_config:
+            for k, v in agent_config.items():
+                state[k] = v
+
+        # 执行聊天处理（超过 CHAT_TIMEOUT 秒时取消正在执行的节点）
+        chat_node = ChatNode(name="chat_node")
+        flow = Flow()
+        flow[chat_node, *agent_nodes]
+        try:
+            await flow.arun(state, entry_action=entry_action, timeout=CHAT_TIMEOUT)
+        except DeadlineExceeded as e:
+            print(f"聊天处理超时: {e}")
+        except Exception as e:
+            print(f"聊天处理错误: {e}")
+
+
 async def subscriber(state: ChatState):
-    """订阅者协程，从Redis频道接收消息并处理"""
+    """订阅者协程，从Redis频道接收消息并处理
+
+    工作流在单独的任务中执行，订阅者始终可以收到断开消息；
+    客户端断开时取消正在执行的工作流，立即释放节点占用的资源（如 LLM 流式请求）
+    """
     channel = f"chat:{state['conversation']}"
 
     pubsub: PubSub = redis_client.pubsub()
     await pubsub.subscribe(channel)
+    messages: asyncio.Queue = asyncio.Queue()
+    worker = asyncio.create_task(handle_messages(state, messages))
     try:
         async for message in pubsub.listen():
             # print(f"🟢 redis -> workflow 接收消息: \n{message}")
@@ -67,28 +103,14 @@ async def subscriber(state: ChatState):
                 if data == '{"type": "disconnect"}':
                     break
 
-                # 处理接收到的消息
-                message_data: dict = json.loads(data)
-                entry_action: str = message_data.get("entry_action", "chat_node")
-
-                state["user_message"] = message_data.get("content", "")
-                state["options"] = message_data.get("options", {})
-                agent_nodes: list = state.get("agent_nodes", [])
-                
-                # 处理代理配置
-                agent_config = message_data.get("agent_config", {})
-                if agent_config:
-                    for k, v in agent_config.items():
-                        state[k] = v
-                
-                # 执行聊天处理
-                chat_node = ChatNode()
-                flow = Flow()
-                flow[chat_node, *agent_nodes]
-                await flow.arun(state, entry_action=entry_action)
+                # 交给工作流任务处理接收到的消息
+                messages.put_nowait(json.loads(data))
     except Exception as e:
         print(f"订阅者错误: {e}")
     finally:
+        # 取消正在执行的工作流，等待节点完成清理（不关心取消时产生的异常）
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
         await pubsub.unsubscribe(channel)
         await pubsub.aclose()
 
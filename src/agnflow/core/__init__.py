@@ -1,2 +1,7 @@
-from agnflow.core.node import Node
+from agnflow.core.node import Node, MapNode
 from agnflow.core.flow import Flow, Supervisor, Swarm
+from agnflow.core.connection import set_auto_name
+from agnflow.core.checkpoint import Checkpointer, MemoryCheckpointer, FileCheckpointer, SQLiteCheckpointer
+from agnflow.core.context import DeadlineExceeded
+from agnflow.core.policy import RetryPolicy, CircuitBreaker, Bulkhead
+from agnflow.core.cache import Cache, MemoryCache, DiskCache
@@ -0,0 +1,266 @@
+"""工作流静态分析
+
+在执行前检查编译后的路由表，提前发现只有运行时才会暴露的路由问题：
+- dangling_action 节点声明（`Literal[...]` 返回值注解）会返回的 action 没有对应的下一个节点（运行时会直接结束）
+- cycle_without_exit 环路中的节点都不会返回 exit 或离开环路的 action（只能跑满 max_steps）
+- unreachable 容器内的节点从默认起始节点出发不可达（只能通过 entry_action 进入）
+- name_collision 同一个工作流中的不同节点同名，action 即节点名称，路由时无法区分它们
+- no_start_node 容器为空
+
+示例：
+```python
+report = flow.validate()
+if not report.ok:
+    print(report)
+flow.validate(strict=True)  # 有错误时抛出 ValueError
+```
+"""
+
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Literal, Union, get_args, get_origin, get_type_hints
+import inspect, types
+
+if TYPE_CHECKING:
+    from agnflow.core.connection import Connection
+
+IssueLevel = Literal["error", "warning"]
+
+# 表示工作流结束的 action
+EXIT_ACTIONS = frozenset({"exit", "max_steps_exceeded"})
+
+
+class Issue:
+    """一条分析结果
+
+    数据：
+    - level error（运行结果会出错）或 warning（可能出错）
+    - kind 问题类型，见模块说明
+    - flow 所在工作流名称
+    - node 相关节点名称
+    - message 说明
+    """
+
+    __slots__ = ("level", "kind", "flow", "node", "message")
+
+    def __init__(self, level: IssueLevel, kind: str, flow: str, node: str | None, message: str):
+        self.level = level
+        self.kind = kind
+        self.flow = flow
+        self.node = node
+        self.message = message
+
+    def __repr__(self) -> str:
+        return f"Issue({self.level}, {self.kind}, flow={self.flow!r}, node={self.node!r})"
+
+    def __str__(self) -> str:
+        return f"[{self.level}] {self.flow}: {self.message}"
+
+
+class ValidationReport:
+    """`Flow.validate()` 的分析报告（按图的版本号缓存，连接关系变化后重新分析）
+
+    数据：
+    - flow 被分析的工作流名称
+    - issues 所有问题（包含嵌套工作流的问题）
+    - actions 各节点声明的 action {节点名称: frozenset}，无法确定的节点不在其中
+    """
+
+    __slots__ = ("flow", "issues", "actions")
+
+    def __init__(self, flow: str, issues: list[Issue] = None, actions: dict[str, frozenset[str]] = None):
+        self.flow = flow
+        self.issues: list[Issue] = issues or []
+        self.actions: dict[str, frozenset[str]] = actions or {}
+
+    def __repr__(self) -> str:
+        return f"ValidationReport(flow={self.flow!r}, errors={len(self.errors)}, warnings={len(self.warnings)})"
+
+    def __str__(self) -> str:
+        if not self.issues:
+            return f"{self.flow}: ok"
+        return "\n".join(str(issue) for issue in self.issues)
+
+    def __bool__(self) -> bool:
+        return self.ok
+
+    @property
+    def ok(self) -> bool:
+        """没有错误（可以有警告）"""
+        return not self.errors
+
+    @property
+    def errors(self) -> list[Issue]:
+        return [issue for issue in self.issues if issue.level == "error"]
+
+    @property
+    def warnings(self) -> list[Issue]:
+        return [issue for issue in self.issues if issue.level == "warning"]
+
+
+def literal_actions(annotation: Any) -> frozenset[str] | None:
+    """从返回值注解提取 action 集合，无法确定时返回 None
+
+    - Literal["a", "b"] / Literal["a"] | Literal["b"] → {"a", "b"}
+    - tuple[Literal["a"], dict] → {"a"}
+    - dict / None → {"exit"}（返回 state 更新或不返回时流程结束）
+    """
+    if annotation is None or annotation is type(None):
+        return frozenset({"exit"})
+    if annotation is dict:
+        return frozenset({"exit"})
+    origin = get_origin(annotation)
+    if origin is Literal:
+        values = get_args(annotation)
+        if not all(isinstance(value, str) for value in values):
+            return None
+        return frozenset(values)
+    if origin is Union or origin is types.UnionType:
+        actions: set[str] = set()
+        for arg in get_args(annotation):
+            sub = literal_actions(arg)
+            if sub is None:
+                return None
+            actions |= sub
+        return frozenset(actions)
+    if origin is dict:
+        return frozenset({"exit"})
+    if origin is tuple:
+        for arg in get_args(annotation):
+            if get_origin(arg) in (Literal, Union, types.UnionType):
+                return literal_actions(arg)
+        return frozenset({"exit"})
+    return None
+
+
+def executor_actions(executor: Callable) -> frozenset[str] | None:
+    """执行器返回值注解中声明的 action，没有注解或无法解析时返回 None"""
+    try:
+        annotation = get_type_hints(executor).get("return", inspect.Signature.empty)
+    except Exception:
+        try:
+            annotation = inspect.signature(executor).return_annotation
+        except (TypeError, ValueError):
+            return None
+    if annotation is inspect.Signature.empty or isinstance(annotation, str):
+        return None
+    return literal_actions(annotation)
+
+
+def strongly_connected(nodes: Iterable["Connection"], edges: dict["Connection", set["Connection"]]) -> list[list]:
+    """Tarjan 算法（迭代实现）求强连通分量"""
+    index: dict = {}
+    low: dict = {}
+    stack: list = []
+    on_stack: set = set()
+    components: list[list] = []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(edges.get(root, ())))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(edges.get(child, ()))))
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member is node:
+                            break
+                    components.append(component)
+    return components
+
+
+def analyze_routes(
+    flow: str,
+    members: list["Connection"],
+    nodes: Iterable["Connection"],
+    routes: dict[tuple["Connection", str], "Connection"],
+    actions: dict["Connection", frozenset[str] | None],
+) -> list[Issue]:
+    """分析一个工作流的路由表
+
+    - members 容器内的节点（第一个为默认起始节点）
+    - nodes 编译得到的可达节点
+    - routes 编译后的路由表 {(node, action): target}
+    - actions 各节点声明的 action，None 表示无法确定
+    """
+    issues: list[Issue] = []
+    nodes = list(nodes)
+    if not members:
+        issues.append(Issue("warning", "no_start_node", flow, None, "容器为空，没有起始节点"))
+        return issues
+
+    # 同名节点：action 即节点名称，同一个工作流中的同名节点无法通过 action 区分
+    by_name: dict[str, list] = {}
+    for node in dict.fromkeys([*members, *nodes]):
+        by_name.setdefault(node.name, []).append(node)
+    for name, same in by_name.items():
+        if len(same) > 1:
+            issues.append(
+                Issue("warning", "name_collision", flow, name, f"{len(same)} 个不同的节点同名 {name}，路由时无法区分")
+            )
+
+    edges: dict = {}
+    for (src, _action), tgt in routes.items():
+        edges.setdefault(src, set()).add(tgt)
+
+    # 声明的 action 没有对应的下一个节点
+    for node in nodes:
+        declared = actions.get(node)
+        for action in sorted(declared or ()):
+            if action not in EXIT_ACTIONS and (node, action) not in routes:
+                issues.append(
+                    Issue("error", "dangling_action", flow, node.name, f"节点 {node.name} 的 action '{action}' 没有对应的下一个节点")
+                )
+
+    # 从默认起始节点不可达
+    entry = members[0]
+    reached = {entry}
+    pending = [entry]
+    while pending:
+        for tgt in edges.get(pending.pop(), ()):
+            if tgt not in reached:
+                reached.add(tgt)
+                pending.append(tgt)
+    for node in members:
+        if node not in reached:
+            issues.append(
+                Issue("warning", "unreachable", flow, node.name, f"节点 {node.name} 从起始节点 {entry.name} 不可达")
+            )
+
+    # 没有出口的环路：环路中每个节点声明的 action 都路由到环路内部
+    for component in strongly_connected(nodes, edges):
+        if len(component) == 1 and component[0] not in edges.get(component[0], ()):
+            continue
+        inside = set(component)
+        closed = all(
+            actions.get(node) is not None
+            and all(action not in EXIT_ACTIONS and routes.get((node, action)) in inside for action in actions[node])
+            for node in component
+        )
+        if closed:
+            names = ", ".join(sorted(node.name for node in component))
+            issues.append(
+                Issue("error", "cycle_without_exit", flow, component[0].name, f"环路 [{names}] 没有出口，只能执行到 max_steps")
+            )
+    return issues
@@ -0,0 +1,276 @@
+"""批量执行
+
+同一个工作流在多个独立的 state 上执行（如离线评测、对比提示词修改的效果）：
+- 整个批次共享同一个路由表快照和节点的执行器绑定，只检查/编译一次
+- 纯同步图不创建事件循环，在 concurrency 个工作线程中直接执行（阻塞的同步节点也能并发）；
+  其他情况在一个事件循环中以 concurrency 个运行并发执行
+- 结果按完成顺序产出，单个 state 出错不会中断批次（异常保存在结果的 error 中）
+- `stats` 统计完成数、失败数、耗时、吞吐量与延迟分位数
+
+示例：
+```python
+batch = flow.run_batch(states, concurrency=16)
+for item in batch:
+    print(item.index, item.result, item.error)
+print(batch.stats)
+
+async for item in flow.arun_batch(states, concurrency=16):
+    ...
+```
+"""
+
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable, Iterator
+import asyncio, queue, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+from agnflow.core.runner import get_runner
+
+if TYPE_CHECKING:
+    from agnflow.core.flow import Flow
+
+
+class BatchResult:
+    """批次中一次运行的结果
+
+    数据：
+    - index state 在输入中的序号
+    - state 执行后的 state（与输入是同一个对象）
+    - result 工作流的返回值，出错时为 None
+    - error 运行抛出的异常，成功时为 None
+    - elapsed 运行耗时（秒）
+    """
+
+    __slots__ = ("index", "state", "result", "error", "elapsed")
+
+    def __init__(self, index: int, state: dict, result: Any = None, error: BaseException = None, elapsed: float = 0.0):
+        self.index = index
+        self.state = state
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__(self) -> str:
+        outcome = f"error={self.error!r}" if self.error is not None else f"result={self.result!r}"
+        return f"BatchResult(index={self.index}, {outcome}, elapsed={self.elapsed:.3f})"
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class BatchStats:
+    """批次的执行统计（边执行边更新，可以在迭代过程中读取）
+
+    数据：
+    - completed 已完成的运行数（包含失败的运行）
+    - failed 失败的运行数
+    - latencies 各运行的耗时（秒，按完成顺序）
+    """
+
+    __slots__ = ("completed", "failed", "latencies", "started", "finished", "_lock")
+
+    def __init__(self):
+        # 纯同步图的批次在多个工作线程中记录结果
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.latencies: list[float] = []
+        self.started: float | None = None
+        self.finished: float | None = None
+
+    def __repr__(self) -> str:
+        return f"BatchStats(completed={self.completed}, failed={self.failed}, throughput={self.throughput:.1f}/s)"
+
+    def __str__(self) -> str:
+        return (
+            f"完成 {self.completed} 次运行（失败 {self.failed}），耗时 {self.elapsed:.2f}s，"
+            f"吞吐量 {self.throughput:.1f} 次/s，延迟 p50 {self.percentile(50) * 1000:.1f}ms "
+            f"p95 {self.percentile(95) * 1000:.1f}ms"
+        )
+
+    def start(self):
+        if self.started is None:
+            self.started = time.perf_counter()
+
+    def finish(self):
+        if self.started is not None and self.finished is None:
+            self.finished = time.perf_counter()
+
+    def record(self, item: BatchResult):
+        with self._lock:
+            self.completed += 1
+            if item.error is not None:
+                self.failed += 1
+            self.latencies.append(item.elapsed)
+
+    @property
+    def elapsed(self) -> float:
+        """批次的总耗时（秒），执行中为已经过的时间"""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        """每秒完成的运行数"""
+        elapsed = self.elapsed
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+    def percentile(self, q: float) -> float:
+        """运行耗时的 q 分位数（秒，0 <= q <= 100），没有结果时为 0"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+class BatchRun:
+    """一个批次（`Flow.run_batch`/`Flow.arun_batch` 的返回值），迭代时开始执行，只能迭代一次
+
+    - `for item in batch` 同步迭代：纯同步图在 concurrency 个工作线程中直接执行（concurrency=1 时在当前线程逐个执行），
+      其他情况在后台事件循环中并发执行
+    - `async for item in batch` 在当前事件循环中并发执行
+    - 提前退出迭代会取消仍在执行的运行（工作线程中正在执行的运行会执行完，不再开始新的运行）
+    """
+
+    def __init__(
+        self,
+        flow: "Flow",
+        states: Iterable[dict],
+        concurrency: int = 8,
+        max_steps: int = 10,
+        entry_action: str = None,
+        timeout: float = None,
+        is_async: bool = True,
+    ):
+        if concurrency < 1:
+            raise ValueError(f"concurrency 必须大于 0，当前为 {concurrency}")
+        self.flow = flow
+        self.states = states
+        self.concurrency = concurrency
+        self.max_steps = max_steps
+        self.entry_action = entry_action
+        self.timeout = timeout
+        self.is_async = is_async
+        self.stats = BatchStats()
+        # 整个批次共享的路由表快照 {工作流: Routing}，第一次运行时固定
+        self._routing: dict = {}
+        self._started = False
+
+    def __repr__(self) -> str:
+        return f"BatchRun(flow={self.flow.name!r}, concurrency={self.concurrency}, stats={self.stats!r})"
+
+    def _begin(self) -> Iterator[tuple[int, dict]]:
+        if self._started:
+            raise RuntimeError("批次只能迭代一次")
+        self._started = True
+        self.stats.start()
+        return enumerate(self.states)
+
+    async def _run_one(self, index: int, state: dict) -> BatchResult:
+        start = time.perf_counter()
+        try:
+            result = await self.flow._run_workflow(
+                state, self.max_steps, self.entry_action, self.is_async, timeout=self.timeout, routing=self._routing
+            )
+            item = BatchResult(index, state, result, None, time.perf_counter() - start)
+        except Exception as e:
+            item = BatchResult(index, state, None, e, time.perf_counter() - start)
+        self.stats.record(item)
+        return item
+
+    async def __aiter__(self) -> AsyncIterator[BatchResult]:
+        items = self._begin()
+        results: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        async def worker():
+            # 所有 worker 共享同一个输入迭代器，输入可以是惰性生成的
+            for index, state in items:
+                results.put_nowait(await self._run_one(index, state))
+
+        async def run_all():
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                results.put_nowait(done)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        task = asyncio.ensure_future(run_all())
+        try:
+            while (item := await results.get()) is not done:
+                yield item
+            await task
+        finally:
+            for future in (*workers, task):
+                if not future.done():
+                    future.cancel()
+            self.stats.finish()
+
+    def __iter__(self) -> Iterator[BatchResult]:
+        # ⭐️ 纯同步图：不创建事件循环，在 concurrency 个工作线程中直接执行
+        if not self.is_async and self.flow._is_sync_graph():
+            items = self._begin()
+            try:
+                if self.concurrency == 1:
+                    for index, state in items:
+                        yield get_runner().run_inline(self._run_one(index, state))
+                else:
+                    yield from self._iter_threads(items)
+            finally:
+                self.stats.finish()
+            return
+
+        # ⭐️ 其他情况：在后台事件循环中并发执行，结果通过线程安全的队列逐个交给调用方
+        results: queue.SimpleQueue = queue.SimpleQueue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in self:
+                    results.put(item)
+            finally:
+                results.put(done)
+
+        future = get_runner().submit(pump())
+        try:
+            while (item := results.get()) is not done:
+                yield item
+            future.result()
+        finally:
+            future.cancel()
+
+    def _iter_threads(self, items: Iterator[tuple[int, dict]]) -> Iterator[BatchResult]:
+        """纯同步图：concurrency 个工作线程共享输入迭代器，结果通过线程安全的队列按完成顺序逐个交给调用方"""
+        results: queue.SimpleQueue = queue.SimpleQueue()
+        done = object()
+        lock = threading.Lock()
+        stopped = threading.Event()
+
+        def worker():
+            try:
+                while not stopped.is_set():
+                    # 输入可以是惰性生成的，迭代器不是线程安全的
+                    with lock:
+                        entry = next(items, None)
+                    if entry is None:
+                        return
+                    results.put(get_runner().run_inline(self._run_one(*entry)))
+            finally:
+                results.put(done)
+
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="agnflow-batch")
+        futures = [pool.submit(worker) for _ in range(self.concurrency)]
+        try:
+            running = len(futures)
+            while running:
+                item = results.get()
+                if item is done:
+                    running -= 1
+                else:
+                    yield item
+            for future in futures:
+                future.result()
+        finally:
+            stopped.set()
+            pool.shutdown(wait=False, cancel_futures=True)
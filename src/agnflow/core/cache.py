@@ -0,0 +1,160 @@
+from typing import TYPE_CHECKING, Any
+from collections import OrderedDict
+from pathlib import Path
+import hashlib, os, pickle, struct, threading, time
+
+if TYPE_CHECKING:
+    from agnflow.core.node import ExecBinding
+
+# 缓存记录：(执行结果, 节点写入的键 {key: value}, 节点删除的键)
+CacheEntry = tuple[Any, dict[str, Any], tuple[str, ...]]
+
+
+class Cache:
+    """节点结果缓存后端基类
+
+    - 键由节点标识与执行器读取的 state 键的值计算（`cache_key`）
+    - 值为序列化后的缓存记录，命中时反序列化得到新的副本，原地修改不会影响缓存
+    - 子类实现 `get_bytes`/`set_bytes`/`delete`/`clear`，需要线程安全（线程池中的节点会并发访问）
+    """
+
+    def get_bytes(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    def set_bytes(self, key: str, data: bytes):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get(self, key: str) -> CacheEntry | None:
+        """读取缓存记录，未命中或已过期时返回 None"""
+        data = self.get_bytes(key)
+        return None if data is None else pickle.loads(data)
+
+    def set(self, key: str, entry: CacheEntry) -> bool:
+        """保存缓存记录，无法序列化时不保存并返回 False"""
+        try:
+            data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False
+        self.set_bytes(key, data)
+        return True
+
+
+class MemoryCache(Cache):
+    """内存缓存 - LRU 淘汰 + 可选的过期时间
+
+    - maxsize 最多保存的记录数，超出时淘汰最久未使用的记录，None 表示不限制
+    - ttl 记录的有效期（秒），None 表示不过期
+    """
+
+    def __init__(self, maxsize: int | None = 1024, ttl: float = None):
+        if maxsize is not None and maxsize < 1:
+            raise ValueError(f"maxsize 必须大于 0，当前为 {maxsize}")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[float | None, bytes]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_bytes(self, key: str) -> bytes | None:
+        with self.lock:
+            record = self.entries.get(key)
+            if record is None:
+                return None
+            expires, data = record
+            if expires is not None and time.monotonic() >= expires:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return data
+
+    def set_bytes(self, key: str, data: bytes):
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self.lock:
+            self.entries[key] = (expires, data)
+            self.entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class DiskCache(Cache):
+    """磁盘缓存 - 每条记录一个文件，可跨进程、跨运行复用（如重复执行评测集）
+
+    - path 缓存目录
+    - ttl 记录的有效期（秒），None 表示不过期
+
+    文件格式：8 字节过期时间（time.time() 时间戳，0 表示不过期）+ 序列化后的记录，先写临时文件再原子替换
+    """
+
+    _HEADER = struct.Struct(">d")
+
+    def __init__(self, path: str | Path, ttl: float = None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.pkl"
+
+    def get_bytes(self, key: str) -> bytes | None:
+        try:
+            raw = self._file(key).read_bytes()
+        except OSError:
+            return None
+        if len(raw) < self._HEADER.size:
+            return None
+        (expires,) = self._HEADER.unpack_from(raw)
+        if expires and time.time() >= expires:
+            self.delete(key)
+            return None
+        return raw[self._HEADER.size :]
+
+    def set_bytes(self, key: str, data: bytes):
+        expires = 0.0 if self.ttl is None else time.time() + self.ttl
+        file = self._file(key)
+        tmp = file.with_name(f"{file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(self._HEADER.pack(expires) + data)
+        os.replace(tmp, file)
+
+    def delete(self, key: str):
+        try:
+            self._file(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for file in self.path.glob("*.pkl"):
+            file.unlink(missing_ok=True)
+
+
+def cache_key(namespace: str, binding: "ExecBinding", state: dict) -> str | None:
+    """根据执行器读取的 state 键的值计算缓存键
+
+    - namespace 区分不同节点/执行器
+    - 执行器声明 state 参数时使用整个 state
+    - 值无法序列化时返回 None（不缓存）
+    """
+    keys = sorted(state) if binding.wants_state else [key for key in binding.keys if key in state]
+    # 绕过 TrackedState 的读取记录
+    values = [(key, dict.__getitem__(state, key)) for key in keys]
+    try:
+        data = pickle.dumps((namespace, values), protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
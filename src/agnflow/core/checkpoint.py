@@ -0,0 +1,266 @@
+from typing import Any, Iterable
+from pathlib import Path
+import asyncio, hashlib, os, pickle, sqlite3, struct, threading
+
+
+class Checkpoint:
+    """检查点 - 工作流每执行一步后保存的增量记录
+
+    数据：
+    - run_id 运行标识
+    - step 已执行的步数
+    - node 下一个要执行的节点名称，None 表示工作流已结束
+    - updates 本步新增或变化的 state 键 {key: 序列化后的值}
+    - deleted 本步删除的 state 键
+    """
+
+    __slots__ = ("run_id", "step", "node", "updates", "deleted")
+
+    def __init__(self, run_id: str, step: int, node: str | None, updates: dict[str, bytes], deleted: Iterable[str] = ()):
+        self.run_id = run_id
+        self.step = step
+        self.node = node
+        self.updates = updates
+        self.deleted = tuple(deleted)
+
+    def __repr__(self) -> str:
+        return f"Checkpoint(run_id={self.run_id!r}, step={self.step}, node={self.node!r}, keys={list(self.updates)})"
+
+
+class StateDiffer:
+    """计算 state 相对上一次检查点的增量
+
+    只保存每个键序列化结果的摘要，不保留值的副本；值未变化的键不会写入检查点。
+    传入 keys（如 `TrackedState` 记录的变更键）时只序列化这些键，否则扫描整个 state。
+    无法序列化的值（如 websocket、队列等运行期对象）不会写入检查点，恢复时由调用方重新提供
+    """
+
+    def __init__(self):
+        self.digests: dict[str, bytes] = {}
+        self.scanned = False  # 是否已完整扫描过一次 state
+
+    def diff(self, state: dict, keys: Iterable[str] = None) -> tuple[dict[str, bytes], list[str]]:
+        """返回 (变化的键及其序列化值, 删除的键)，keys 为可能变化的键（默认全部）"""
+        if keys is None:
+            keys = list(state)
+            self.scanned = True
+        updates: dict[str, bytes] = {}
+        for key in keys:
+            if key not in state:
+                continue
+            try:
+                # 绕过 TrackedState 的读取记录
+                data = pickle.dumps(dict.__getitem__(state, key), protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                continue
+            digest = hashlib.blake2b(data, digest_size=16).digest()
+            if self.digests.get(key) != digest:
+                self.digests[key] = digest
+                updates[key] = data
+        deleted = [key for key in self.digests if key not in state]
+        for key in deleted:
+            del self.digests[key]
+        return updates, deleted
+
+    def load(self, updates: dict[str, bytes]):
+        """从已保存的检查点恢复摘要，恢复后的增量与已保存的记录衔接"""
+        for key, data in updates.items():
+            self.digests[key] = hashlib.blake2b(data, digest_size=16).digest()
+
+
+class Checkpointer:
+    """检查点存储后端基类
+
+    子类实现 `put`/`load`/`delete`，检查点按写入顺序追加保存，恢复时依次合并增量
+    """
+
+    async def put(self, checkpoint: Checkpoint):
+        """追加保存一条检查点"""
+        raise NotImplementedError
+
+    async def load(self, run_id: str) -> list[Checkpoint]:
+        """按写入顺序返回运行的所有检查点"""
+        raise NotImplementedError
+
+    async def delete(self, run_id: str):
+        """删除运行的所有检查点"""
+        raise NotImplementedError
+
+    async def restore(self, run_id: str) -> tuple[int, str | None, dict[str, Any], dict[str, bytes]] | None:
+        """合并运行的所有检查点，返回 (step, node, state, 序列化后的 state)，没有检查点时返回 None"""
+        checkpoints = await self.load(run_id)
+        if not checkpoints:
+            return None
+        data: dict[str, bytes] = {}
+        for checkpoint in checkpoints:
+            for key in checkpoint.deleted:
+                data.pop(key, None)
+            data.update(checkpoint.updates)
+        last = checkpoints[-1]
+        state = {key: pickle.loads(value) for key, value in data.items()}
+        return last.step, last.node, state, data
+
+
+class MemoryCheckpointer(Checkpointer):
+    """内存检查点（进程内有效，适合测试和短任务）"""
+
+    def __init__(self):
+        self.runs: dict[str, list[Checkpoint]] = {}
+
+    async def put(self, checkpoint: Checkpoint):
+        self.runs.setdefault(checkpoint.run_id, []).append(checkpoint)
+
+    async def load(self, run_id: str) -> list[Checkpoint]:
+        return list(self.runs.get(run_id, []))
+
+    async def delete(self, run_id: str):
+        self.runs.pop(run_id, None)
+
+
+class FileCheckpointer(Checkpointer):
+    """文件检查点：每个运行一个只追加的日志文件 {directory}/{run_id}.ckpt
+
+    每条记录为 4 字节长度前缀 + pickle 数据，写入后 flush + fsync，进程崩溃最多丢失正在写入的一条记录
+    """
+
+    def __init__(self, directory: str | os.PathLike = ".agnflow/checkpoints"):
+        self.directory = Path(directory)
+
+    def _path(self, run_id: str) -> Path:
+        return self.directory / f"{run_id}.ckpt"
+
+    def _append(self, checkpoint: Checkpoint):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        record = pickle.dumps(
+            (checkpoint.step, checkpoint.node, checkpoint.updates, checkpoint.deleted),
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        with open(self._path(checkpoint.run_id), "ab") as f:
+            f.write(struct.pack(">I", len(record)) + record)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read(self, run_id: str) -> list[Checkpoint]:
+        path = self._path(run_id)
+        if not path.exists():
+            return []
+        checkpoints = []
+        data = path.read_bytes()
+        offset = 0
+        while offset + 4 <= len(data):
+            (size,) = struct.unpack_from(">I", data, offset)
+            record = data[offset + 4 : offset + 4 + size]
+            if len(record) < size:
+                break  # 最后一条记录未写完整，忽略
+            step, node, updates, deleted = pickle.loads(record)
+            checkpoints.append(Checkpoint(run_id, step, node, updates, deleted))
+            offset += 4 + size
+        return checkpoints
+
+    async def put(self, checkpoint: Checkpoint):
+        await asyncio.to_thread(self._append, checkpoint)
+
+    async def load(self, run_id: str) -> list[Checkpoint]:
+        return await asyncio.to_thread(self._read, run_id)
+
+    async def delete(self, run_id: str):
+        await asyncio.to_thread(self._path(run_id).unlink, missing_ok=True)
+
+
+class SQLiteCheckpointer(Checkpointer):
+    """SQLite 检查点，每个增量键保存为一行
+
+    所有运行共享一个连接（第一次使用时打开），读写在线程中执行并加锁串行化，不阻塞事件循环；
+    不需要时调用 `close()` 关闭连接
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path: str = db_path or os.getenv("AGNFLOW_CHECKPOINT_DB", "checkpoints.sqlite3")
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """返回共享的连接，第一次调用时打开并建表（调用方需持有锁）"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.executescript(
+                """CREATE TABLE IF NOT EXISTS checkpoints (
+                    run_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    step INTEGER NOT NULL,
+                    node TEXT,
+                    PRIMARY KEY (run_id, seq)
+                );
+                CREATE TABLE IF NOT EXISTS checkpoint_writes (
+                    run_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB,
+                    deleted INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_checkpoint_writes ON checkpoint_writes (run_id, seq);"""
+            )
+            self._conn = conn
+        return self._conn
+
+    def _put(self, checkpoint: Checkpoint):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                (seq,) = conn.execute(
+                    "SELECT COALESCE(MAX(seq), -1) + 1 FROM checkpoints WHERE run_id = ?", (checkpoint.run_id,)
+                ).fetchone()
+                conn.execute(
+                    "INSERT INTO checkpoints (run_id, seq, step, node) VALUES (?, ?, ?, ?)",
+                    (checkpoint.run_id, seq, checkpoint.step, checkpoint.node),
+                )
+                rows = [(checkpoint.run_id, seq, key, sqlite3.Binary(value), 0) for key, value in checkpoint.updates.items()]
+                rows += [(checkpoint.run_id, seq, key, None, 1) for key in checkpoint.deleted]
+                conn.executemany(
+                    "INSERT INTO checkpoint_writes (run_id, seq, key, value, deleted) VALUES (?, ?, ?, ?, ?)", rows
+                )
+
+    def _load(self, run_id: str) -> list[Checkpoint]:
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute("SELECT seq, step, node FROM checkpoints WHERE run_id = ? ORDER BY seq", (run_id,))
+            checkpoints = {seq: Checkpoint(run_id, step, node, {}) for seq, step, node in rows.fetchall()}
+            writes = conn.execute(
+                "SELECT seq, key, value, deleted FROM checkpoint_writes WHERE run_id = ? ORDER BY rowid", (run_id,)
+            ).fetchall()
+        deleted: dict[int, list[str]] = {}
+        for seq, key, value, is_deleted in writes:
+            if is_deleted:
+                deleted.setdefault(seq, []).append(key)
+            elif seq in checkpoints:
+                checkpoints[seq].updates[key] = bytes(value)
+        for seq, keys in deleted.items():
+            if seq in checkpoints:
+                checkpoints[seq].deleted = tuple(keys)
+        return list(checkpoints.values())
+
+    def _delete(self, run_id: str):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM checkpoints WHERE run_id = ?", (run_id,))
+                conn.execute("DELETE FROM checkpoint_writes WHERE run_id = ?", (run_id,))
+
+    def _close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def put(self, checkpoint: Checkpoint):
+        await asyncio.to_thread(self._put, checkpoint)
+
+    async def load(self, run_id: str) -> list[Checkpoint]:
+        return await asyncio.to_thread(self._load, run_id)
+
+    async def delete(self, run_id: str):
+        await asyncio.to_thread(self._delete, run_id)
+
+    async def close(self):
+        """关闭共享的连接，之后再使用时重新打开"""
+        await asyncio.to_thread(self._close)
@@ -1,11 +1,55 @@
-from typing import Any, Dict, Literal, Generic
-import asyncio
+from typing import Any, Callable, Dict, Literal, Generic
+from functools import lru_cache
 from pathlib import Path
-import re
+import itertools, linecache, os, re, sys
 
-from agnflow.utils.code import get_code_line
+from agnflow.core.graph import Edges, Graph, NodeMap, mutation
+from agnflow.core.context import run_context
+from agnflow.core.runner import get_runner
 from agnflow.core.type import StateType
 
+_auto_name: bool = os.getenv("AGNFLOW_AUTO_NAME", "1").lower() not in ("0", "false", "off")
+"""是否根据变量名自动命名实例（生产环境可关闭以节省构造开销）"""
+
+
+def set_auto_name(enabled: bool = True):
+    """全局开关：是否根据变量名自动命名未指定 name 的节点/容器"""
+    global _auto_name
+    _auto_name = enabled
+
+
+_fallback_counters: dict[str, itertools.count] = {}
+
+
+def _fallback_name(cls_name: str) -> str:
+    """无法自动命名时的默认名称：同一个类的第一个实例使用类名，之后依次为 类名_2、类名_3 ...
+
+    连接以目标节点名称为键，默认名称不重复，未命名的节点不会互相覆盖
+    """
+    counter = _fallback_counters.get(cls_name)
+    if counter is None:
+        counter = _fallback_counters.setdefault(cls_name, itertools.count(1))
+    n = next(counter)
+    return cls_name if n == 1 else f"{cls_name}_{n}"
+
+
+def add_edge(graph: Graph, src: "Connection", tgt: "Connection", hidden: bool = False, weak: bool = False):
+    """以目标节点名称为 action 添加连接 src -> {action: target}
+
+    连接以目标节点身份登记，同名的不同节点可以同时存在（见 `Edges`），编译时按工作流选择；
+    weak 为 True 时弱引用目标节点，用于容器建立的内部连接（目标节点由容器持有）
+    """
+    graph.link(src, tgt.name, tgt, hidden, weak)
+
+
+@lru_cache(maxsize=4096)
+def _parse_instance_name(filename: str, lineno: int, cls_name: str) -> str | None:
+    """解析代码行 `x = ClassName(...)`，返回变量名 x"""
+    line = linecache.getline(filename, lineno)
+    match = re.match(r"^\s*(\w+)\s*=\s*" + cls_name + r"\(", line)
+    return match.group(1) if match else None
+
+
 class Connection(Generic[StateType]):
     """连接关系（节点与容器）
 
@@ -20,6 +64,7 @@ class Connection(Generic[StateType]):
     数据：
     - name 通过查询调用堆栈的技术，动态获取当前实例的变量名，作为name属性
     - chains 链式调用数组 c1 >> c2 >> c3 ==> [c1, c2, c3]
+    - graph 图注册表，互相连接的节点共享同一张图，以下连接关系都保存在图中
     - conntainer 工作流容器，支持容器嵌套容器，如 flow[a,b] 相当于 {flow:[a,b]}
     - connections 显式连接，如
         a >> flow[x,y] >> b 相当于 a-flow-b 相当于 {a:{"flow":flow}, flow:{"b":b}}
@@ -51,41 +96,70 @@ class Connection(Generic[StateType]):
     ```
     """
 
-    connections: "dict[Connection,dict[str,Connection]]" = {}  # {source: {action: target}}
-    """全局工作流节点连接"""
-    conntainer: "dict[Connection,list[Connection]]" = {}  # 区分内连接和外连接的容器
-    """全局工作流节点容器"""
-    hidden_connections: "dict[Connection,dict[str,Connection]]" = {}  # {source: {action: target}}
-    """全局工作流节点隐式连接"""
-
     def __init__(self, name: str = None, chains: "list[Connection]" = None):
         self.chains: list[Connection] = chains or [self]  # [source , ... , target]
-        self.name = name or self._get_instance_name()
+        # 链路代理对象（chains 非空）不需要变量名
+        self.name = name or (self.__class__.__name__ if chains else self._get_instance_name())
+        self._graph: Graph | None = None  # 首次访问时创建，链路代理对象不会创建
+
+    # region 图注册表
+    @property
+    def graph(self) -> Graph:
+        """当前节点所在的图"""
+        if self._graph is None:
+            self._graph = Graph()
+            self._graph.nodes.add(self)
+        return self._graph
+
+    @property
+    def connections(self) -> "NodeMap[Connection, Edges]":
+        """当前图的显式连接 {source: {action: target}}"""
+        return self.graph.connections
+
+    @property
+    def hidden_connections(self) -> "NodeMap[Connection, Edges]":
+        """当前图的隐式连接 {source: {action: target}}"""
+        return self.graph.hidden_connections
+
+    @property
+    def conntainer(self) -> "NodeMap[Connection, list[Connection]]":
+        """当前图的容器 {container: [node, ...]}"""
+        return self.graph.conntainer
+
+    def touch(self):
+        """标记连接关系已变更（递增图的版本号）"""
+        self.graph.touch()
+
+    # endregion
 
     def _get_instance_name(self) -> str:
-        """设置实例名称"""
-        # stack = inspect.stack()
+        """设置实例名称
+
+        沿调用帧向上查找形如 `x = ClassName(` 的代码行，以变量名作为实例名称
+        - 只用 sys._getframe 逐帧回溯，不构建 inspect.stack() 的完整帧信息
+        - 代码行解析结果按 (文件, 行号, 类名) 缓存
+        - 关闭自动命名（`set_auto_name(False)` 或环境变量 AGNFLOW_AUTO_NAME=0）或找不到变量名时使用类名，
+          同一个类的后续实例依次为 类名_2、类名_3 ...，避免同名节点在连接中互相覆盖
+        """
+        cls_name = self.__class__.__name__
+        if not _auto_name:
+            return _fallback_name(cls_name)
         try:
-            # stack[0]: _collect_names
-            # stack[1]: Connections.__init__
-            # stack[2]: Node.__init__ or Flow.__init__
-            # stack[3]: 用户代码中调用构造函数的帧。
-            for line in get_code_line():
-                match = re.match(r"^\s*(\w+)\s*=\s*" + self.__class__.__name__ + r"\(", line)
-                if match:
-                    return str(match.group(1))
-            # if len(stack) > 1:
-            #     for frame in stack:
-            #         if frame.code_context:
-            #             line = frame.code_context[0].strip()
-            #             match = re.match(r"^\s*(\w+)\s*=\s*" + self.__class__.__name__ + r"\(", line)
-            #             if match:
-            #                 return str(match.group(1))
-            return self.__class__.__name__
+            # frame[0]: _get_instance_name
+            # frame[1]: Connection.__init__
+            # frame[2]: Node.__init__ or Flow.__init__
+            # frame[n]: 用户代码中调用构造函数的帧
+            frame = sys._getframe(1)
+            while frame is not None:
+                name = _parse_instance_name(frame.f_code.co_filename, frame.f_lineno, cls_name)
+                if name:
+                    return name
+                frame = frame.f_back
+            return _fallback_name(cls_name)
         except Exception:
-            return self.__class__.__name__
-        # finally:
-        #     del stack
+            return _fallback_name(cls_name)
+        finally:
+            frame = None
 
     def __repr__(self) -> str:
         return f"{self.name}"
@@ -94,12 +168,14 @@ class Connection(Generic[StateType]):
     @property
     def all_connections(self) -> "Dict[Connection, Dict[str, Connection]]":
         """合并所有连接"""
-        return {
-            key: {**self.hidden_connections.get(key, {}), **self.connections.get(key, {})}
-            for key in self.hidden_connections | self.connections
-        }
+        graph = self.graph
+        merged = {key: dict(tgt_map) for key, tgt_map in graph.hidden_connections.items()}
+        for key, tgt_map in graph.connections.items():
+            merged.setdefault(key, {}).update(tgt_map)
+        return merged
 
     # region 构建流程图（包含节点与容器关联）
+    @mutation
     def build_connections(
         self,
         source: "Connection | list | tuple",
@@ -127,39 +203,42 @@ class Connection(Generic[StateType]):
         # 获取当前链路的最后一个节点作为目标
         sources: list[Connection] = convert_to_conn_list(source)
         targets: list[Connection] = convert_to_conn_list(target)
+        # 源节点与目标节点合并到同一张图
+        graph = Graph.union(*sources, *targets)
+        graph.touch()
+        conntainer = graph.conntainer
 
         # 建立连接关系，如 a -> b -> flow1[x,y] -> flow2[z,w] -> c
         # 1. 先构建显式连接 如 a-b-flow1-flow2-c
         for outer_src in sources:
-            outer_src_map: Dict[str, Connection] = self.connections.setdefault(outer_src, {})
             for outer_tgt in targets:
-                outer_src_map[outer_tgt.name] = outer_tgt
+                add_edge(graph, outer_src, outer_tgt)
 
                 # 2.后构建隐式连接，如 b-x b-y ，x-z x-w y-z y-w ，z-c w-c
-                if outer_src in self.conntainer or outer_tgt in self.conntainer:
+                if outer_src in conntainer or outer_tgt in conntainer:
                     # 2.1 flow[a,b] >> c
-                    if outer_src in self.conntainer:
-                        inner_sources: list[Connection] = self.conntainer.get(outer_src, [])
+                    if outer_src in conntainer:
+                        inner_sources: list[Connection] = conntainer.get(outer_src, [])
                         inner_targets: list[Connection] = [outer_tgt]
                     # 2.2 c >> flow[a,b]
-                    if outer_tgt in self.conntainer:
+                    if outer_tgt in conntainer:
                         inner_sources: list[Connection] = [outer_src]
-                        inner_targets: list[Connection] = self.conntainer.get(outer_tgt, [])
+                        inner_targets: list[Connection] = conntainer.get(outer_tgt, [])
                     # 2.3 flow[a,b] >> flow[c,d]
-                    if outer_tgt in self.conntainer and outer_src in self.conntainer:
-                        inner_sources: list[Connection] = self.conntainer.get(outer_src, [])
-                        inner_targets: list[Connection] = self.conntainer.get(outer_tgt, [])
+                    if outer_tgt in conntainer and outer_src in conntainer:
+                        inner_sources: list[Connection] = conntainer.get(outer_src, [])
+                        inner_targets: list[Connection] = conntainer.get(outer_tgt, [])
 
                     # 确保inner_sources和inner_targets中都是Connection对象
                     inner_sources = [src for src in inner_sources if isinstance(src, Connection)]
                     inner_targets = [tgt for tgt in inner_targets if isinstance(tgt, Connection)]
 
                     for inner_src in inner_sources:
-                        inner_src_map: Dict[str, Connection] = self.hidden_connections.setdefault(inner_src, {})
                         for inner_tgt in inner_targets:
                             if inner_src is inner_tgt or inner_src is None or inner_tgt is None:  # 跳过自连接和空连接
                                 continue
-                            inner_src_map[inner_tgt.name] = inner_tgt
+                            # 目标为容器成员时由容器持有，连接弱引用目标节点
+                            add_edge(graph, inner_src, inner_tgt, hidden=True, weak=outer_tgt in conntainer)
 
     def __rshift__(self, target: "Connection | list | tuple") -> "Connection":
         """重载运算符 >>
@@ -215,6 +294,7 @@ class Connection(Generic[StateType]):
             temp_conn.disconnect_from(self)
             return temp_conn
 
+    @mutation
     def disconnect_from(self, target: "Connection | list | tuple"):
         """断开连接的核心逻辑"""
         def convert_to_conn_list(objs) -> "list[Connection]":
@@ -234,54 +314,89 @@ class Connection(Generic[StateType]):
                 return result
             return []
 
-        sources = [self.chains[-1]]  # 当前链路的最后一个节点
+        sources = [src for src in [self.chains[-1]] if isinstance(src, Connection)]  # 当前链路的最后一个节点
         targets = convert_to_conn_list(target)
 
-        # 1. 断开显式连接
         for src in sources:
-            if src in self.connections:
-                for tgt in targets:
-                    if tgt.name in self.connections[src]:
-                        del self.connections[src][tgt.name]
-                # 如果该源节点的连接映射为空，删除整个映射
-                if not self.connections[src]:
-                    del self.connections[src]
+            # 连接关系都保存在源节点所在的图中
+            graph = src.graph
+            graph.touch()
 
-        # 2. 断开隐式连接
-        for src in sources:
-            if src in self.hidden_connections:
+            # 1. 断开显式连接 2. 断开隐式连接（源节点的连接映射为空时删除整个映射）
+            for hidden in (False, True):
                 for tgt in targets:
-                    if tgt.name in self.hidden_connections[src]:
-                        del self.hidden_connections[src][tgt.name]
-                if not self.hidden_connections[src]:
-                    del self.hidden_connections[src]
+                    graph.unlink(src, tgt.name, hidden, tgt)
 
-        # 3. 处理容器关系
-        for src in sources:
-            if src in self.conntainer:
+            # 3. 处理容器关系
+            if src in graph.conntainer:
                 # 从容器中移除目标节点
-                container_nodes = self.conntainer[src]
+                container_nodes = graph.conntainer[src]
                 for tgt in targets:
                     if tgt in container_nodes:
                         container_nodes.remove(tgt)
                 # 如果容器为空，删除容器
                 if not container_nodes:
-                    del self.conntainer[src]
+                    del graph.conntainer[src]
 
     # endregion
 
     # region 执行流程
-    def run(self, state: StateType, max_steps: int = 10, entry_action: str = None) -> Any:
-        """同步执行工作流的核心逻辑"""
-        return asyncio.run(
-            self.execute_workflow(state=state, remaining_steps=max_steps, entry_action=entry_action, is_async=False)
-        )
-
-    async def arun(self, state: StateType, max_steps: int = 10, entry_action: str = None) -> Any:
-        """异步执行工作流的核心逻辑"""
-        return await self.execute_workflow(
-            state=state, remaining_steps=max_steps, entry_action=entry_action, is_async=True
-        )
+    def run(
+        self,
+        state: StateType,
+        max_steps: int = 10,
+        entry_action: str = None,
+        run_id: str = None,
+        resume_from: str = None,
+        timeout: float = None,
+    ) -> Any:
+        """同步执行工作流的核心逻辑
+
+        - 纯同步图直接执行，不创建事件循环
+        - 其他情况复用当前线程的持久事件循环，不会为每次执行创建/销毁事件循环；
+          当前线程已有运行中的事件循环时在后台事件循环中执行并等待结果（异步代码中应优先使用 `await arun(...)`）
+        - run_id/resume_from/timeout 见 `arun`
+        """
+        coro = self._run_workflow(state, max_steps, entry_action, False, run_id, resume_from, timeout=timeout)
+        return get_runner().run(coro, sync=self._is_sync_graph())
+
+    async def arun(
+        self,
+        state: StateType,
+        max_steps: int = 10,
+        entry_action: str = None,
+        run_id: str = None,
+        resume_from: str = None,
+        timeout: float = None,
+    ) -> Any:
+        """异步执行工作流的核心逻辑
+
+        - run_id 指定本次运行的标识（默认自动生成），配置了检查点的工作流按 run_id 保存检查点
+        - resume_from 从该 run_id 的最后一个检查点继续执行，并继续写入同一个 run_id
+        - timeout 整体期限（秒），超过时正在执行的节点被取消并抛出 `DeadlineExceeded`
+        - 配置了检查点时节点在 state 的副本上执行，传入的 dict 在运行结束时才更新（见 `TrackedState`）
+        """
+        return await self._run_workflow(state, max_steps, entry_action, True, run_id, resume_from, timeout=timeout)
+
+    async def _run_workflow(
+        self,
+        state: StateType,
+        max_steps: int,
+        entry_action: str,
+        is_async: bool,
+        run_id: str = None,
+        resume_from: str = None,
+        emitter: Callable = None,
+        timeout: float = None,
+        routing: dict = None,
+    ) -> Any:
+        """在执行上下文中执行工作流（每次 run/arun 拥有独立的运行期数据，routing 见 `run_context`）"""
+        resume = resume_from is not None
+        run_id = resume_from or run_id
+        with run_context(self, run_id, resume, emitter, timeout, routing):
+            return await self.execute_workflow(
+                state=state, remaining_steps=max_steps, entry_action=entry_action, is_async=is_async
+            )
 
     def execute_workflow(
         self, state: StateType, remaining_steps: int = 10, entry_action: str = None, is_async: bool = False
@@ -289,6 +404,14 @@ class Connection(Generic[StateType]):
         """统一的工作流执行接口，Node 作为单节点工作流"""
         raise NotImplementedError("Node 类不支持 execute_workflow 方法")
 
+    def _is_sync_graph(self, seen: "set[Connection]" = None) -> bool:
+        """以同步方式执行时，是否保证不会等待任何异步操作（可以跳过事件循环）"""
+        return False
+
+    def declared_actions(self) -> frozenset[str] | None:
+        """执行后可能返回的 action（用于静态分析），无法确定时返回 None"""
+        return None
+
     # endregion
 
     # region 绘制流程图
@@ -562,7 +685,7 @@ if __name__ == "__main__":
     flow = Connection()
     c1 >> c2
     c1 >> c3
-    print(c1.connections, c1.conntainer, c1.hidden_connections)
+    print(c1.connections, c1.conntainer, c1.hidden_connections, c1.graph)
     # print((c1 >> c2 >> c3).chains)
     # print((c1 << [c2, c3] << c4
     # print((c1 << flow[c2, c3 >> c5] << c4
@@ -0,0 +1,131 @@
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time, uuid
+
+if TYPE_CHECKING:
+    from agnflow.core.connection import Connection
+    from agnflow.core.graph import Routing
+
+
+class DeadlineExceeded(TimeoutError):
+    """运行超过了 run/arun 指定的整体期限（不会被节点重试或 exec_fallback 处理）"""
+
+
+class ExecutionContext:
+    """执行上下文 - 单次运行中的运行期数据
+
+    取代节点实例上的 self.state 等属性，保存在 contextvars 中：
+    - 每个 asyncio 任务/线程池调用持有自己的上下文副本，互不干扰
+    - 同一个节点实例可以被任意多个并发的 run/arun 同时执行，无需为每个请求重新构建图
+
+    数据：
+    - run_id 运行标识，同一次 run/arun 中的所有节点共享
+    - root 发起本次运行的节点/工作流（检查点只在根工作流保存）
+    - resume 是否从 run_id 的检查点恢复执行
+    - emitter 事件发射器（`Flow.astream` 消费），为 None 时不产生事件
+    - deadline 运行的截止时间（time.monotonic() 时间戳），None 表示不限时
+    - node 当前正在执行的节点
+    - state 当前节点执行时的 state
+    - retry 当前节点的重试序号（从 0 开始）
+    - routing 本次运行固定的路由表快照 {工作流: Routing}，各工作流第一次执行时写入，为 None 时不固定
+    """
+
+    __slots__ = ("run_id", "root", "resume", "emitter", "deadline", "node", "state", "retry", "routing")
+
+    def __init__(
+        self,
+        run_id: str = None,
+        root: "Connection" = None,
+        resume: bool = False,
+        emitter: Callable[[Any], None] = None,
+        deadline: float = None,
+        node: "Connection" = None,
+        state: dict = None,
+        retry: int = 0,
+        routing: "dict[Connection, Routing]" = None,
+    ):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.root = root
+        self.resume = resume
+        self.emitter = emitter
+        self.deadline = deadline
+        self.node = node
+        self.state = state
+        self.retry = retry
+        self.routing = routing
+
+    def __repr__(self) -> str:
+        return f"ExecutionContext(run_id={self.run_id!r}, node={self.node!r}, retry={self.retry})"
+
+    def remaining(self) -> float | None:
+        """距离截止时间的剩余秒数，不限时返回 None"""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def check_deadline(self):
+        """已超过截止时间时抛出 DeadlineExceeded"""
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise DeadlineExceeded(f"运行 {self.run_id} 超过了截止时间")
+
+    def derive(self, **changes: Any) -> "ExecutionContext":
+        """复制当前上下文并修改部分字段（上下文对象本身不会被修改）"""
+        ctx = ExecutionContext.__new__(ExecutionContext)
+        for slot in ExecutionContext.__slots__:
+            setattr(ctx, slot, changes.get(slot, getattr(self, slot)))
+        return ctx
+
+
+_current: ContextVar[ExecutionContext | None] = ContextVar("agnflow_context", default=None)
+
+
+def current_context() -> ExecutionContext | None:
+    """获取当前执行上下文，不在运行中时返回 None"""
+    return _current.get()
+
+
+@contextmanager
+def use_context(ctx: ExecutionContext) -> Iterator[ExecutionContext]:
+    """在 with 块内把 ctx 设为当前执行上下文"""
+    token = _current.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def run_context(
+    root: "Connection" = None,
+    run_id: str = None,
+    resume: bool = False,
+    emitter: Callable[[Any], None] = None,
+    timeout: float = None,
+    routing: "dict[Connection, Routing]" = None,
+) -> Iterator[ExecutionContext]:
+    """一次 run/arun 的根上下文
+
+    - 已处于运行中（如在节点内部调用子工作流）时沿用当前运行，除非显式指定 run_id 或 emitter
+    - timeout 为整体期限（秒），沿用当前运行时取更早的截止时间
+    - routing 与其他运行共享的路由表快照（如同一批次的运行），默认每次运行单独固定
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    ctx = _current.get()
+    if ctx is not None and run_id is None and emitter is None:
+        if deadline is None or (ctx.deadline is not None and ctx.deadline <= deadline):
+            yield ctx
+            return
+        with use_context(ctx.derive(deadline=deadline)) as ctx:
+            yield ctx
+        return
+    routing = {} if routing is None else routing
+    ctx = ExecutionContext(run_id=run_id, root=root, resume=resume, emitter=emitter, deadline=deadline, routing=routing)
+    with use_context(ctx) as ctx:
+        yield ctx
+
+
+@contextmanager
+def node_context(node: "Connection", state: dict, retry: int = 0) -> Iterator[ExecutionContext]:
+    """节点执行期间的上下文（继承当前运行的数据）"""
+    parent = _current.get() or ExecutionContext()
+    with use_context(parent.derive(node=node, state=state, retry=retry)) as ctx:
+        yield ctx
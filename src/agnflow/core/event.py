@@ -0,0 +1,73 @@
+from typing import Any, Literal
+import asyncio, threading, time
+
+from agnflow.core.context import current_context
+
+EventType = Literal["run_start", "node_start", "node_end", "action", "state_delta", "error", "token", "run_end"]
+
+
+class Event:
+    """执行事件 - `Flow.astream` 产出的结构化事件
+
+    数据：
+    - type 事件类型
+        - run_start/run_end 运行开始/结束
+        - node_start/node_end 节点开始/结束执行
+        - action 节点返回的 action 以及选中的下一个节点
+        - state_delta 一步执行后 state 的增量（updates/deleted）
+        - error 节点执行出错
+        - token 节点转发的流式输出片段（如 LLM token），节点也可以发出自定义类型的事件
+    - run_id 运行标识
+    - node 产生事件的节点名称
+    - step 所在步数
+    - data 事件数据
+    - time 事件时间戳
+    """
+
+    __slots__ = ("type", "run_id", "node", "step", "data", "time")
+
+    def __init__(self, type: str, run_id: str = None, node: str = None, step: int = None, data: Any = None):
+        self.type = type
+        self.run_id = run_id
+        self.node = node
+        self.step = step
+        self.data = data
+        self.time = time.time()
+
+    def __repr__(self) -> str:
+        return f"Event(type={self.type!r}, node={self.node!r}, step={self.step}, data={self.data!r})"
+
+    def to_dict(self) -> dict:
+        """转换为字典（便于 JSON 序列化推送给前端）"""
+        return {slot: getattr(self, slot) for slot in Event.__slots__}
+
+
+class EventEmitter:
+    """把事件投递到 asyncio.Queue 的发射器
+
+    可以在事件循环线程之外（如线程池中执行的节点）调用，跨线程时通过 call_soon_threadsafe 投递
+    """
+
+    __slots__ = ("queue", "loop", "thread")
+
+    def __init__(self, queue: asyncio.Queue = None):
+        self.queue: asyncio.Queue = queue or asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+        self.thread = threading.get_ident()
+
+    def __call__(self, event: Event):
+        if threading.get_ident() == self.thread:
+            self.queue.put_nowait(event)
+        else:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+
+def emit(type: str, data: Any = None, node: Any = None, step: int = None):
+    """在当前运行中发出事件，没有消费者时直接返回（无额外开销）"""
+    ctx = current_context()
+    if ctx is None or ctx.emitter is None:
+        return
+    if node is None and ctx.node is not None:
+        node = ctx.node
+    name = getattr(node, "name", node)
+    ctx.emitter(Event(type, run_id=ctx.run_id, node=name, step=step, data=data))
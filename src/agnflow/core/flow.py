@@ -1,22 +1,57 @@
-from typing import Any, Dict,  TypeVar, Callable
+from typing import Any, AsyncIterator, Iterable, TypeVar, Callable
 from typing_extensions import Self
-import traceback
-
-from agnflow.core.connection import Connection
+import asyncio, logging, uuid
+
+from agnflow.core.analysis import EXIT_ACTIONS, Issue, ValidationReport, analyze_routes
+from agnflow.core.batch import BatchRun
+from agnflow.core.checkpoint import Checkpoint, Checkpointer, StateDiffer
+from agnflow.core.connection import Connection, add_edge
+from agnflow.core.context import DeadlineExceeded, ExecutionContext, current_context
+from agnflow.core.event import Event, EventEmitter, emit
+from agnflow.core.graph import Graph, Routing, _graph_lock, mutation
 from agnflow.core.node import Node
-from agnflow.utils.pprint import pprint
+from agnflow.core.state import BranchState, StateDelta, TrackedState
+from agnflow.utils.log import enabled, format_message, is_quiet, log
 
 StateType = TypeVar("StateType", bound=dict)
 
 
 class Flow(Connection[StateType]):
-    """工作流容器"""
-
-    def __init__(self, name: str = None, log: Callable = None, log_zh: Callable = None):
+    """工作流容器
+
+    日志：默认通过 logging（日志器 "agnflow"）输出，每一步的执行日志为 DEBUG 级别，见 `agnflow.utils.log`；
+    传入 log/log_zh 回调时改为把格式化后的英文/中文消息交给回调（兼容旧接口）
+
+    检查点 checkpointer（见 `agnflow.core.checkpoint`）：
+    - 作为根工作流执行时，每执行一步保存一次 (下一个节点, 步数, state 增量)
+    - `arun(state, resume_from=run_id)` 从该运行的最后一个检查点继续执行
+
+    子工作流内联 inline（默认开启）：
+    - 编译时把嵌套的普通工作流（包括 Supervisor、Swarm）展开到外层的路由表中，
+      路由到子工作流时直接进入它的第一个节点，整个嵌套结构在一个执行循环中运行
+    - 内联后子工作流内的每个节点计为外层的一步（max_steps 按实际执行的节点计数）
+    - 以下子工作流保持为独立节点递归执行：inline=False、自定义 execute_workflow（如 ParallelFlow）、
+      设置了 checkpointer 或 log/log_zh 回调、外层为其连接了 exit 分支
+    """
+
+    def __init__(
+        self,
+        name: str = None,
+        log: Callable = None,
+        log_zh: Callable = None,
+        checkpointer: Checkpointer = None,
+        inline: bool = True,
+    ):
         super().__init__(name=name)
-        self.log = log or (lambda *x: ...)
-        self.log_zh = log_zh or pprint
-
+        self.log: Callable[[str], Any] | None = log
+        self.log_zh: Callable[[str], Any] | None = log_zh
+        self.checkpointer = checkpointer
+        self.inline = inline
+        self._routing: Routing = Routing()  # 编译后的路由表快照（图结构变更后整体替换）
+        self._report: ValidationReport | None = None  # 静态分析结果，与路由表一样按图的版本号缓存
+        self._report_version: tuple[Graph | None, int] = (None, -1)
+
+    @mutation
     def __getitem__(self, node: "Connection | tuple | list | slice") -> Self:
         """重载运算符 []
 
@@ -42,6 +77,9 @@ class Flow(Connection[StateType]):
                 return [*obj]
             return []
 
+        # 容器与所有子节点合并到同一张图
+        graph = Graph.union(self, node)
+        graph.touch()
         conntainer: list[Connection] = self.conntainer.setdefault(self, [])
         # 1.补全内部连接connections
         # 1.1 处理切片表达式 flow[a:(b,c)]
@@ -62,9 +100,8 @@ class Flow(Connection[StateType]):
                             conntainer.append(src)
                         if tgt not in conntainer:
                             conntainer.append(tgt)
-                        # 建立连接
-                        src_map: Dict[str, Connection] = self.connections.setdefault(src, {})
-                        src_map[tgt.name] = tgt
+                        # 建立连接（两端都由容器持有，弱引用目标节点）
+                        add_edge(graph, src, tgt, weak=True)
         # 1.2 处理连接类型 flow[a>>b>>a]（a-b-a需要去重）
         elif isinstance(node, Connection):
             # 添加到容器，可以用于绘制mermaid流程图，{chain:[a,b]}
@@ -84,55 +121,260 @@ class Flow(Connection[StateType]):
 
         return self
 
+    @mutation
     def __iadd__(self, node: "Connection | tuple | list") -> Self:
         """动态添加节点，调用__getitem__建立连接，并补全外部连接和hidden_connections"""
+        self._add_nodes(node)
+        self.touch()
+        return self
+
+    @mutation
+    def __isub__(self, node: "Connection | tuple | list") -> Self:
+        """动态删除节点，移除conntainer和相关连接，并清理外部连接。节点不在容器内时抛出异常。"""
+        self._remove_nodes(self._check_removable(node))
+        self.touch()
+        return self
+
+    @mutation
+    def update(self, add: "Connection | tuple | list" = (), remove: "Connection | tuple | list" = ()) -> Self:
+        """批量增删节点，先删除后添加，路由表在下次执行时只重新编译一次
+
+        整个批次在图结构锁内完成，其他线程编译路由表时只会看到批次之前或之后的结构
+
+        - add 要添加的节点，等价于 `flow += add`
+        - remove 要删除的节点，等价于 `flow -= remove`，任一节点不在容器内时抛出 ValueError，不做任何修改
+
+        示例：
+        ```python
+        swarm.update(add=[agent_4, agent_5], remove=[agent_1])
+        ```
+        """
+        removed = self._check_removable(remove)
+        self._remove_nodes(removed)
+        if add:
+            self._add_nodes(add)
+        self.touch()
+        return self
+
+    def _check_removable(self, node: "Connection | tuple | list") -> "list[Connection]":
+        """统一为节点列表，并检查节点都在容器内"""
+        conntainer = self.conntainer.get(self, [])
+        nodes = node if isinstance(node, (list, tuple)) else [node]
+        for n in nodes:
+            if n not in conntainer:
+                raise ValueError(f"节点 {n} 不在容器 {self.name} 中，无法删除")
+        return list(nodes)
+
+    def _add_nodes(self, node: "Connection | tuple | list"):
+        """添加节点：建立内部连接并加入容器，补全外部隐式连接（代价为 O(新节点数 × 容器的外部连接数)）"""
         # 1. 补全内部连接connections，和添加当前节点到conntainer
         self.__getitem__(node)
         nodes = node if isinstance(node, (list, tuple)) else [node]
         # 2. 补全外部隐式连接hidden_connections
-        # 2.1 获取self与外部的连接
-        external_in = []
-        external_out = []
-        for src, tgt_map in self.connections.items():
-            for tgt in tgt_map.values():
-                if src is self:
-                    external_out.append(tgt)
-                if tgt is self:
-                    external_in.append(src)
+        # 2.1 获取self与外部的连接（出边直接查连接字典，入边查反向索引）
+        graph = self.graph
+        external_out = list(graph.connections.get(self, {}).values())
+        external_in = graph.sources(self)
         # 2.2 补全外部隐式连接
         for n in nodes:
             for ext in external_in:
-                self.hidden_connections.setdefault(ext, {})[n.name] = n
+                add_edge(graph, ext, n, hidden=True, weak=True)
             for ext in external_out:
-                self.hidden_connections.setdefault(n, {})[ext.name] = ext
+                add_edge(graph, n, ext, hidden=True)
 
-        return self
-
-    def __isub__(self, node: "Connection | tuple | list") -> Self:
-        """动态删除节点，移除conntainer和相关连接，并清理外部连接。节点不在容器内时抛出异常。"""
-        conntainer = self.conntainer.setdefault(self, [])
-        nodes = node if isinstance(node, (list, tuple)) else [node]
+    def _remove_nodes(self, nodes: "list[Connection]"):
+        """删除节点：移出容器，并通过反向索引删除节点的所有出边与入边（代价为 O(节点的度数)）"""
+        graph = self.graph
+        conntainer = graph.conntainer.setdefault(self, [])
         for n in nodes:
             if n in conntainer:
-                # 从conntainer中清理
                 conntainer.remove(n)
-                # 从connections和hidden_connections中清理
-                for conn_map in [self.connections, self.hidden_connections]:
-                    # 使用字典副本进行遍历，避免运行时修改错误
-                    for src, tgt_map in list(conn_map.items()):
-                        # n为src
-                        if src is n:
-                            conn_map.pop(src)
-                            break
-                        # n为tgt
-                        for tgt_name, tgt in list(tgt_map.items()):
-                            if tgt is n:
-                                conn_map[src].pop(tgt_name)
-                                break
-            else:
-                raise ValueError(f"节点 {n} 不在容器 {self.name} 中，无法删除")
+            graph.detach(n)
+
+    # region 编译路由表
+
+    def compile(self) -> Self:
+        """编译路由表，把当前图结构冻结为 {(node, action): target} 的查找表，发布为新的快照 `_routing`
+
+        - 从容器内节点出发，沿显式/隐式连接收集所有可达节点的出边（只解析可达节点，代价与图中其他工作流无关）
+        - 可以内联的子工作流展开为它的第一个节点（见 `_inline_entry`），指向子工作流的边直接指向该节点
+        - 路由表 `routes` 以源节点身份和 action 为键，执行时一次查表得到下一个节点，不再比较节点名称；
+          静态分析也基于同一张表
+        - 一个 action 有多个同名目标节点时（如共享节点连接到每条消息新建的同名节点），选择本工作流容器内的节点
+        - 容器内节点按名称建立入口索引 `members` {name: node}（同名时第一个节点优先），entry_action 直接查表
+        - `>>`、`-`、`[]`、`+=`、`-=` 会递增图的版本号 `graph.version`，下次执行时自动重新编译
+        - 编译在图结构锁内读取连接关系，快照通过一次属性赋值发布，正在执行的运行不受影响
+        """
+        with _graph_lock:
+            graph = self.graph
+            # 容器中可能混入链路里的列表（如 a >> [b, c]），只保留 Connection 对象
+            container = tuple(n for n in self.conntainer.get(self, []) if isinstance(n, Connection))
+            # 同名的多个目标节点中优先选择本工作流（含嵌套容器）的成员
+            scope: set[Connection] = set()
+            stack = list(container)
+            while stack:
+                member = stack.pop()
+                if member not in scope:
+                    scope.add(member)
+                    stack.extend(n for n in self.conntainer.get(member, []) if isinstance(n, Connection))
+            resolved: dict[Connection, dict[str, Connection]] = {}
+
+            def outgoing(src: Connection) -> dict[str, Connection]:
+                """可达节点的出边，第一次访问时解析"""
+                tgt_map = resolved.get(src)
+                if tgt_map is None:
+                    tgt_map = resolved[src] = graph.resolve(src, scope)
+                return tgt_map
+
+            version = graph.version
+            entries: dict[Connection, Connection] = {}
+            routes: dict[tuple[Connection, str], Connection] = {}
+            nodes: dict[Connection, None] = {}
+            pending: list[Connection] = [self._inline_entry(n, outgoing, entries) for n in reversed(container)]
+            while pending:
+                node = pending.pop()
+                if node in nodes:
+                    continue
+                nodes[node] = None
+                for action, tgt in outgoing(node).items():
+                    tgt = self._inline_entry(tgt, outgoing, entries)
+                    routes[(node, action)] = tgt
+                    pending.append(tgt)
+            member_index: dict[str, Connection] = {}
+            for n in container:
+                member_index.setdefault(n.name, self._inline_entry(n, outgoing, entries))
+            routing = Routing(graph, version, container, tuple(nodes), routes, entries, member_index)
+        self._routing = routing
         return self
 
+    def _inline_entry(
+        self,
+        node: Connection,
+        outgoing: "Callable[[Connection], dict[str, Connection]]",
+        entries: "dict[Connection, Connection]",
+    ) -> Connection:
+        """子工作流可以内联时返回实际执行的第一个节点（逐层展开），否则返回节点本身
+
+        与递归执行等价的条件：普通 Flow 的执行逻辑、不需要单独的检查点/日志回调、容器非空，
+        且外层没有为其连接 exit 分支（递归执行时子工作流结束返回 exit，内联后直接结束）
+        """
+        if node in entries:
+            return entries[node]
+        seen: list[Connection] = []
+        entry = node
+        while (
+            isinstance(entry, Flow)
+            and entry is not self
+            and entry.inline
+            and type(entry).execute_workflow is Flow.execute_workflow
+            and entry.checkpointer is None
+            and entry.log is None
+            and entry.log_zh is None
+            and entry not in seen
+            and not any(action in EXIT_ACTIONS for action in outgoing(entry))
+        ):
+            members = [n for n in entry.conntainer.get(entry, []) if isinstance(n, Connection)]
+            if not members:
+                break
+            seen.append(entry)
+            entry = members[0]
+        for flow in seen:
+            entries[flow] = entry
+        return entry
+
+    @property
+    def is_compiled(self) -> bool:
+        """路由表是否与当前图结构一致"""
+        return self._routing.matches(self.graph)
+
+    def routing(self) -> Routing:
+        """当前图结构对应的路由表快照（需要时重新编译）"""
+        routing = self._routing
+        if not routing.matches(self.graph):
+            routing = self.compile()._routing
+        return routing
+
+    def _pinned_routing(self, ctx: ExecutionContext | None) -> Routing:
+        """本次运行使用的路由表快照，运行期间的图结构变更只影响新的运行
+
+        第一次执行到本工作流时固定本工作流及其嵌套的子工作流的快照（同一时刻的图结构），
+        之后同一运行中的子工作流直接使用固定的快照
+        """
+        pinned = ctx.routing if ctx is not None else None
+        if pinned is None:
+            return self.routing()
+        routing = pinned.get(self)
+        if routing is None:
+            routing = pinned.setdefault(self, self.routing())
+            pending = [node for node in routing.nodes if isinstance(node, Flow)]
+            while pending:
+                flow = pending.pop()
+                if flow not in pinned:
+                    sub = pinned.setdefault(flow, flow.routing())
+                    pending.extend(node for node in sub.nodes if isinstance(node, Flow))
+        return routing
+
+    def _is_sync_graph(self, seen: "set[Connection]" = None) -> bool:
+        """所有可达节点都能同步执行时，run 可以跳过事件循环
+
+        结果缓存在路由表快照上（`Routing.sync`），图结构变更重新编译后重新判断
+        """
+        if type(self).execute_workflow is not Flow.execute_workflow or self.checkpointer is not None:
+            return False
+        routing = self.routing()
+        if routing.sync is not None:
+            return routing.sync
+        top = seen is None
+        seen = set() if seen is None else seen
+        if self in seen:
+            return True
+        seen.add(self)
+        sync = all(node._is_sync_graph(seen) for node in routing.nodes)
+        # 嵌套工作流成环时，内层的结果依赖外层“可以同步执行”的假设，只缓存最外层的结果
+        if top:
+            routing.sync = sync
+        return sync
+
+    def validate(self, strict: bool = False) -> ValidationReport:
+        """静态分析工作流（见 `agnflow.core.analysis`），在执行前发现路由问题
+
+        - 基于编译后的路由表和节点 `Literal[...]` 返回值注解声明的 action 检查：
+          没有下一个节点的 action、没有出口的环路、不可达节点、同名节点
+        - 递归分析嵌套的工作流
+        - 结果与路由表一样按图的版本号缓存，连接关系不变时重复调用没有开销，执行路径上不做任何检查
+        - strict=True 时存在错误则抛出 ValueError
+        """
+        report = self._validated(set())
+        if strict and not report.ok:
+            raise ValueError(f"工作流 {self.name} 校验失败：\n{report}")
+        return report
+
+    def _validated(self, seen: "set[Connection]") -> ValidationReport:
+        """返回缓存的分析结果，图结构变化后重新分析"""
+        seen.add(self)
+        if self._report is not None and self._report_version == (self.graph, self.graph.version):
+            return self._report
+        routing = self.routing()
+        actions = {node: node.declared_actions() for node in routing.nodes}
+        issues = self._route_issues(routing, actions)
+        for node in (*routing.nodes, *routing.entries):
+            if isinstance(node, Flow) and node not in seen:
+                issues.extend(node._validated(seen).issues)
+        # 嵌套工作流与外层可能报告同一个问题
+        unique = {(issue.kind, issue.node, issue.message): issue for issue in issues}
+        declared = {node.name: value for node, value in actions.items() if value is not None}
+        self._report = ValidationReport(self.name, list(unique.values()), declared)
+        self._report_version = (routing.graph, routing.version)
+        return self._report
+
+    def _route_issues(self, routing: Routing, actions: dict) -> list[Issue]:
+        """分析本工作流的路由表"""
+        # 内联的子工作流以实际执行的第一个节点参与分析
+        members = [routing.entries.get(member, member) for member in routing.container]
+        return analyze_routes(self.name, members, routing.nodes, routing.routes, actions)
+
+    # endregion
+
     # region 执行流程
 
     async def execute_workflow(
@@ -148,22 +390,52 @@ class Flow(Connection[StateType]):
         5. 重复执行，直到达到最大步数或没有下一个节点
         """
         if remaining_steps <= 0:
-            print(f"达到最大执行步数，流程正常终止")
+            if self._log_enabled(logging.WARNING):
+                self._log("max_steps", logging.WARNING, flow=self, max_steps=remaining_steps)
             return "max_steps_exceeded"
 
-        # ⭐️ 获取起始节点
-        start_node = self._get_start_node(entry_action)
-        if not start_node:
-            print(f"没有找到起始节点，工作流结束")
-            return "exit"
+        # ⭐️ 根工作流需要增量时，在记录变更的 state 副本上执行，结束后写回
+        ctx = current_context()
+        is_root = ctx is not None and ctx.root is self
+        if is_root and not isinstance(state, TrackedState) and self._tracks_state(ctx):
+            tracked = TrackedState(state)
+            try:
+                return await self.execute_workflow(tracked, remaining_steps, entry_action, is_async)
+            finally:
+                self._write_back(state, tracked)
+        # 没有事件消费者时 emitter 为 None，不产生任何事件
+        emitter = ctx.emitter if ctx is not None else None
+        tracked = is_root and isinstance(state, TrackedState)
+
+        # ⭐️ 固定本次运行的路由表快照（图结构变更后或首次执行时重新编译），运行期间的增删节点不影响本次运行
+        routing = self._pinned_routing(ctx)
+
+        # ⭐️ 获取起始节点（从检查点恢复时为中断处的节点）
+        step = 0
+        checkpoint = self._checkpoint_session()
+        restored = await self._restore_checkpoint(checkpoint, state, routing) if checkpoint else None
+        if restored is not None:
+            step, start_node = restored
+            if start_node is None:
+                return "exit"
+        else:
+            start_node = self._get_start_node(entry_action, routing)
+            if not start_node:
+                return "exit"
+            if checkpoint:
+                await self._save_checkpoint(checkpoint, state, step, start_node, state.commit() if tracked else None)
 
         # ⭐️ 当前执行节点（每次只执行一个节点）
         current_node = start_node
-        step = 0
 
         while current_node and step < remaining_steps:
-            self.log(f"\n🔵 Executing node: {current_node} (Remaining steps: {remaining_steps - step})")
-            self.log_zh(f"\n🔵 执行节点: {current_node} (剩余步数: {remaining_steps - step})")
+            if self._log_enabled(logging.DEBUG):
+                self._log("node_start", node=current_node, remaining=remaining_steps - step)
+            if emitter:
+                emit("node_start", node=current_node, step=step)
+            # ⭐️ 超过运行的整体期限时终止（抛出 DeadlineExceeded）
+            if ctx is not None and ctx.deadline is not None:
+                ctx.check_deadline()
 
             # ⭐️ 执行当前节点
             try:
@@ -172,10 +444,14 @@ class Flow(Connection[StateType]):
                     state, remaining_steps=remaining_steps - step, is_async=is_async
                 )
 
+            except DeadlineExceeded:
+                raise
             except Exception as e:
-                print(f"🚨 节点 {current_node} 执行出错: {e}")
-                traceback.print_exc()
+                if self._log_enabled(logging.ERROR):
+                    self._log("node_error", logging.ERROR, exc_info=True, node=current_node, error=e)
                 result = "error"
+                if emitter:
+                    emit("error", {"error": repr(e)}, node=current_node, step=step)
 
             # ⭐️ 处理执行结果
             action, state_updates = self._process_execution_result(result)
@@ -183,7 +459,10 @@ class Flow(Connection[StateType]):
                 state.update(state_updates)
 
             # ⭐️ 获取下一个要执行的节点
-            next_node = self._get_next_node(current_node, action)
+            next_node = self._get_next_node(current_node, action, routing)
+            if emitter:
+                emit("node_end", {"action": action}, node=current_node, step=step)
+                emit("action", {"action": action, "next": getattr(next_node, "name", None)}, node=current_node, step=step)
             if next_node:
                 current_node = next_node
             else:
@@ -191,12 +470,201 @@ class Flow(Connection[StateType]):
 
             step += 1
 
+            # ⭐️ 根工作流每一步提交一次 state 增量，供事件流和检查点使用
+            delta = state.commit() if tracked else None
+            if emitter and delta:
+                emit("state_delta", {"updates": delta.updates, "deleted": list(delta.deleted)}, node=self, step=step)
+
+            # ⭐️ 保存检查点（下一个节点 + 步数 + state 增量）
+            if checkpoint:
+                await self._save_checkpoint(checkpoint, state, step, current_node, delta)
+
         if step >= remaining_steps:
-            print(f"达到最大执行步数 {remaining_steps}，流程正常终止")
+            if self._log_enabled(logging.WARNING):
+                self._log("max_steps", logging.WARNING, flow=self, max_steps=remaining_steps)
             return "max_steps_exceeded"
 
         return "exit"
 
+    async def astream(
+        self,
+        state: dict,
+        max_steps: int = 10,
+        entry_action: str = None,
+        run_id: str = None,
+        resume_from: str = None,
+        timeout: float = None,
+    ) -> AsyncIterator[Event]:
+        """异步执行工作流，逐个产出执行事件（见 `agnflow.core.event.Event`）
+
+        事件：run_start → (node_start → [token/自定义事件] → node_end → action → state_delta)* → run_end，
+        节点出错时产出 error。run_end 的 data 为工作流的返回值。
+
+        提前退出迭代（break/aclose）会取消仍在执行的工作流；工作流抛出的异常在迭代结束时重新抛出。
+        节点在 state 的副本上执行，传入的 dict 在运行结束（含出错、取消）时才更新，运行期间的变化见 state_delta 事件
+
+        示例：
+        ```python
+        async for event in flow.astream(state):
+            await websocket.send_json(event.to_dict())
+        ```
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        emitter = EventEmitter(queue)
+        run_id = resume_from or run_id or uuid.uuid4().hex
+        done = object()
+
+        async def run():
+            try:
+                return await self._run_workflow(
+                    state, max_steps, entry_action, True, run_id, resume_from, emitter, timeout
+                )
+            finally:
+                queue.put_nowait(done)
+
+        yield Event("run_start", run_id=run_id, node=self.name)
+        task = asyncio.ensure_future(run())
+        try:
+            while (event := await queue.get()) is not done:
+                yield event
+            result = await task
+            yield Event("run_end", run_id=run_id, node=self.name, data=result)
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def run_batch(
+        self,
+        states: Iterable[dict],
+        concurrency: int = 8,
+        max_steps: int = 10,
+        entry_action: str = None,
+        timeout: float = None,
+    ) -> BatchRun:
+        """在多个独立的 state 上执行工作流（见 `agnflow.core.batch`），迭代返回值按完成顺序得到结果
+
+        - 与逐个调用 run 等价，但整个批次共享路由表快照，纯同步图不创建事件循环
+        - 纯同步图在 concurrency 个工作线程中执行，包含异步等待的图在后台事件循环中最多 concurrency 个并发执行；
+          节点不阻塞等待的纯同步图受 GIL 限制，concurrency=1 在当前线程逐个执行，开销最小
+        - timeout 为每次运行的期限（秒）；单个 state 出错时异常保存在结果中，不中断批次
+        - 返回值的 `stats` 为吞吐量与延迟统计
+
+        示例：
+        ```python
+        batch = flow.run_batch(eval_states, concurrency=16)
+        for item in batch:
+            scores[item.index] = item.state.get("score")
+        print(batch.stats)
+        ```
+        """
+        return BatchRun(self, states, concurrency, max_steps, entry_action, timeout, is_async=False)
+
+    def arun_batch(
+        self,
+        states: Iterable[dict],
+        concurrency: int = 8,
+        max_steps: int = 10,
+        entry_action: str = None,
+        timeout: float = None,
+    ) -> BatchRun:
+        """异步批量执行（与逐个调用 arun 等价），在当前事件循环中最多 concurrency 个并发执行
+
+        示例：
+        ```python
+        batch = flow.arun_batch(eval_states, concurrency=32)
+        async for item in batch:
+            print(item.index, item.result, item.error)
+        print(batch.stats)
+        ```
+        """
+        return BatchRun(self, states, concurrency, max_steps, entry_action, timeout, is_async=True)
+
+    # region 日志
+
+    def _log_enabled(self, level: int) -> bool:
+        """该级别的日志是否需要输出（调用方据此跳过消息构造）"""
+        if self.log is None and self.log_zh is None:
+            return enabled(level)
+        return not is_quiet() or level >= logging.ERROR
+
+    def _log(self, key: str, level: int = logging.DEBUG, exc_info: Any = None, **fields: Any):
+        """输出目录消息：指定了 log/log_zh 回调时交给回调，否则交给 logging"""
+        if self.log is None and self.log_zh is None:
+            log(key, level, exc_info=exc_info, **fields)
+            return
+        if self.log is not None:
+            self.log(format_message(key, "en", **fields))
+        if self.log_zh is not None:
+            self.log_zh(format_message(key, "zh", **fields))
+        if exc_info:
+            # 回调只接收消息文本，异常堆栈仍交给 logging
+            log(key, level, exc_info=exc_info, **fields)
+
+    # endregion
+
+    # region 状态增量与检查点
+
+    def _tracks_state(self, ctx: ExecutionContext) -> bool:
+        """是否需要记录每一步的 state 增量（保存检查点或有事件消费者）"""
+        return self.checkpointer is not None or ctx.emitter is not None
+
+    @staticmethod
+    def _write_back(state: dict, tracked: TrackedState):
+        """把执行结果写回调用方传入的 state"""
+        dict.update(state, tracked)
+        for key in [key for key in state if key not in tracked]:
+            del state[key]
+
+    def _checkpoint_session(self) -> "tuple[str, bool, StateDiffer] | None":
+        """只有配置了检查点的根工作流保存检查点，返回 (run_id, 是否恢复, 增量计算器)"""
+        ctx = current_context()
+        if self.checkpointer is None or ctx is None or ctx.root is not self:
+            return None
+        return ctx.run_id, ctx.resume, StateDiffer()
+
+    async def _restore_checkpoint(
+        self, checkpoint: "tuple[str, bool, StateDiffer]", state: dict, routing: Routing
+    ) -> "tuple[int, Connection | None] | None":
+        """从检查点恢复 state，返回 (已执行步数, 下一个节点)；没有检查点时返回 None"""
+        run_id, resume, differ = checkpoint
+        if not resume:
+            return None
+        restored = await self.checkpointer.restore(run_id)
+        if restored is None:
+            return None
+        step, node_name, saved_state, data = restored
+        # 检查点中没有保存的键（无法序列化的运行期对象）沿用调用方传入的值
+        state.update(saved_state)
+        differ.load(data)
+        next_node = None
+        if node_name is not None:
+            next_node = routing.by_name.get(node_name)
+            if next_node is None:
+                raise ValueError(f"无法从检查点恢复：{self.name} 中不存在节点 {node_name}")
+        if self._log_enabled(logging.INFO):
+            self._log("resume", logging.INFO, flow=self, run_id=run_id, step=step, node=next_node)
+        return step, next_node
+
+    async def _save_checkpoint(
+        self,
+        checkpoint: "tuple[str, bool, StateDiffer]",
+        state: dict,
+        step: int,
+        next_node: "Connection | None",
+        delta: StateDelta = None,
+    ):
+        """保存一步的检查点，只写入变化的 state 键
+
+        提供本步的 state 增量时只序列化增量中的键，否则扫描整个 state
+        """
+        run_id, _, differ = checkpoint
+        keys = delta.updates if delta is not None and differ.scanned else None
+        updates, deleted = differ.diff(state, keys)
+        next_name = next_node.name if next_node is not None else None
+        await self.checkpointer.put(Checkpoint(run_id, step, next_name, updates, deleted))
+
+    # endregion
+
     def _process_execution_result(self, result: Any) -> tuple[str, dict]:
         """处理执行结果，返回 (action, state_updates)"""
         if isinstance(result, dict):
@@ -211,56 +679,58 @@ class Flow(Connection[StateType]):
         else:
             return "exit", {}
 
-    def _get_start_node(self, entry_action: str = None) -> Connection | None:
+    def _get_start_node(self, entry_action: str = None, routing: Routing = None) -> Connection | None:
         """
-        获取起始节点，支持 action 入口选择
+        获取起始节点，支持 action 入口选择（routing 为本次运行的路由表快照，默认为当前快照）
 
-        1. 优先使用 connections[self][entry_action]
-        2. 其次使用 container[self][0] 第一个节点
+        1. 指定 entry_action 时从入口索引 `routing.members` 中查找同名节点，不存在时抛出 ValueError
+        2. 否则使用容器内第一个节点
         3. 都没有就返回 None（对应 exit）
         """
-        # 1. 优先使用 self.connections[self][entry_action]
-        if entry_action and self in self.conntainer and entry_action in [i.name for i in self.conntainer[self]]:
-            start_node = next(i for i in self.conntainer[self] if i.name == entry_action)
-            self.log(
-                f"🟢 {self.name}{self.conntainer[self]} selects entry node: {start_node} based on entry_action: '{entry_action}'"
-            )
-            self.log_zh(
-                f"🟢 {self.name}{self.conntainer[self]} 根据 entry_action: '{entry_action}' 选择入口节点: {start_node}"
-            )
+        routing = routing or self.routing()
+        # 1. 按名称查找入口节点（内联的子工作流已解析为它的第一个节点）
+        if entry_action:
+            start_node = routing.members.get(entry_action)
+            if start_node is None:
+                raise ValueError(
+                    f"工作流 {self.name} 中不存在入口节点 {entry_action}，可选的入口节点为 {list(routing.members)}"
+                )
+            if self._log_enabled(logging.DEBUG):
+                self._log(
+                    "entry_node", flow=self, members=list(routing.container), node=start_node, entry_action=entry_action
+                )
             return start_node
 
-        # 2. 其次使用 container[self][0]
-        if self in self.conntainer and self.conntainer[self]:
-            start_node = self.conntainer[self][0]
-            self.log(f"🟢 {self.name}{self.conntainer[self]} selects entry node: {start_node} as the first node")
-            self.log_zh(f"🟢 {self.name}{self.conntainer[self]} 第一个节点作为起始节点: {start_node}")
+        # 2. 其次使用容器内第一个节点
+        if routing.container:
+            start_node = routing.container[0]
+            start_node = routing.entries.get(start_node, start_node)
+            if self._log_enabled(logging.DEBUG):
+                self._log("first_node", flow=self, members=list(routing.container), node=start_node)
             return start_node
 
         # 3. 都没有就返回 None（对应 exit）
-        self.log(f"🛑 No start node found, exiting normally")
-        self.log_zh("🛑 没有找到起始节点，正常退出")
+        if self._log_enabled(logging.WARNING):
+            self._log("no_start_node", logging.WARNING, flow=self)
         return None
 
-    def _get_next_node(self, current_node: Connection, action: str = None) -> Connection | None:
+    def _get_next_node(self, current_node: Connection, action: str = None, routing: Routing = None) -> Connection | None:
         """
         获取当前节点的下一个节点。
 
-        使用 self.all_connections[current_node][action] 查找下一个节点，
+        使用路由表快照 routing.routes[(节点, action)] 查找下一个节点，
         如果没有找到就返回 None（对应 exit）
         """
-        # 使用 all_connections 查找下一个节点
-        if current_node in self.all_connections:
-            targets = self.all_connections[current_node]
-            if action in targets:
-                tgt = targets[action]
-                self.log(f"🔵 transfer to the next node: {tgt} 🚀")
-                self.log_zh(f"🔵 流转下一个节点: {tgt}")
-                return tgt
+        routing = routing or self.routing()
+        tgt = routing.routes.get((current_node, action))
+        if tgt is not None:
+            if self._log_enabled(logging.DEBUG):
+                self._log("next_node", node=tgt)
+            return tgt
 
         # 如果没有找到下一个节点，返回 None（对应 exit）
-        self.log(f"\n🛑 Node {current_node} with action '{action}' did not find the next node, exiting normally")
-        self.log_zh(f"\n🛑 节点 {current_node} 的 action '{action}' 没有找到下一个节点，正常退出")
+        if self._log_enabled(logging.DEBUG):
+            self._log("no_next_node", node=current_node, action=action)
         return None
 
     # endregion
@@ -304,6 +774,7 @@ if __name__ == "__main__":
 class Supervisor(Flow):
     """监督者智能体（监督者与被监督者互连）"""
 
+    @mutation
     def __getitem__(self, node: list[Node]) -> Self:
         """重载运算符 self[key]，设置子工作流
 
@@ -317,6 +788,7 @@ class Supervisor(Flow):
         # 统一转为 list
         if not isinstance(node, (list, tuple)):
             node = [node]
+        Graph.union(self, node)
         conntainer = self.conntainer.setdefault(self, [])
         # 预判加完后的总数
         new_total = len(conntainer) + len([n for n in node if n not in conntainer])
@@ -346,6 +818,7 @@ if __name__ == "__main__":
 class Swarm(Flow):
     """蜂群智能体（蜂群节点全互连）"""
 
+    @mutation
     def __getitem__(self, node: "list[Node] | Any") -> Self:
         """重载运算符 self[key]，获取子工作流
 
@@ -360,6 +833,7 @@ class Swarm(Flow):
             node = [node]
 
         # 预判加完后的总数
+        Graph.union(self, node)
         conntainer = self.conntainer.setdefault(self, [])
         new_total = len(conntainer) + len([n for n in node if n not in conntainer])
         if new_total < 2:
@@ -424,11 +898,97 @@ if __name__ == "__main__":
     # s1.run({}, max_steps=10, entry_action="n2")
 
 
-class ParallelFlow(Flow):
-    """并行工作流"""
+Reducer = Callable[[Any, list], Any]
+"""状态合并函数 (旧值, 各分支新值列表（按分支顺序）) -> 合并后的值"""
+
+def _as_list(value: Any) -> list:
+    return list(value) if isinstance(value, (list, tuple)) else [] if value is None else [value]
+
+
+def _extend(old: Any, values: list) -> list:
+    """把各分支列表中的新元素依次追加到旧列表（分支原地追加时，列表以旧值开头，只取新增部分）"""
+    base = _as_list(old)
+    merged = list(base)
+    for value in values:
+        items = _as_list(value)
+        if base and items[: len(base)] == base:
+            items = items[len(base) :]
+        merged.extend(items)
+    return merged
+
+
+REDUCERS: "dict[str, Reducer]" = {
+    "last": lambda old, values: values[-1],
+    "append": lambda old, values: [*_as_list(old), *values],
+    "extend": _extend,
+}
+"""内置合并函数：last 最后写入者胜出，append 把每个分支的值作为一个元素追加到列表（适用于标量值），
+extend 把各分支列表中的新元素展开追加到列表（适用于列表值，如分支内 `state["messages"].append(...)`）"""
+
+
+def _modified(new: Any, old: Any) -> bool:
+    """分支读取过的值是否与外层的值不同（无法比较时视为已修改）"""
+    try:
+        return bool(new != old)
+    except Exception:
+        return True
 
-    def __getitem__(self, nodes: list[Node]):
+
+def unanimous(actions: list[str]) -> str:
+    """默认的 action 聚合：所有分支 action 一致时沿用该 action，否则 exit"""
+    return actions[0] if actions and all(action == actions[0] for action in actions) else "exit"
+
+
+class ParallelFlow(Flow):
+    """并行工作流（fan-out / fan-in）
+
+    特性：
+    - 每个分支在 state 的 copy-on-write 副本（`BranchState`）上执行，分支读取的列表、字典等容器会被深拷贝，
+      原地修改不会影响外层和其他分支
+    - 分支结束后收集返回值和 state 变更，按键通过 reducer 合并回 state
+    - 根据各分支的 action 聚合出整体 action，作为并行工作流的返回值继续路由
+    - max_concurrency 限制同时执行的分支数，避免大规模 fan-out 同时发起请求
+
+    参数：
+    - reducers 按键指定合并方式 {key: "last" | "append" | "extend" | callable(old, values)}，
+      分支向列表追加元素时使用 extend，append 会把每个分支的整个值作为一个元素追加
+    - reducer 未指定键的默认合并方式，默认 last
+    - aggregate 聚合 action 的函数 (actions) -> action，默认 `unanimous`
+    """
+
+    def __init__(
+        self,
+        name: str = None,
+        log: Callable = None,
+        log_zh: Callable = None,
+        max_concurrency: int = None,
+        reducers: "dict[str, str | Reducer]" = None,
+        reducer: "str | Reducer" = "last",
+        aggregate: Callable[[list[str]], str] = None,
+    ):
+        super().__init__(name=name, log=log, log_zh=log_zh)
+        self.max_concurrency = max_concurrency
+        self.reducers: dict[str, Reducer] = {k: self._get_reducer(v) for k, v in (reducers or {}).items()}
+        self.reducer: Reducer = self._get_reducer(reducer)
+        self.aggregate = aggregate or unanimous
+
+    def _route_issues(self, routing: Routing, actions: dict) -> list[Issue]:
+        """分支并行执行、不按 action 路由，只检查同名节点"""
+        return [issue for issue in super()._route_issues(routing, actions) if issue.kind == "name_collision"]
+
+    @staticmethod
+    def _get_reducer(reducer: "str | Reducer") -> Reducer:
+        if callable(reducer):
+            return reducer
+        if reducer not in REDUCERS:
+            raise ValueError(f"未知的合并方式 {reducer}，可选值：{list(REDUCERS)} 或自定义函数")
+        return REDUCERS[reducer]
+
+    @mutation
+    def __getitem__(self, nodes: "list[Node] | Node"):
         """重载运算符 self[key]，获取子节点"""
+        nodes = nodes if isinstance(nodes, (list, tuple)) else [nodes]
+        Graph.union(self, nodes).touch()
         container = self.conntainer.setdefault(self, [])
         container.extend(nodes)
         return self
@@ -436,11 +996,55 @@ class ParallelFlow(Flow):
     async def execute_workflow(
         self, state: dict, remaining_steps: int = 10, entry_action: str = None, is_async: bool = False
     ) -> Any:
-        """并行节点执行工作流"""
-        container = self.conntainer.get(self, [])
-        await asyncio.gather(
-            *[node.execute_workflow(state, remaining_steps, entry_action, is_async) for node in container]
-        )
+        """并行节点执行工作流
+
+        1. fan-out：每个分支在 state 的 copy-on-write 副本上执行，受 max_concurrency 限制
+        2. fan-in：按分支顺序收集各分支写入或原地修改的键，通过 reducer 合并回 state
+        3. 返回聚合后的 action
+        """
+        branches = self._pinned_routing(current_context()).container
+        if not branches:
+            return "exit"
+        semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+
+        async def run_branch(node: Connection) -> tuple[str, dict]:
+            branch_state = BranchState(state)
+            if semaphore:
+                async with semaphore:
+                    result = await node.execute_workflow(branch_state, remaining_steps, entry_action, is_async)
+            else:
+                result = await node.execute_workflow(branch_state, remaining_steps, entry_action, is_async)
+            action, state_updates = self._process_execution_result(result)
+            branch_state.update(state_updates)
+            # 收集分支新增、重新赋值的键，以及读取后确实被原地修改的键
+            changes = {}
+            for key in branch_state.changed_keys():
+                value = dict.__getitem__(branch_state, key)
+                if key in branch_state.written or key not in state or _modified(value, dict.__getitem__(state, key)):
+                    changes[key] = value
+            return action, changes
+
+        # 任一分支失败或整体被取消时，取消其余仍在执行的分支
+        tasks = [asyncio.ensure_future(run_branch(node)) for node in branches]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        # ⭐️ 按键合并各分支的变更
+        values: dict[str, list] = {}
+        for _, changes in results:
+            for key, value in changes.items():
+                values.setdefault(key, []).append(value)
+        for key, branch_values in values.items():
+            reducer = self.reducers.get(key, self.reducer)
+            state[key] = reducer(state.get(key), branch_values)
+
+        action = self.aggregate([action for action, _ in results])
+        if self._log_enabled(logging.DEBUG):
+            self._log("parallel_merged", flow=self, branches=len(branches), action=action)
+        return action
 
 
 if __name__ == "__main__":
@@ -456,7 +1060,7 @@ if __name__ == "__main__":
     n1 = Node(aexec=sleep_and_print)
     n2 = Node(aexec=sleep_and_print)
     n3 = Node(aexec=sleep_and_print)
-    pf = ParallelFlow()
+    pf = ParallelFlow(max_concurrency=2)
     pf[n1, n2, n3]
 
     asyncio.run(pf.arun({"a": 1}))
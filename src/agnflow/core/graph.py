@@ -0,0 +1,398 @@
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, TypeVar
+from collections.abc import MutableMapping
+from weakref import WeakKeyDictionary, WeakSet
+import functools, threading, weakref
+
+if TYPE_CHECKING:
+    from agnflow.core.connection import Connection
+
+
+# 图结构修改与路由表编译共用的锁：编译时不会读到修改了一半的图（执行时不加锁）
+_graph_lock = threading.RLock()
+
+F = TypeVar("F", bound=Callable)
+
+
+def mutation(method: F) -> F:
+    """装饰器：在图结构锁内执行修改连接关系的方法，修改完成后新结构对编译整体可见"""
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with _graph_lock:
+            return method(*args, **kwargs)
+
+    return wrapper
+
+
+class NodeMap(WeakKeyDictionary):
+    """以节点为弱引用键的字典，打印时与普通 dict 一致（如 `{a: {'b': b}}`）"""
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+def _deref(entry: "Connection | weakref.ref") -> "Connection | None":
+    """连接登记项对应的目标节点（弱引用的目标节点已被回收时为 None）"""
+    return entry() if isinstance(entry, weakref.ref) else entry
+
+
+class Edges(MutableMapping):
+    """一个源节点的出边 {action: target}
+
+    - 以目标节点身份登记：action（目标节点名称）相同的不同节点可以同时存在，
+      如每条消息新建一个同名的 chat_node 连接到共享的 agent，各自的工作流编译时选择自己容器内的节点
+    - 按 action 读取（`edges[action]`、items、values）时返回最近连接的节点，与 {action: target} 字典用法一致
+    - `candidates(action)` 返回该 action 的所有目标节点（最近连接的在前）
+    - 容器建立的内部连接（`weak=True`）弱引用目标节点，目标节点由容器持有，被回收后连接自动删除，
+      长期存活的共享节点不会因为出边而持有每条消息新建的节点；运算符 `>>` 建立的连接强引用目标节点
+    """
+
+    __slots__ = ("_targets", "__weakref__")
+
+    def __init__(self, items: "Iterable[tuple[str, Connection]] | dict" = ()):
+        # {action: [target 或 weakref(target), ...]}，按连接顺序排列，最后一个为最近连接的节点
+        # 目标节点被回收时只从列表中删除，不改变字典大小，迭代过程中发生回收也是安全的
+        self._targets: "dict[str, list[Connection | weakref.ref]]" = {}
+        for action, tgt in items.items() if isinstance(items, dict) else items:
+            self.add(action, tgt)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def __getitem__(self, action: str) -> "Connection":
+        for entry in reversed(self._targets.get(action, ())):
+            tgt = _deref(entry)
+            if tgt is not None:
+                return tgt
+        raise KeyError(action)
+
+    def __setitem__(self, action: str, tgt: "Connection"):
+        self._targets[action] = [tgt]
+
+    def __delitem__(self, action: str):
+        if not self._live(action):
+            raise KeyError(action)
+        del self._targets[action]
+
+    def __iter__(self) -> Iterator[str]:
+        return (action for action in list(self._targets) if self._live(action))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def _live(self, action: str) -> "list[Connection]":
+        """action 仍然存活的目标节点，按连接顺序排列"""
+        return [tgt for tgt in map(_deref, list(self._targets.get(action, ()))) if tgt is not None]
+
+    def _ref(self, action: str, tgt: "Connection") -> weakref.ref:
+        """目标节点的弱引用，回收时从 action 的列表中删除"""
+        edges = weakref.ref(self)
+
+        def discard(ref: weakref.ref):
+            self = edges()
+            targets = self._targets.get(action) if self is not None else None
+            if targets is not None and ref in targets:
+                targets.remove(ref)
+
+        return weakref.ref(tgt, discard)
+
+    def add(self, action: str, tgt: "Connection", weak: bool = False):
+        """添加连接，已存在时移到最近连接的位置（已经强引用的连接保持强引用）"""
+        targets, strong = [], not weak
+        for entry in self._targets.get(action, ()):
+            old = _deref(entry)
+            if old is tgt:
+                strong = strong or not isinstance(entry, weakref.ref)
+            elif old is not None:
+                targets.append(entry)
+        targets.append(tgt if strong else self._ref(action, tgt))
+        self._targets[action] = targets
+
+    def remove(self, action: str, tgt: "Connection" = None) -> "list[Connection]":
+        """删除 action 指向 tgt 的连接（tgt 为 None 时删除该 action 的所有连接），返回被删除的目标节点"""
+        live = self._live(action)
+        if tgt is None:
+            removed = live
+        elif any(old is tgt for old in live):
+            removed = [tgt]
+        else:
+            return []
+        targets = [entry for entry in self._targets.pop(action, ()) if _deref(entry) not in (None, *removed)]
+        if targets:
+            self._targets[action] = targets
+        return removed
+
+    def candidates(self, action: str) -> "list[Connection]":
+        """action 的所有目标节点，最近连接的在前"""
+        return self._live(action)[::-1]
+
+    def edges(self) -> "Iterator[tuple[str, Connection]]":
+        """所有连接 (action, target)，包括同名的多个目标节点"""
+        for action, tgt, _ in self.entries():
+            yield action, tgt
+
+    def entries(self) -> "Iterator[tuple[str, Connection, bool]]":
+        """所有连接 (action, target, 是否弱引用)"""
+        for action, targets in list(self._targets.items()):
+            for entry in list(targets):
+                tgt = _deref(entry)
+                if tgt is not None:
+                    yield action, tgt, isinstance(entry, weakref.ref)
+
+
+def entries_of(tgt_map: "Edges | dict") -> "Iterator[tuple[str, Connection, bool]]":
+    """连接字典中的所有连接 (action, target, 是否弱引用)（兼容直接写入的普通 dict）"""
+    if isinstance(tgt_map, Edges):
+        return tgt_map.entries()
+    return ((action, tgt, False) for action, tgt in list(tgt_map.items()))
+
+
+class Graph:
+    """图注册表（一组互相连接的节点与容器共享的连接关系）
+
+    特性：
+    - 取代进程级全局字典，每张图只保存自己节点的连接关系
+    - 节点以弱引用登记，丢弃的工作流及其连接可以被垃圾回收；容器建立的内部连接弱引用目标节点，
+      共享节点与每条消息新建的节点互连时，丢弃的节点也可以被回收
+    - 节点/容器发生连接时，两张图合并为一张（小图并入大图）
+    - 维护版本号，任何连接变更都会递增，用于使已编译的路由表失效
+    - 维护反向邻接索引（每个节点的入边来源），增删节点的代价为 O(度数)，不需要扫描整张图
+
+    数据：
+    - connections 显式连接 {source: Edges{action: target}}
+    - hidden_connections 隐式连接 {source: Edges{action: target}}
+    - incoming 显式连接的反向索引 {target: {source: {action, ...}}}
+    - hidden_incoming 隐式连接的反向索引 {target: {source: {action, ...}}}
+    - conntainer 容器 {container: [node, ...]}
+    - nodes 图中所有节点（弱引用）
+    - version 连接版本号
+
+    连接需要通过 `link`/`unlink`（运算符内部使用）增删以维护反向索引，
+    直接修改 connections/hidden_connections 字典后需要调用 `reindex()` 重建索引
+    """
+
+    def __init__(self):
+        self.connections: "NodeMap[Connection, Edges]" = NodeMap()
+        self.hidden_connections: "NodeMap[Connection, Edges]" = NodeMap()
+        self.incoming: "NodeMap[Connection, NodeMap[Connection, set[str]]]" = NodeMap()
+        self.hidden_incoming: "NodeMap[Connection, NodeMap[Connection, set[str]]]" = NodeMap()
+        self.conntainer: "NodeMap[Connection, list[Connection]]" = NodeMap()
+        self.nodes: "WeakSet[Connection]" = WeakSet()
+        self.version: int = 0
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __repr__(self) -> str:
+        return f"Graph(nodes={len(self.nodes)}, version={self.version})"
+
+    def touch(self):
+        """标记连接关系已变更（递增版本号）"""
+        self.version += 1
+
+    # region 连接与反向索引
+
+    def _maps(self, hidden: bool) -> "tuple[NodeMap, NodeMap]":
+        """(连接字典, 反向索引)"""
+        if hidden:
+            return self.hidden_connections, self.hidden_incoming
+        return self.connections, self.incoming
+
+    @staticmethod
+    def _index(incoming: NodeMap, src: "Connection", key: str, tgt: "Connection"):
+        """反向索引中记录 src -key-> tgt"""
+        sources = incoming.get(tgt)
+        if sources is None:
+            sources = incoming[tgt] = NodeMap()
+        keys = sources.get(src)
+        if keys is None:
+            sources[src] = {key}
+        else:
+            keys.add(key)
+
+    @staticmethod
+    def _unindex(incoming: NodeMap, src: "Connection", key: str, tgt: "Connection"):
+        """反向索引中删除 src -key-> tgt"""
+        sources = incoming.get(tgt)
+        keys = sources.get(src) if sources is not None else None
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del sources[src]
+
+    @staticmethod
+    def _edges(conn_map: NodeMap, src: "Connection") -> "Edges | None":
+        """源节点的出边，直接写入的普通 dict 转为 Edges"""
+        tgt_map = conn_map.get(src)
+        if tgt_map is not None and not isinstance(tgt_map, Edges):
+            tgt_map = conn_map[src] = Edges(tgt_map)
+        return tgt_map
+
+    def link(self, src: "Connection", key: str, tgt: "Connection", hidden: bool = False, weak: bool = False):
+        """添加连接 src -key-> tgt（同名的其他目标节点保留，读取时最近连接的节点优先）
+
+        weak 为 True 时弱引用目标节点（目标节点由容器持有，见 `Edges`）"""
+        conn_map, incoming = self._maps(hidden)
+        tgt_map = self._edges(conn_map, src)
+        if tgt_map is None:
+            tgt_map = conn_map[src] = Edges()
+        tgt_map.add(key, tgt, weak)
+        self._index(incoming, src, key, tgt)
+
+    def unlink(self, src: "Connection", key: str, hidden: bool = False, tgt: "Connection" = None) -> "list[Connection]":
+        """删除连接 src -key-> tgt（tgt 为 None 时删除该 action 的所有连接），返回被删除的目标节点，
+        源节点没有出边时删除其连接字典"""
+        conn_map, incoming = self._maps(hidden)
+        tgt_map = self._edges(conn_map, src)
+        if tgt_map is None:
+            return []
+        removed = tgt_map.remove(key, tgt)
+        if not tgt_map:
+            del conn_map[src]
+        for old in removed:
+            self._unindex(incoming, src, key, old)
+        return removed
+
+    def resolve(self, src: "Connection", scope: "set[Connection] | frozenset" = frozenset()) -> "dict[str, Connection]":
+        """源节点的出边 {action: target}（显式连接优先于隐式连接）
+
+        同一个 action 有多个同名目标节点时，优先选择 scope（编译中的工作流的成员）内的节点，否则选择最近连接的节点
+        """
+        resolved: dict[str, Connection] = {}
+        for conn_map in (self.hidden_connections, self.connections):
+            tgt_map = conn_map.get(src)
+            if not tgt_map:
+                continue
+            for action in tgt_map:
+                if isinstance(tgt_map, Edges):
+                    candidates = tgt_map.candidates(action)
+                    if candidates:
+                        resolved[action] = next((tgt for tgt in candidates if tgt in scope), candidates[0])
+                else:
+                    resolved[action] = tgt_map[action]
+        return resolved
+
+    def sources(self, tgt: "Connection", hidden: bool = False) -> "list[Connection]":
+        """有连接指向 tgt 的源节点"""
+        sources = self._maps(hidden)[1].get(tgt)
+        return list(sources.keys()) if sources else []
+
+    def detach(self, node: "Connection"):
+        """删除节点的所有出边与入边，代价为 O(节点的度数)"""
+        for hidden in (False, True):
+            conn_map, incoming = self._maps(hidden)
+            for key in list(conn_map.get(node, ())):
+                self.unlink(node, key, hidden)
+            sources = incoming.pop(node, None)
+            if not sources:
+                continue
+            for src, keys in list(sources.items()):
+                tgt_map = self._edges(conn_map, src)
+                if tgt_map is None:
+                    continue
+                for key in keys:
+                    tgt_map.remove(key, node)
+                if not tgt_map:
+                    del conn_map[src]
+
+    def reindex(self):
+        """根据连接字典重建反向索引（直接修改连接字典后调用）"""
+        for hidden in (False, True):
+            conn_map, incoming = self._maps(hidden)
+            incoming.clear()
+            for src in list(conn_map.keys()):
+                for key, tgt in self._edges(conn_map, src).edges():
+                    self._index(incoming, src, key, tgt)
+
+    # endregion
+
+    def merge(self, other: "Graph") -> "Graph":
+        """合并两张图，返回合并后的图（小图并入大图）"""
+        if other is self:
+            return self
+        big, small = (self, other) if len(self.nodes) >= len(other.nodes) else (other, self)
+        for hidden in (False, True):
+            for src, tgt_map in list(small._maps(hidden)[0].items()):
+                for key, tgt, weak in entries_of(tgt_map):
+                    big.link(src, key, tgt, hidden, weak)
+        for container, members in small.conntainer.items():
+            big_members = big.conntainer.setdefault(container, [])
+            big_members.extend(m for m in members if m not in big_members)
+        for node in list(small.nodes):
+            node._graph = big
+            big.nodes.add(node)
+        big.version = max(big.version, small.version) + 1
+        return big
+
+    @staticmethod
+    def union(*objs: "Connection | list | tuple | slice") -> "Graph":
+        """把所有 Connection 对象所在的图合并为一张，返回合并后的图
+
+        支持嵌套的列表、元组、切片，以及链路代理对象（展开其 chains）
+        """
+        from agnflow.core.connection import Connection
+
+        graph: Graph | None = None
+        pending = list(objs)
+        while pending:
+            obj = pending.pop()
+            if isinstance(obj, slice):
+                pending.extend((obj.start, obj.stop, obj.step))
+            elif isinstance(obj, (list, tuple)):
+                pending.extend(obj)
+            elif isinstance(obj, Connection):
+                # 链路代理对象（如 a >> b 的返回值）本身不登记到图中
+                if obj.chains and obj.chains[0] is not obj:
+                    pending.extend(obj.chains)
+                    continue
+                graph = obj.graph if graph is None else graph.merge(obj.graph)
+        return graph if graph is not None else Graph()
+
+
+class Routing:
+    """编译后的路由表快照（发布后不再修改）
+
+    - 每个版本的图结构编译一次，同一版本的所有运行共享同一个快照，不需要为每次运行复制
+    - 图结构变更后编译出新的快照并整体替换（一次属性赋值），正在执行的运行继续使用开始时固定的快照
+
+    数据：
+    - graph / version 编译时的图与版本号
+    - container 编译时容器内的节点（未内联）
+    - nodes 可达节点（按发现顺序排列）
+    - routes 路由表 {(node, action): target}，以节点身份和 action 为键，执行时一次查表得到下一个节点
+    - entries 内联的子工作流 {子工作流: 实际执行的第一个节点}
+    - members 容器内节点的入口索引 {节点名称: 实际执行的节点}
+    - by_name 可达节点的名称索引 {节点名称: 节点}，同名时取最先发现的节点，从检查点恢复时按名称查找下一个节点
+    - sync 是否为纯同步图（run 可以跳过事件循环），第一次判断后缓存，None 表示尚未判断
+    """
+
+    __slots__ = ("graph", "version", "container", "nodes", "routes", "entries", "members", "by_name", "sync")
+
+    def __init__(
+        self,
+        graph: Graph | None = None,
+        version: int = -1,
+        container: "tuple[Connection, ...]" = (),
+        nodes: "tuple[Connection, ...]" = (),
+        routes: "dict[tuple[Connection, str], Connection]" = None,
+        entries: "dict[Connection, Connection]" = None,
+        members: "dict[str, Connection]" = None,
+    ):
+        self.graph = graph
+        self.version = version
+        self.container = container
+        self.nodes = nodes
+        self.routes = routes if routes is not None else {}
+        self.entries = entries if entries is not None else {}
+        self.members = members if members is not None else {}
+        self.by_name: "dict[str, Connection]" = {}
+        for node in nodes:
+            self.by_name.setdefault(node.name, node)
+        self.sync: bool | None = None
+
+    def __repr__(self) -> str:
+        return f"Routing(nodes={len(self.nodes)}, version={self.version})"
+
+    def matches(self, graph: Graph) -> bool:
+        """快照是否与图的当前结构一致"""
+        return self.graph is graph and self.version == graph.version
@@ -1,20 +1,166 @@
-from typing import Any, Callable, Generic
-import asyncio, time, inspect
+from typing import Any, Awaitable, Callable, Generic, Iterable, Literal
+from concurrent.futures import FIRST_COMPLETED, wait as wait_futures
+import asyncio, contextvars, functools, logging, pickle, time, inspect, weakref
 
+from agnflow.core.analysis import executor_actions
+from agnflow.core.cache import Cache, cache_key
 from agnflow.core.connection import Connection
+from agnflow.core.context import DeadlineExceeded, ExecutionContext, current_context, node_context
+from agnflow.core.event import emit as emit_event
+from agnflow.core.policy import Bulkhead, CircuitBreaker, RetryPolicy, sleep
+from agnflow.core.runner import get_runner
+from agnflow.core.state import TrackedState
 from agnflow.core.type import StateType
+from agnflow.utils.log import log
+
+ExecPolicy = Literal["inline", "thread", "process"]
+EXEC_POLICIES: tuple[str, ...] = ("inline", "thread", "process")
+
+_EMPTY = inspect.Parameter.empty
+
+class ExecBinding:
+    """执行器参数绑定计划
+
+    在 exec/aexec 赋值时根据函数签名计算一次，执行时只需把 state 中的值投影为关键字参数；
+    绑定方法（如默认的 self.exec）的计划按底层函数 `__func__` 缓存，同一个类的节点实例共享，
+    创建节点时不再为每个实例重新解析签名
+
+    数据：
+    - executor 执行器
+    - params 参数名与默认值 ((name, default), ...)，不含 self
+    - keys 执行器从 state 中读取的键
+    - wants_self 是否需要传入节点实例（未绑定的函数，如 aexec=lambda self, state: ...）
+    - wants_state 是否需要传入整个 state
+    """
+
+    __slots__ = ("executor", "params", "keys", "wants_self", "wants_state")
+
+    _method_plans: "weakref.WeakKeyDictionary[Callable, tuple]" = weakref.WeakKeyDictionary()
+    """绑定方法的计划缓存 {__func__: (params, keys, wants_self, wants_state)}"""
+
+    def __init__(self, executor: Callable):
+        self.executor = executor
+        func = getattr(executor, "__func__", None)
+        plan = None
+        if func is not None:
+            try:
+                plan = ExecBinding._method_plans.get(func)
+                if plan is None:
+                    plan = ExecBinding._method_plans[func] = self._plan(executor)
+            except TypeError:
+                pass  # 底层函数不支持弱引用
+        self.params, self.keys, self.wants_self, self.wants_state = plan or self._plan(executor)
+
+    @staticmethod
+    def _plan(executor: Callable) -> tuple:
+        """解析执行器签名，返回 (params, keys, wants_self, wants_state)"""
+        params: list[tuple[str, Any]] = []
+        wants_self = wants_state = False
+        if callable(executor):
+            for name, param in inspect.signature(executor).parameters.items():
+                if name == "self":
+                    wants_self = True
+                    continue
+                params.append((name, param.default))
+                if name == "state":
+                    wants_state = True
+        return tuple(params), tuple(name for name, _ in params), wants_self, wants_state
+
+    def kwargs(self, instance: Any, state: StateType) -> dict:
+        """把 state 投影为调用参数：state 中的值 > 整个 state（参数名为 state 时）> 默认值"""
+        call_kwargs = {"self": instance} if self.wants_self else {}
+        for name, default in self.params:
+            if name in state:
+                call_kwargs[name] = state[name]
+            elif name == "state" and isinstance(state, dict):
+                call_kwargs[name] = state
+            elif default is not _EMPTY:
+                call_kwargs[name] = default
+        return call_kwargs
+
+    def __call__(self, instance: Any, state: StateType) -> Any:
+        return self.executor(**self.kwargs(instance, state))
+
+    def project(self, state: StateType) -> dict:
+        """只保留执行器需要的 state 键；需要整个 state 时返回浅拷贝"""
+        if self.wants_state:
+            return dict(state)
+        return {key: state[key] for key in self.keys if key in state}
+
+
+def _call_in_process(executor: Callable, instance: Any, state: dict) -> tuple[Any, dict | None]:
+    """进程池中的执行入口，返回 (执行结果, 执行后的整个 state 或 None)"""
+    binding = ExecBinding(executor)
+    result = binding(instance, state)
+    return result, (state if binding.wants_state else None)
+
 
 class Node(Connection[StateType], Generic[StateType]):
-    """节点 - 工作流的基本执行单元"""
+    """节点 - 工作流的基本执行单元
+
+    执行策略 exec_policy（仅影响异步执行 arun）：
+    - inline 在事件循环中调用 aexec（默认）
+    - thread 在有界线程池中调用同步 exec，阻塞的 LLM/HTTP 调用不会卡住事件循环
+    - process 在进程池中调用同步 exec，适合 CPU 密集型节点
+        - 只序列化执行器签名中声明的 state 键（声明 state 参数时序列化整个 state）
+        - exec 与节点必须可以 pickle（不能是 lambda），节点所在的图不会被传递；无法 pickle 时抛出说明原因的 ValueError
+        - 通过返回值更新状态；声明 state 参数时，子进程中对 state 的修改会合并回来
 
-    def __init__(self, name: str = None, exec: Callable = None, aexec: Callable = None, max_retries=1, wait=0):
+    超时 timeout（秒，每次尝试）：
+    - 异步执行时超时会取消正在执行的 aexec（线程/进程中的 exec 无法被中断，只是不再等待）
+    - 同步执行时在线程池中执行 exec 并限时等待
+    - 超时抛出 TimeoutError，按普通异常参与重试和 exec_fallback
+    - 运行设置了整体期限（run/arun 的 timeout）时取两者中更早的，超过整体期限抛出 `DeadlineExceeded`，不再重试
+
+    重试 retry（`RetryPolicy`）：
+    - 指数退避 + 随机抖动，遵循限流错误的 retry-after 提示，超出 max_elapsed 预算或运行整体期限时不再重试
+    - 按异常分类决定是否重试（超时/限流/5xx 重试，参数校验类错误直接交给 exec_fallback）
+    - 未指定时使用 max_retries/wait：固定间隔重试所有异常
+    - 等待期间不阻塞事件循环，需要等待的节点同步执行（run）时也会经过事件循环
+
+    结果缓存 cache（`MemoryCache`/`DiskCache`，默认不开启）：
+    - 缓存键为节点标识与执行器签名读取的 state 键的值（声明 state 参数时为整个 state）
+    - 命中时不执行节点，直接返回上次的执行结果并重放上次写入/删除的 state 键
+    - 只适用于纯函数式节点（结果只取决于读取的 state 键），执行失败（exec_fallback）的结果不缓存
+
+    隔离策略（默认不开启，同一个实例可以被多个节点共享）：
+    - circuit（`CircuitBreaker`）连续失败后打开断路器，打开期间不调用执行器，直接返回 circuit.fallback_action
+    - bulkhead（`Bulkhead`）限制同时执行的数量，等待空位超时直接返回 bulkhead.fallback_action
+    """
+
+    def __init__(
+        self,
+        name: str = None,
+        exec: Callable = None,
+        aexec: Callable = None,
+        max_retries=1,
+        wait=0,
+        exec_policy: ExecPolicy = "inline",
+        timeout: float = None,
+        retry: RetryPolicy = None,
+        cache: Cache = None,
+        circuit: CircuitBreaker = None,
+        bulkhead: Bulkhead = None,
+    ):
         super().__init__(name=name)
+        if exec_policy not in EXEC_POLICIES:
+            raise ValueError(f"未知的执行策略 {exec_policy}，可选值：{EXEC_POLICIES}")
         self.exec = exec or self.exec
         self.aexec = aexec or self.aexec
+        self.exec_policy: ExecPolicy = exec_policy
         self.max_retries = max_retries
         self.wait = wait
-        self.cur_retry = 0
-        self.state: StateType = {}
+        self.timeout = timeout
+        self.retry = retry
+        self.cache = cache
+        self.circuit = circuit
+        self.bulkhead = bulkhead
+
+    def __setattr__(self, name: str, value: Any):
+        super().__setattr__(name, value)
+        # ⭐️ exec/aexec 赋值时预先计算参数绑定计划
+        if name in ("exec", "aexec"):
+            super().__setattr__(f"_{name}_binding", ExecBinding(value))
 
     def __getitem__(self, key):
         raise NotImplementedError("Node 类不支持 __getitem__ 方法")
@@ -30,31 +176,178 @@ class Node(Connection[StateType], Generic[StateType]):
         """
         if remaining_steps <= 0:
             return "max_steps_exceeded"
+        # ⭐️ 舱壁隔离：同时执行的数量达到上限时等待空位，等待超时直接路由到 fallback_action
+        bulkhead = self.bulkhead
+        if bulkhead is not None and not await bulkhead.acquire():
+            log("bulkhead_full", logging.WARNING, node=self.name, limit=bulkhead.max_concurrent, action=bulkhead.fallback_action)
+            return bulkhead.fallback_action
+        try:
+            # ⭐️ 结果缓存：命中时直接返回上次的执行结果和写入
+            if self.cache is not None:
+                return await self._execute_cached(state, is_async)
+            result, _ = await self._execute(state, is_async)
+            return result
+        finally:
+            if bulkhead is not None:
+                bulkhead.release()
 
+    async def _execute(self, state: StateType, is_async: bool) -> tuple[Any, bool]:
+        """执行节点（带重试与错误处理），返回 (执行结果, 是否执行成功)"""
         # ⭐️ 执行重试机制
-        for self.cur_retry in range(self.max_retries):
-            # ⭐️ 设置节点状态 配合 get_state/set_state 使用
-            self.state: StateType = state
-            try:
-                # ⭐️ 调用自定义或者默认执行器（exec/aexec），根据 is_async 选择同步/异步
-                if is_async:
-                    return await self._call_with_params(self.aexec, self, state)
-                else:
-                    return self._call_with_params(self.exec, self, state)
-            except Exception as exc:
-                # ⭐️ 执行错误处理
-                if self.cur_retry == self.max_retries - 1:
-                    if is_async:
-                        return await self.aexec_fallback(state, exc)
-                    else:
-                        return self.exec_fallback(state, exc)
-                if self.wait > 0:
+        policy, circuit = self.retry_policy(), self.circuit
+        started = time.monotonic()
+        retry = 0
+        while True:
+            # ⭐️ 熔断：断路器打开时不再调用执行器，直接路由到 fallback_action
+            if circuit is not None and not circuit.allow():
+                log("circuit_open", logging.WARNING, node=self.name, action=circuit.fallback_action)
+                return circuit.fallback_action, False
+            # 本次尝试是否已向断路器记录结果，没有记录时（取消、超过运行期限）归还试探名额
+            recorded = circuit is None
+            # ⭐️ 设置节点执行上下文 配合 get_state/set_state 使用（并发执行互不干扰）
+            with node_context(self, state, retry) as ctx:
+                try:
+                    # ⭐️ 本次尝试的时限：节点 timeout 与运行整体期限中更早的
+                    timeout, by_deadline = self._attempt_timeout(ctx)
+                    # ⭐️ 调用自定义或者默认执行器（exec/aexec），根据 is_async 选择同步/异步
                     if is_async:
-                        await asyncio.sleep(self.wait)
+                        if timeout is None:
+                            result = await self._invoke_async(state)
+                        else:
+                            result = await self._await_with_timeout(self._invoke_async(state), timeout, by_deadline)
                     else:
-                        time.sleep(self.wait)
-            finally:
-                self.state: StateType = {}
+                        if timeout is None:
+                            result = self._call_with_params(self.exec, self, state)
+                        else:
+                            result = self._call_with_timeout(state, timeout, by_deadline)
+                except DeadlineExceeded:
+                    raise
+                except Exception as exc:
+                    if circuit is not None:
+                        circuit.record_failure(exc)
+                        recorded = True
+                    # ⭐️ 按重试策略计算等待时间，不再重试时执行错误处理
+                    delay = policy.next_delay(retry, exc, time.monotonic() - started, ctx.remaining())
+                    if delay is None:
+                        if is_async:
+                            return await self.aexec_fallback(state, exc), False
+                        else:
+                            return self.exec_fallback(state, exc), False
+                else:
+                    if circuit is not None:
+                        circuit.record_success()
+                        recorded = True
+                    return result, True
+                finally:
+                    if not recorded:
+                        circuit.release()
+            retry += 1
+            await sleep(delay)
+
+    async def _execute_cached(self, state: StateType, is_async: bool) -> Any:
+        """带结果缓存的执行：键为执行器读取的 state 键的值，只缓存执行成功的结果"""
+        binding = self._aexec_binding if is_async and self.exec_policy == "inline" else self._exec_binding
+        executor = getattr(binding.executor, "__func__", binding.executor)
+        name = f"{getattr(executor, '__module__', '')}.{getattr(executor, '__qualname__', type(executor).__qualname__)}"
+        namespace = f"{type(self).__qualname__}:{self.name}:{name}"
+        key = cache_key(namespace, binding, state)
+        if key is not None:
+            entry = self.cache.get(key)
+            if entry is not None:
+                result, updates, deleted = entry
+                self._apply_writes(state, updates, deleted)
+                return result
+        # ⭐️ 在记录变更的浅拷贝上执行，得到节点写入/删除的键
+        local = TrackedState(state)
+        result, ok = await self._execute(local, is_async)
+        delta = local.commit()
+        self._apply_writes(state, delta.updates, delta.deleted)
+        if key is not None and ok:
+            self.cache.set(key, (result, delta.updates, delta.deleted))
+        return result
+
+    @staticmethod
+    def _apply_writes(state: StateType, updates: dict, deleted: Iterable[str]):
+        for name in deleted:
+            state.pop(name, None)
+        state.update(updates)
+
+    def _is_sync_graph(self, seen: "set[Connection]" = None) -> bool:
+        """同步执行只调用 exec，未重写 execute_workflow 的节点不会等待异步操作"""
+        return (
+            type(self).execute_workflow is Node.execute_workflow
+            and self.bulkhead is None
+            and not self.retry_policy().sleeps
+        )
+
+    def declared_actions(self) -> frozenset[str] | None:
+        """从自定义 exec/aexec 的返回值注解（如 `Literal["a", "b"]`）提取可能返回的 action
+
+        两个执行器都未自定义时为 {"exit"}，任一执行器没有注解时无法确定，返回 None；
+        断路器/舱壁的 fallback_action 也计入其中
+        """
+        actions: set[str] = set()
+        custom = False
+        for name in ("exec", "aexec"):
+            executor = getattr(self, name)
+            if getattr(executor, "__func__", None) is getattr(Node, name):
+                continue
+            custom = True
+            declared = executor_actions(executor)
+            if declared is None:
+                return None
+            actions |= declared
+        if not custom:
+            actions.add("exit")
+        for policy in (self.circuit, self.bulkhead):
+            if policy is not None:
+                actions.add(policy.fallback_action)
+        return frozenset(actions)
+
+    async def _invoke_async(self, state: StateType) -> Any:
+        """异步执行时按执行策略调用执行器"""
+        if self.exec_policy == "thread":
+            return await self._call_in_thread(self.exec, state)
+        if self.exec_policy == "process":
+            return await self._call_in_process(self.exec, state)
+        return await self._call_with_params(self.aexec, self, state)
+
+    def _attempt_timeout(self, ctx: ExecutionContext) -> tuple[float | None, bool]:
+        """返回 (本次尝试的时限, 时限是否来自运行整体期限)，已超过整体期限时抛出 DeadlineExceeded"""
+        remaining = ctx.remaining()
+        if remaining is None:
+            return self.timeout, False
+        ctx.check_deadline()
+        if self.timeout is None or remaining < self.timeout:
+            return remaining, True
+        return self.timeout, False
+
+    def _timeout_error(self, timeout: float, by_deadline: bool) -> TimeoutError:
+        if by_deadline:
+            return DeadlineExceeded(f"节点 {self} 执行时超过了运行的截止时间")
+        return TimeoutError(f"节点 {self} 执行超时（{timeout}s）")
+
+    async def _await_with_timeout(self, awaitable: Awaitable, timeout: float, by_deadline: bool) -> Any:
+        """限时等待，超时取消执行并抛出 TimeoutError/DeadlineExceeded"""
+        try:
+            async with asyncio.timeout(timeout) as scope:
+                return await awaitable
+        except TimeoutError:
+            if scope.expired():
+                raise self._timeout_error(timeout, by_deadline) from None
+            raise
+
+    def _call_with_timeout(self, state: StateType, timeout: float, by_deadline: bool) -> Any:
+        """同步执行时在线程池中调用 exec 并限时等待"""
+        call = functools.partial(contextvars.copy_context().run, self._call_with_params, self.exec, self, state)
+        future = get_runner().thread_pool.submit(call)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            if future.done():
+                raise
+            future.cancel()
+            raise self._timeout_error(timeout, by_deadline) from None
 
     def _call_with_params(self, executor: Callable, instance: Any, state: StateType) -> Any:
         """根据函数签名智能调用执行器
@@ -68,33 +361,100 @@ class Node(Connection[StateType], Generic[StateType]):
         - executor：def exec(state, a, b=1): pass
         - state：{"a": 1}
         - 返回：exec(**{"state": state, "a": state["a"], "b": 1}) 也就是 exec(state, a=1, b=1)
+
+        exec/aexec 的绑定计划在赋值时已缓存（见 `ExecBinding`），其他执行器临时计算
         """
         if not callable(executor):
             return None
+        return self.get_binding(executor)(instance, state)
 
-        # 获取函数参数信息
-        sig = inspect.signature(executor)
-        params = sig.parameters
+    async def _call_in_thread(self, executor: Callable, state: StateType) -> Any:
+        """在执行器线程池中调用同步执行器，保留当前上下文变量"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, self._call_with_params, executor, self, state)
+        return await loop.run_in_executor(get_runner().thread_pool, call)
 
-        # 构建调用参数
-        call_kwargs = {}
-        for param_name, param in params.items():
-            if param_name == "self":
-                call_kwargs[param_name] = instance
-                continue
+    async def _call_in_process(self, executor: Callable, state: StateType) -> Any:
+        """在进程池中调用同步执行器，只传递执行器需要的 state 键，并合并子进程中对 state 的修改"""
+        binding = self.get_binding(executor)
+        loop = asyncio.get_running_loop()
+        instance = self if binding.wants_self else None
+        self._check_picklable(executor, instance)
+        result, new_state = await loop.run_in_executor(
+            get_runner().process_pool, _call_in_process, executor, instance, binding.project(state)
+        )
+        if new_state is not None:
+            for key in [key for key in state if key not in new_state]:
+                del state[key]
+            # 只写回发生变化的键，未变化的值保持原对象
+            state.update({key: value for key, value in new_state.items() if key not in state or state[key] != value})
+        return result
 
-            # 如果参数有默认值，使用默认值
-            if param.default != inspect.Parameter.empty:
-                call_kwargs[param_name] = param.default
+    def _check_picklable(self, executor: Callable, instance: Any):
+        """进程池执行前检查执行器与节点可以 pickle（每个执行器只检查一次），
+        否则抛出 ValueError，而不是在子进程通信中失败"""
+        if self.__dict__.get("_picklable") is executor:
+            return
+        try:
+            pickle.dumps((executor, instance))
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            raise ValueError(
+                f"节点 {self} 的执行策略为 process，但执行器 {executor!r} 无法 pickle 传递到子进程"
+                f"（lambda、嵌套函数等），请改用模块级函数或 exec_policy=\"thread\"：{e}"
+            ) from e
+        self._picklable = executor
 
-            # 如果 state 中有对应值，覆盖默认值
-            if param_name in state:
-                call_kwargs[param_name] = state[param_name]
-            # 特殊处理：如果参数名为 state 且 state 是 dict，传递整个 state
-            elif param_name == "state" and isinstance(state, dict):
-                call_kwargs[param_name] = state
+    def __getstate__(self) -> dict:
+        """序列化节点（进程池执行）：不包含所在的图和绑定到自身的执行器"""
+        data = self.__dict__.copy()
+        data.pop("_picklable", None)
+        data["_graph"] = None
+        data["cache"] = data["circuit"] = data["bulkhead"] = None
+        for key in ("exec", "aexec"):
+            data.pop(f"_{key}_binding", None)
+            if getattr(data.get(key), "__self__", None) is self:
+                data.pop(key)
+        return data
 
-        return executor(**call_kwargs)
+    def __setstate__(self, data: dict):
+        self.__dict__.update(data)
+        # 重新赋值以重建绑定计划，绑定到自身的执行器从类方法恢复
+        self.exec = self.__dict__.get("exec", self.exec)
+        self.aexec = self.__dict__.get("aexec", self.aexec)
+
+    def get_binding(self, executor: Callable) -> ExecBinding:
+        """获取执行器的参数绑定计划，优先使用 exec/aexec 赋值时缓存的计划"""
+        for binding in (self._exec_binding, self._aexec_binding):
+            if binding.executor is executor:
+                return binding
+        return ExecBinding(executor)
+
+    def retry_policy(self) -> RetryPolicy:
+        """当前生效的重试策略：retry 或由 max_retries/wait 构造的固定间隔策略（按参数缓存）"""
+        if self.retry is not None:
+            return self.retry
+        policy = self.__dict__.get("_fixed_retry")
+        if policy is None or (policy.max_attempts, policy.delay) != (max(self.max_retries, 1), self.wait):
+            policy = self._fixed_retry = RetryPolicy.fixed(self.max_retries, self.wait)
+        return policy
+
+    @property
+    def state(self) -> StateType:
+        """当前执行上下文中本节点的 state，不在执行中时为空字典"""
+        ctx = current_context()
+        if ctx is None or ctx.node is not self:
+            return {}
+        return ctx.state
+
+    @property
+    def cur_retry(self) -> int:
+        """当前执行上下文中本节点的重试序号"""
+        ctx = current_context()
+        return ctx.retry if ctx is not None and ctx.node is self else 0
+
+    def emit(self, type: str, data: Any = None):
+        """发出执行事件（如 LLM token），由 `Flow.astream` 的消费者接收，没有消费者时不产生开销"""
+        emit_event(type, data, node=self)
 
     def set_state(self, name: str, value: Any):
         """设置节点状态"""
@@ -109,12 +469,12 @@ class Node(Connection[StateType], Generic[StateType]):
     # region 默认执行器和错误处理
     def exec(self, state: StateType) -> Any:
         """默认同步执行器"""
-        print(f"默认同步执行器: {self}, 当前 state: {state}, 返回 exit")
+        log("default_exec", logging.WARNING, node=self, state=state)
         return "exit"
 
     async def aexec(self, state: StateType) -> Any:
         """默认异步执行器"""
-        print(f"默认异步执行器: {self}, 当前 state: {state}, 返回 exit")
+        log("default_exec", logging.WARNING, node=self, state=state)
         return "exit"
 
     def exec_fallback(self, state: StateType, exc: Exception) -> Any:
@@ -128,6 +488,210 @@ class Node(Connection[StateType], Generic[StateType]):
     # endregion
 
 
+class MapNode(Node[StateType], Generic[StateType]):
+    """批处理节点 - 对 state 中的列表逐项并发执行 exec/aexec
+
+    特性：
+    - 从 state[items_key] 读取待处理项，结果按输入顺序写入 state[output_key]
+    - exec/aexec 以单项为单位调用，参数 item 为当前项、index 为序号，其余参数仍从 state 投影
+    - 同步执行（run）以及未自定义 aexec 的异步执行（arun）：在线程池中执行 exec
+    - 自定义 aexec 的异步执行（arun）：每一项作为一个协程任务执行
+    - max_concurrency 限制同时处理的项数，默认不限制（线程数受执行器线程池大小限制）
+    - 每一项按重试策略（retry 或 max_retries/wait）单独重试，最终失败时交给 exec_fallback/aexec_fallback
+    - timeout 为整批的时限，超时后取消未完成的项
+    - on_item(index, item, result) 在每一项完成时回调（按完成顺序），用于汇报进度，可传入或在子类中重写
+    - 通过 `Flow.astream` 执行时，每一项完成会发出 item 事件 {"index", "total"}
+
+    示例：
+    ```python
+    write = MapNode(exec=lambda item: call_llm(item), items_key="sections", output_key="contents")
+    ```
+    """
+
+    def __init__(
+        self,
+        name: str = None,
+        exec: Callable = None,
+        aexec: Callable = None,
+        items_key: str = "items",
+        output_key: str = "results",
+        item_key: str = "item",
+        max_concurrency: int = None,
+        on_item: Callable[[int, Any, Any], Any] = None,
+        action: str = "exit",
+        max_retries=1,
+        wait=0,
+        timeout: float = None,
+        retry: RetryPolicy = None,
+    ):
+        super().__init__(
+            name=name, exec=exec, aexec=aexec, max_retries=max_retries, wait=wait, timeout=timeout, retry=retry
+        )
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError(f"max_concurrency 必须大于 0，当前为 {max_concurrency}")
+        self.items_key = items_key
+        self.output_key = output_key
+        self.item_key = item_key
+        self.max_concurrency = max_concurrency
+        self.on_item = on_item or self.on_item
+        self.action = action
+
+    async def execute_workflow(
+        self, state: StateType, remaining_steps: int = 10, entry_action: str = None, is_async: bool = False
+    ) -> Any:
+        """逐项并发执行，结果写入 state[output_key]，返回 action"""
+        if remaining_steps <= 0:
+            return "max_steps_exceeded"
+        with node_context(self, state) as ctx:
+            try:
+                timeout, by_deadline = self._attempt_timeout(ctx)
+                items = list(state.get(self.items_key) or [])
+                if is_async:
+                    batch = self._amap(items, state)
+                    results = await (batch if timeout is None else self._await_with_timeout(batch, timeout, by_deadline))
+                else:
+                    results = self._map(items, state, timeout, by_deadline)
+            except DeadlineExceeded:
+                raise
+            except Exception as exc:
+                if is_async:
+                    return await self.aexec_fallback(state, exc)
+                return self.exec_fallback(state, exc)
+        state[self.output_key] = results
+        return self.action
+
+    def _is_sync_graph(self, seen: "set[Connection]" = None) -> bool:
+        """同步执行在线程池中等待各项完成，不会等待异步操作"""
+        return True
+
+    def declared_actions(self) -> frozenset[str] | None:
+        """处理完所有项后返回 action（exec/aexec 的返回值是单项结果，不是 action）"""
+        return frozenset({self.action})
+
+    def _item_call(self, binding: ExecBinding, state: StateType, index: int, item: Any) -> tuple[Callable, dict]:
+        """构造单项调用：item/index 覆盖 state 中的同名键"""
+        call_kwargs = binding.kwargs(self, state)
+        if self.item_key in binding.keys:
+            call_kwargs[self.item_key] = item
+        if "index" in binding.keys:
+            call_kwargs["index"] = index
+        return binding.executor, call_kwargs
+
+    def _run_item(self, state: StateType, index: int, item: Any) -> Any:
+        """同步执行单项（带重试，在工作线程中等待）"""
+        executor, call_kwargs = self._item_call(self._exec_binding, state, index, item)
+        policy, started = self.retry_policy(), time.monotonic()
+        retry = 0
+        while True:
+            try:
+                return executor(**call_kwargs)
+            except Exception as exc:
+                delay = policy.next_delay(retry, exc, time.monotonic() - started)
+                if delay is None:
+                    raise
+            retry += 1
+            time.sleep(delay)
+
+    async def _arun_item(self, state: StateType, index: int, item: Any) -> Any:
+        """异步执行单项（带重试）"""
+        executor, call_kwargs = self._item_call(self._aexec_binding, state, index, item)
+        policy, started = self.retry_policy(), time.monotonic()
+        retry = 0
+        while True:
+            try:
+                return await executor(**call_kwargs)
+            except Exception as exc:
+                delay = policy.next_delay(retry, exc, time.monotonic() - started)
+                if delay is None:
+                    raise
+            retry += 1
+            await asyncio.sleep(delay)
+
+    def _map(self, items: Iterable, state: StateType, timeout: float = None, by_deadline: bool = False) -> list:
+        """在线程池中逐项执行 exec，同时在途的项数不超过 max_concurrency"""
+        end = None if timeout is None else time.monotonic() + timeout
+
+        def wait_any() -> set:
+            left = None if end is None else max(end - time.monotonic(), 0)
+            done, _ = wait_futures(pending, timeout=left, return_when=FIRST_COMPLETED)
+            if not done:
+                raise self._timeout_error(timeout, by_deadline)
+            return done
+
+        items = list(items)
+        results: list = [None] * len(items)
+        pool = get_runner().thread_pool
+        limit = self.max_concurrency or len(items)
+        pending: dict = {}
+        queue = iter(enumerate(items))
+        try:
+            for index, item in queue:
+                context = contextvars.copy_context()
+                pending[pool.submit(context.run, self._run_item, state, index, item)] = index
+                if len(pending) < limit:
+                    continue
+                # ⭐️ 在途项数达到上限时，等待任意一项完成再提交下一项
+                for future in wait_any():
+                    self._complete(results, items, pending.pop(future), future.result())
+            while pending:
+                for future in wait_any():
+                    self._complete(results, items, pending.pop(future), future.result())
+        finally:
+            for future in pending:
+                future.cancel()
+        return results
+
+    async def _amap(self, items: Iterable, state: StateType) -> list:
+        """自定义 aexec 时每项一个协程任务，否则在线程池中执行 exec"""
+        items = list(items)
+        results: list = [None] * len(items)
+        semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+        use_aexec = getattr(self.aexec, "__func__", None) is not MapNode.aexec
+        loop = asyncio.get_running_loop()
+
+        async def run_one(index: int, item: Any):
+            if use_aexec:
+                result = await self._arun_item(state, index, item)
+            else:
+                call = functools.partial(contextvars.copy_context().run, self._run_item, state, index, item)
+                result = await loop.run_in_executor(get_runner().thread_pool, call)
+            self._complete(results, items, index, result)
+
+        async def limited(index: int, item: Any):
+            if semaphore is None:
+                return await run_one(index, item)
+            async with semaphore:
+                return await run_one(index, item)
+
+        tasks = [asyncio.ensure_future(limited(index, item)) for index, item in enumerate(items)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return results
+
+    def _complete(self, results: list, items: list, index: int, result: Any):
+        """记录单项结果，发出 item 事件并触发完成回调"""
+        results[index] = result
+        self.emit("item", {"index": index, "total": len(items)})
+        self.on_item(index, items[index], result)
+
+    # region 默认执行器
+    def exec(self, item: Any) -> Any:
+        """默认单项执行器：原样返回"""
+        return item
+
+    async def aexec(self, item: Any) -> Any:
+        """默认单项异步执行器：原样返回"""
+        return item
+
+    def on_item(self, index: int, item: Any, result: Any):
+        """单项完成回调（默认不处理）"""
+
+    # endregion
+
+
 if __name__ == "__main__":
     from agnflow.utils.code import get_code_line
 
@@ -0,0 +1,366 @@
+from typing import Callable, Literal
+from collections import deque
+from email.utils import parsedate_to_datetime
+import asyncio, datetime, random, threading, time
+
+from agnflow.core.context import DeadlineExceeded, current_context
+
+# 默认直接失败的异常：参数/数据校验类错误，重试也不会成功（pydantic.ValidationError 是 ValueError 的子类）
+FAIL_FAST: tuple[type[BaseException], ...] = (ValueError, TypeError, KeyError, AttributeError, NotImplementedError)
+# 默认重试的异常：超时、网络连接类错误
+RETRY_ON: tuple[type[BaseException], ...] = (TimeoutError, ConnectionError)
+# 可以重试的 HTTP 状态码（另外所有 5xx 都会重试）
+RETRY_STATUS: frozenset[int] = frozenset({408, 409, 425, 429})
+
+
+class RetryPolicy:
+    """重试策略 - 指数退避 + 随机抖动 + 总耗时预算 + 异常分类
+
+    参数：
+    - max_attempts 最大尝试次数（含第一次）
+    - delay 第一次重试前的等待秒数
+    - multiplier 每次重试等待时间的倍数，1 表示固定间隔
+    - max_delay 单次等待的上限
+    - jitter 抖动比例 0~1，实际等待为 delay * (1 - jitter * random())；1 为 full jitter，避免大量请求同时重试
+    - max_elapsed 从第一次尝试开始的总耗时预算，下一次等待会超出预算时不再重试
+    - retry_if 自定义判断 (exc) -> bool，指定后忽略下面的分类规则
+    - retry_on / fail_fast 重试 / 直接失败的异常类型
+    - retry_unknown 未分类的异常是否重试
+    - respect_retry_after 遵循异常携带的 retry-after 提示（如 LLM 服务商的限流错误）
+
+    分类顺序：retry_if → HTTP 状态码（408/409/425/429/5xx 重试，其他失败）→ fail_fast → retry_on → retry_unknown
+
+    示例：
+    ```python
+    node = Node(exec=call_llm, retry=RetryPolicy(max_attempts=5, delay=1, max_elapsed=60))
+    ```
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        delay: float = 1.0,
+        multiplier: float = 2.0,
+        max_delay: float = 60.0,
+        jitter: float = 1.0,
+        max_elapsed: float = None,
+        retry_if: Callable[[BaseException], bool] = None,
+        retry_on: tuple[type[BaseException], ...] = RETRY_ON,
+        fail_fast: tuple[type[BaseException], ...] = FAIL_FAST,
+        retry_unknown: bool = True,
+        respect_retry_after: bool = True,
+    ):
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts 必须大于 0，当前为 {max_attempts}")
+        if not 0 <= jitter <= 1:
+            raise ValueError(f"jitter 必须在 0~1 之间，当前为 {jitter}")
+        self.max_attempts = max_attempts
+        self.delay = delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+        self.retry_if = retry_if
+        self.retry_on = retry_on
+        self.fail_fast = fail_fast
+        self.retry_unknown = retry_unknown
+        self.respect_retry_after = respect_retry_after
+
+    def __repr__(self) -> str:
+        return (
+            f"RetryPolicy(max_attempts={self.max_attempts}, delay={self.delay}, multiplier={self.multiplier}, "
+            f"jitter={self.jitter}, max_elapsed={self.max_elapsed})"
+        )
+
+    @classmethod
+    def fixed(cls, max_attempts: int = 1, delay: float = 0) -> "RetryPolicy":
+        """固定间隔、重试所有异常（Node 的 max_retries/wait 参数对应的策略）"""
+        return cls(
+            max_attempts=max(max_attempts, 1),
+            delay=delay,
+            multiplier=1.0,
+            jitter=0.0,
+            fail_fast=(),
+            respect_retry_after=False,
+        )
+
+    @property
+    def sleeps(self) -> bool:
+        """重试之间是否可能需要等待"""
+        return self.max_attempts > 1 and (self.delay > 0 or self.respect_retry_after)
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        """判断异常是否值得重试"""
+        if self.retry_if is not None:
+            return bool(self.retry_if(exc))
+        status = status_code(exc)
+        if status is not None:
+            return status in RETRY_STATUS or status >= 500
+        if isinstance(exc, self.fail_fast):
+            return False
+        if isinstance(exc, self.retry_on):
+            return True
+        return self.retry_unknown
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次尝试（从 0 开始）失败后的等待时间（含抖动）"""
+        delay = min(self.delay * self.multiplier**attempt, self.max_delay)
+        return delay * (1 - self.jitter * random.random())
+
+    def next_delay(
+        self, attempt: int, exc: BaseException, elapsed: float = 0.0, remaining: float = None
+    ) -> float | None:
+        """第 attempt 次尝试失败后应等待的秒数，不应再重试时返回 None
+
+        - elapsed 从第一次尝试开始已经过的时间，用于 max_elapsed 预算
+        - remaining 距离运行截止时间的剩余秒数，等待后已经没有时间执行时不再重试
+        """
+        if attempt + 1 >= self.max_attempts or not self.is_retryable(exc):
+            return None
+        delay = self.backoff(attempt)
+        hint = retry_after(exc) if self.respect_retry_after else None
+        if hint is not None:
+            delay = max(delay, hint)
+        if self.max_elapsed is not None and elapsed + delay > self.max_elapsed:
+            return None
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
+
+
+def status_code(exc: BaseException) -> int | None:
+    """异常携带的 HTTP 状态码（openai/httpx/requests 风格），没有时返回 None"""
+    for obj in (exc, getattr(exc, "response", None)):
+        status = getattr(obj, "status_code", None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """异常携带的 retry-after 提示（秒）：exc.retry_after 属性或响应头 retry-after-ms / retry-after"""
+    value = getattr(exc, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+        if not headers:
+            return None
+        try:
+            if (ms := headers.get("retry-after-ms")) is not None:
+                return max(float(ms) / 1000, 0.0)
+            value = headers.get("retry-after")
+        except (AttributeError, TypeError, ValueError):
+            return None
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+    # HTTP 日期格式
+    try:
+        when = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError):
+        return None
+    return max((when - datetime.datetime.now(when.tzinfo)).total_seconds(), 0.0)
+
+
+async def sleep(delay: float):
+    """等待 delay 秒：当前线程有运行中的事件循环时不阻塞事件循环，否则（纯同步执行）直接 time.sleep"""
+    if delay <= 0:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        time.sleep(delay)
+        return
+    await asyncio.sleep(delay)
+
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+class CircuitBreaker:
+    """断路器 - 下游（工具、LLM 接口）持续出错时快速失败，保护图中其他节点的延迟
+
+    状态：
+    - closed 正常调用，连续失败 failure_threshold 次后打开
+    - open 不调用执行器，节点直接返回 fallback_action（不经过重试和 exec_fallback），recovery_timeout 秒后进入半开
+      fallback_action 与其他 action 一样按节点名称路由，没有对应的节点时工作流结束
+    - half_open 最多放行 half_open_max 次试探调用，成功则关闭，失败则重新打开；
+      试探调用没有结果（被取消、超过运行期限）时归还名额，试探名额占满超过 recovery_timeout 秒时放行新的试探
+
+    - 每次尝试（含重试）都会记录成功/失败，打开后剩余的重试也不再执行
+    - ignore 中的异常（如参数校验错误）不计入失败，半开状态下视为试探成功（下游有响应）
+    - 同一个实例可以被多个节点共享（如调用同一个接口的节点），线程安全
+
+    示例：
+    ```python
+    search = Node(exec=call_search_api, circuit=CircuitBreaker(fallback_action="cached_answer"))
+    search >> [answer, cached_answer]
+    ```
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_max: int = 1,
+        fallback_action: str = "circuit_open",
+        ignore: tuple[type[BaseException], ...] = (),
+    ):
+        if failure_threshold < 1:
+            raise ValueError(f"failure_threshold 必须大于 0，当前为 {failure_threshold}")
+        if half_open_max < 1:
+            raise ValueError(f"half_open_max 必须大于 0，当前为 {half_open_max}")
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max = half_open_max
+        self.fallback_action = fallback_action
+        self.ignore = ignore
+        self.state: CircuitState = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trials = 0
+        self.probed_at = 0.0  # 最近一次放行试探调用的时间
+        self.lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"CircuitBreaker(state={self.state!r}, failures={self.failures})"
+
+    def allow(self) -> bool:
+        """是否允许本次调用（打开状态下到期后转为半开并放行试探调用）"""
+        with self.lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if self.state == "open":
+                if now - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = "half_open"
+                self.trials = 0
+            # 试探名额占满且长时间没有结果（调用方挂起或丢失了结果）时放行新的试探，避免一直停留在半开状态
+            if self.trials >= self.half_open_max and now - self.probed_at >= self.recovery_timeout:
+                self.trials = 0
+            if self.trials < self.half_open_max:
+                self.trials += 1
+                self.probed_at = now
+                return True
+            return False
+
+    def record_success(self):
+        """记录一次成功调用"""
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self, exc: BaseException = None):
+        """记录一次失败调用（ignore 中的异常不计入失败，半开状态下视为成功）"""
+        if exc is not None and isinstance(exc, self.ignore):
+            with self.lock:
+                if self.state == "half_open":
+                    self.state = "closed"
+                    self.failures = 0
+            return
+        with self.lock:
+            if self.state == "half_open":
+                self._open()
+                return
+            self.failures += 1
+            if self.state == "closed" and self.failures >= self.failure_threshold:
+                self._open()
+
+    def release(self):
+        """归还一次没有记录结果的调用占用的试探名额（调用被取消或超过运行期限时）"""
+        with self.lock:
+            if self.state == "half_open" and self.trials > 0:
+                self.trials -= 1
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.failures = 0
+
+    def reset(self):
+        """手动恢复为关闭状态"""
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+
+
+class Bulkhead:
+    """舱壁隔离 - 限制节点同时执行的数量，下游变慢时不会占满整个服务
+
+    - max_concurrent 同时执行的上限
+    - max_wait 等待空位的最长时间（秒），超时后节点直接返回 fallback_action；None 表示一直等待，0 表示不等待
+    - 运行设置了整体期限时，等待超过期限抛出 `DeadlineExceeded`
+    - 同一个实例可以被多个节点共享，跨事件循环、跨线程有效
+
+    示例：
+    ```python
+    llm = Node(exec=call_llm, bulkhead=Bulkhead(max_concurrent=8, max_wait=5, fallback_action="busy_reply"))
+    llm >> [reply, busy_reply]
+    ```
+    """
+
+    def __init__(self, max_concurrent: int, max_wait: float = None, fallback_action: str = "bulkhead_full"):
+        if max_concurrent < 1:
+            raise ValueError(f"max_concurrent 必须大于 0，当前为 {max_concurrent}")
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.fallback_action = fallback_action
+        self.active = 0
+        self.waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self.lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"Bulkhead(active={self.active}/{self.max_concurrent}, waiting={len(self.waiters)})"
+
+    async def acquire(self) -> bool:
+        """占用一个空位，等待超时返回 False"""
+        with self.lock:
+            if self.active < self.max_concurrent:
+                self.active += 1
+                return True
+            if self.max_wait is not None and self.max_wait <= 0:
+                return False
+            loop = asyncio.get_running_loop()
+            waiter = loop.create_future()
+            self.waiters.append((loop, waiter))
+        timeout, by_deadline = self.max_wait, False
+        ctx = current_context()
+        remaining = None if ctx is None else ctx.remaining()
+        if remaining is not None and (timeout is None or remaining < timeout):
+            timeout, by_deadline = max(remaining, 0), True
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException as exc:
+            # 空位已经交给了本次等待，但调用方不再需要
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            if not isinstance(exc, TimeoutError):
+                raise
+            if by_deadline:
+                raise DeadlineExceeded(f"运行 {ctx.run_id} 等待舱壁空位时超过了截止时间") from None
+            return False
+        return True
+
+    def release(self):
+        """释放空位，有等待者时直接转交给最早的等待者"""
+        with self.lock:
+            while self.waiters:
+                loop, waiter = self.waiters.popleft()
+                if waiter.done():
+                    continue
+                try:
+                    loop.call_soon_threadsafe(self._grant, waiter)
+                except RuntimeError:
+                    # 等待者所在的事件循环已关闭
+                    continue
+                return
+            self.active -= 1
+
+    def _grant(self, waiter: asyncio.Future):
+        if waiter.done():
+            self.release()
+        else:
+            waiter.set_result(True)
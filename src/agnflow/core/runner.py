@@ -0,0 +1,151 @@
+from typing import Any, Coroutine
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio, atexit, threading, weakref
+
+
+class Runner:
+    """同步调用入口的协程执行器（复用事件循环）
+
+    执行策略：
+    - 纯同步图（只包含同步执行的 Node/Flow）：不创建事件循环，直接驱动协程执行完毕
+    - 当前线程没有运行中的事件循环：复用该线程的持久事件循环（asyncio.Runner），线程结束后自动关闭
+    - 当前线程已有运行中的事件循环（如 Jupyter、FastAPI 处理函数）：交给后台线程的持久事件循环执行并等待结果，
+      等待期间调用方的事件循环被阻塞，异步代码中应优先使用 `await arun(...)`
+
+    执行池：
+    - 异步执行时，exec_policy="thread" 的节点在有界线程池中执行同步 exec，不阻塞事件循环
+    - 异步执行时，exec_policy="process" 的节点在进程池中执行同步 exec，CPU 密集型节点可以利用多核
+    - 通过 `configure(thread_workers=..., process_workers=...)` 设置池大小，默认与标准库一致
+    """
+
+    def __init__(self, thread_workers: int = None, process_workers: int = None):
+        # 各线程的持久事件循环 {线程: asyncio.Runner}，线程结束后随线程对象一起释放
+        self._runners: "weakref.WeakKeyDictionary[threading.Thread, asyncio.Runner]" = weakref.WeakKeyDictionary()
+        self._background: asyncio.AbstractEventLoop | None = None
+        self._lock = threading.Lock()
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self._thread_pool: ThreadPoolExecutor | None = None
+        self._process_pool: ProcessPoolExecutor | None = None
+
+    def configure(self, thread_workers: int = None, process_workers: int = None):
+        """配置执行池大小，已创建的池会在下次使用时按新配置重建"""
+        pools = []
+        with self._lock:
+            if thread_workers is not None:
+                self.thread_workers = thread_workers
+                pools.append(self._thread_pool)
+                self._thread_pool = None
+            if process_workers is not None:
+                self.process_workers = process_workers
+                pools.append(self._process_pool)
+                self._process_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False)
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        """执行同步节点的有界线程池"""
+        if self._thread_pool is None:
+            with self._lock:
+                if self._thread_pool is None:
+                    self._thread_pool = ThreadPoolExecutor(
+                        max_workers=self.thread_workers, thread_name_prefix="agnflow-node"
+                    )
+        return self._thread_pool
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        """执行 CPU 密集型节点的进程池"""
+        if self._process_pool is None:
+            with self._lock:
+                if self._process_pool is None:
+                    self._process_pool = ProcessPoolExecutor(max_workers=self.process_workers)
+        return self._process_pool
+
+    def run(self, coro: Coroutine, sync: bool = False) -> Any:
+        """执行协程并返回结果，sync=True 表示协程内部不会等待任何异步操作"""
+        if sync:
+            return self.run_inline(coro)
+        if self.in_running_loop():
+            # 当前线程的事件循环正在运行，不能再驱动它：在后台事件循环中执行，阻塞等待结果
+            return self.submit(coro).result()
+        return self._thread_runner().run(coro)
+
+    @staticmethod
+    def in_running_loop() -> bool:
+        """当前线程是否有运行中的事件循环"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    def submit(self, coro: Coroutine) -> Future:
+        """在后台线程的持久事件循环中执行协程，立即返回 concurrent.futures.Future（调用方不阻塞）"""
+        return asyncio.run_coroutine_threadsafe(coro, self._background_loop())
+
+    @staticmethod
+    def run_inline(coro: Coroutine) -> Any:
+        """不经过事件循环，直接驱动不会挂起的协程"""
+        try:
+            coro.send(None)
+        except StopIteration as stop:
+            return stop.value
+        coro.close()
+        raise RuntimeError("同步执行路径中出现了异步等待，请改用 arun 执行")
+
+    def close(self):
+        """关闭所有持久事件循环和执行池"""
+        with self._lock:
+            runners = list(self._runners.values())
+            self._runners.clear()
+            background, self._background = self._background, None
+            pools = (self._thread_pool, self._process_pool)
+            self._thread_pool = self._process_pool = None
+        for runner in runners:
+            runner.close()
+        if background is not None:
+            background.call_soon_threadsafe(background.stop)
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=False)
+
+    def _thread_runner(self) -> asyncio.Runner:
+        """当前线程的持久事件循环"""
+        thread = threading.current_thread()
+        runner = self._runners.get(thread)
+        if runner is None:
+            runner = asyncio.Runner()
+            with self._lock:
+                self._runners[thread] = runner
+            # 短生命周期的线程结束后关闭其事件循环，避免事件循环随线程数量泄漏
+            weakref.finalize(thread, _close_runner, runner)
+        return runner
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        """后台线程中常驻的事件循环"""
+        with self._lock:
+            if self._background is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="agnflow-runner", daemon=True).start()
+                self._background = loop
+            return self._background
+
+
+def _close_runner(runner: asyncio.Runner):
+    try:
+        runner.close()
+    except RuntimeError:
+        # 在另一个运行中的事件循环里无法等待异步生成器关闭，直接关闭事件循环
+        runner.get_loop().close()
+
+
+_runner = Runner()
+atexit.register(_runner.close)
+
+
+def get_runner() -> Runner:
+    """获取全局共享的执行器"""
+    return _runner
@@ -0,0 +1,154 @@
+from typing import Any, Iterable
+import copy
+
+# 不可变类型的值只能通过重新赋值修改，读取时不需要记录
+_IMMUTABLE = (str, bytes, int, float, complex, bool, type(None), tuple, frozenset)
+# 并行分支读取时需要复制的容器类型，其他对象（客户端、连接等）在分支间共享
+_CONTAINERS = (list, dict, set, bytearray)
+
+
+class StateDelta:
+    """一步执行产生的 state 增量
+
+    数据：
+    - updates 新增或可能变化的键 {key: value}
+    - deleted 删除的键
+    """
+
+    __slots__ = ("updates", "deleted")
+
+    def __init__(self, updates: dict[str, Any], deleted: Iterable[str] = ()):
+        self.updates = updates
+        self.deleted = tuple(deleted)
+
+    def __bool__(self) -> bool:
+        return bool(self.updates or self.deleted)
+
+    def __repr__(self) -> str:
+        return f"StateDelta(updates={list(self.updates)}, deleted={list(self.deleted)})"
+
+
+class TrackedState(dict):
+    """记录键级变更的 state 容器（journal）
+
+    - 写入：`state[k] = v`、update、setdefault、pop、del 等记录到 written/deleted
+    - 原地修改：通过 `state[k]`/get/setdefault 读取可变值（list、dict 等）时记录到 touched，
+      读取后可能被原地修改（如 `state["messages"].append(...)`）
+    - 通过 items()/values()/dict(state) 取得的值不会被记录，原地修改这类值后需要重新赋值
+    - `commit()` 返回自上次提交以来的增量并清空记录，检查点、流式输出、并行合并只需处理增量
+
+    根工作流需要增量时（配置了检查点或有事件消费者）会把普通 dict 包装为 TrackedState（浅拷贝），
+    节点在副本上执行，调用方传入的 dict 在运行结束（含出错、取消）时才写回，运行期间读取它看不到中间结果
+    """
+
+    __slots__ = ("written", "touched", "deleted")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.written: set[str] = set()
+        self.touched: set[str] = set()
+        self.deleted: set[str] = set()
+
+    def _write(self, key: str):
+        self.written.add(key)
+        self.deleted.discard(key)
+
+    def _read(self, key: str, value: Any) -> Any:
+        if not isinstance(value, _IMMUTABLE):
+            self.touched.add(key)
+        return value
+
+    def __getitem__(self, key: str) -> Any:
+        return self._read(key, super().__getitem__(key))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self:
+            return self._read(key, super().__getitem__(key))
+        return default
+
+    def __setitem__(self, key: str, value: Any):
+        super().__setitem__(key, value)
+        self._write(key)
+
+    def __delitem__(self, key: str):
+        super().__delitem__(key)
+        self.deleted.add(key)
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key in self:
+            self.deleted.add(key)
+        return super().pop(key, *default)
+
+    def popitem(self) -> tuple[str, Any]:
+        key, value = super().popitem()
+        self.deleted.add(key)
+        return key, value
+
+    def clear(self):
+        self.deleted.update(self.keys())
+        super().clear()
+
+    def __ior__(self, other: Any) -> "TrackedState":
+        self.update(other)
+        return self
+
+    def __reduce__(self):
+        # 序列化为普通 dict（如进程池执行、检查点）
+        return dict, (dict(self),)
+
+    def changed_keys(self) -> set[str]:
+        """自上次提交以来新增、重新赋值或可能被原地修改的键（不含已删除的键）"""
+        return {key for key in self.written | self.touched if key in self}
+
+    def delta(self) -> StateDelta:
+        """自上次提交以来的增量（不清空记录）"""
+        updates = {key: super(TrackedState, self).__getitem__(key) for key in self.changed_keys()}
+        return StateDelta(updates, [key for key in self.deleted if key not in self])
+
+    def commit(self) -> StateDelta:
+        """返回自上次提交以来的增量，并清空记录"""
+        delta = self.delta()
+        self.written.clear()
+        self.touched.clear()
+        self.deleted.clear()
+        return delta
+
+
+class BranchState(TrackedState):
+    """并行分支的 state（copy-on-write）
+
+    在外层 state 的浅拷贝上执行，第一次通过 `state[k]`/get 读取容器类型的值（list、dict、set）时深拷贝，
+    分支内的原地修改（如 `state["messages"].append(...)`）不会影响外层和其他分支，由 ParallelFlow 通过 reducer 合并。
+    其他可变对象（客户端、连接等）不复制，在分支间共享
+    """
+
+    __slots__ = ("copied",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.copied: set[str] = set()
+
+    def _write(self, key: str):
+        # 分支自己写入的值不需要再复制
+        super()._write(key)
+        self.copied.add(key)
+
+    def _read(self, key: str, value: Any) -> Any:
+        if key not in self.copied and isinstance(value, _CONTAINERS):
+            try:
+                value = copy.deepcopy(value)
+            except Exception:
+                # 元素无法深拷贝时至少复制容器本身
+                value = copy.copy(value)
+            dict.__setitem__(self, key, value)
+            self.copied.add(key)
+        return super()._read(key, value)
@@ -0,0 +1,147 @@
+"""工作流日志
+
+- 基于标准库 logging，日志器名称为 "agnflow"，输出方式、级别由应用自行配置
+- 级别门控：调用方先用 `enabled(level)` 判断，未启用时不构造任何消息
+- 延迟格式化：消息在处理器真正输出时才按消息目录格式化
+- 双语消息目录 MESSAGES，通过 `set_language("en" | "zh")` 或环境变量 AGNFLOW_LOG_LANG 切换
+- 静默模式：`set_quiet()` 或环境变量 AGNFLOW_QUIET=1，只保留 ERROR 及以上级别
+
+示例：
+```python
+from agnflow.utils.log import setup_logging
+
+setup_logging("DEBUG", language="en")  # 开发时在终端输出每一步的执行日志
+```
+"""
+
+from typing import Any, Literal
+import logging, os, sys
+
+logger = logging.getLogger("agnflow")
+
+Language = Literal["en", "zh"]
+
+# 双语消息目录 {key: (english, 中文)}
+MESSAGES: dict[str, tuple[str, str]] = {
+    "node_start": (
+        "🔵 Executing node: {node} (Remaining steps: {remaining})",
+        "🔵 执行节点: {node} (剩余步数: {remaining})",
+    ),
+    "entry_node": (
+        "🟢 {flow}{members} selects entry node: {node} based on entry_action: '{entry_action}'",
+        "🟢 {flow}{members} 根据 entry_action: '{entry_action}' 选择入口节点: {node}",
+    ),
+    "first_node": (
+        "🟢 {flow}{members} selects entry node: {node} as the first node",
+        "🟢 {flow}{members} 第一个节点作为起始节点: {node}",
+    ),
+    "no_start_node": (
+        "🛑 {flow}: no start node found, exiting normally",
+        "🛑 {flow}: 没有找到起始节点，正常退出",
+    ),
+    "next_node": (
+        "🔵 transfer to the next node: {node} 🚀",
+        "🔵 流转下一个节点: {node}",
+    ),
+    "no_next_node": (
+        "🛑 Node {node} with action '{action}' did not find the next node, exiting normally",
+        "🛑 节点 {node} 的 action '{action}' 没有找到下一个节点，正常退出",
+    ),
+    "max_steps": (
+        "⏹️ {flow} reached the maximum of {max_steps} steps, stopping",
+        "⏹️ {flow} 达到最大执行步数 {max_steps}，流程正常终止",
+    ),
+    "node_error": (
+        "🚨 Node {node} failed: {error}",
+        "🚨 节点 {node} 执行出错: {error}",
+    ),
+    "resume": (
+        "♻️ {flow} resumes run {run_id} at step {step}, node: {node}",
+        "♻️ {flow} 从第 {step} 步恢复运行 {run_id}，节点: {node}",
+    ),
+    "parallel_merged": (
+        "🔀 {flow} merged {branches} branches, action: '{action}'",
+        "🔀 {flow} 合并 {branches} 个分支，action: '{action}'",
+    ),
+    "circuit_open": (
+        "⚡ Circuit of node {node} is open, routing to action '{action}'",
+        "⚡ 节点 {node} 的断路器已打开，路由到 action '{action}'",
+    ),
+    "bulkhead_full": (
+        "🚧 Node {node} reached its concurrency limit of {limit}, routing to action '{action}'",
+        "🚧 节点 {node} 达到并发上限 {limit}，路由到 action '{action}'",
+    ),
+    "default_exec": (
+        "Default executor of {node} called with state: {state}, returning exit",
+        "默认执行器: {node}, 当前 state: {state}, 返回 exit",
+    ),
+}
+
+_language: Language = "en" if os.getenv("AGNFLOW_LOG_LANG", "zh").lower().startswith("en") else "zh"
+_quiet: bool = os.getenv("AGNFLOW_QUIET", "").lower() in ("1", "true", "yes", "on")
+
+
+def set_language(language: Language):
+    """设置日志语言"""
+    global _language
+    if language not in ("en", "zh"):
+        raise ValueError(f"未知的日志语言 {language}，可选值：en, zh")
+    _language = language
+
+
+def set_quiet(quiet: bool = True):
+    """开启/关闭静默模式（只保留 ERROR 及以上级别）"""
+    global _quiet
+    _quiet = quiet
+
+
+def is_quiet() -> bool:
+    """是否处于静默模式"""
+    return _quiet
+
+
+def enabled(level: int) -> bool:
+    """该级别的日志是否会被输出（未启用时调用方不应构造消息）"""
+    return (not _quiet or level >= logging.ERROR) and logger.isEnabledFor(level)
+
+
+def format_message(key: str, language: Language = None, **fields: Any) -> str:
+    """按消息目录格式化消息"""
+    en, zh = MESSAGES[key]
+    template = en if (language or _language) == "en" else zh
+    return template.format(**fields)
+
+
+class Message:
+    """延迟格式化的日志消息，只有处理器输出时才调用 __str__"""
+
+    __slots__ = ("key", "fields")
+
+    def __init__(self, key: str, fields: dict[str, Any]):
+        self.key = key
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return format_message(self.key, **self.fields)
+
+
+def log(key: str, level: int = logging.DEBUG, exc_info: Any = None, **fields: Any):
+    """输出一条目录消息，字段通过 record.agnflow_event / record.agnflow_fields 提供给结构化处理器"""
+    if not enabled(level):
+        return
+    logger.log(
+        level, Message(key, fields), exc_info=exc_info, extra={"agnflow_event": key, "agnflow_fields": fields}
+    )
+
+
+def setup_logging(level: int | str = logging.INFO, language: Language = None, stream=None) -> logging.Logger:
+    """快速开启终端日志输出（开发调试用），生产环境建议自行配置 logging"""
+    if language:
+        set_language(language)
+    if not any(getattr(handler, "_agnflow", False) for handler in logger.handlers):
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        handler._agnflow = True
+        logger.addHandler(handler)
+    logger.setLevel(level)
+    return logger